@@ -0,0 +1,286 @@
+"""
+Backfill / replay CLI for reprocessing GeoJSON objects in bulk.
+
+Lists an S3 prefix (or a local directory as a stand-in) and runs every object
+through the same ``process_geojson`` pipeline used by the Lambda handler, using
+a configurable worker pool. Progress is written to a checkpoint file so an
+interrupted run resumes where it stopped.
+
+Usage:
+    python backfill.py --bucket my-bucket --prefix uploads/2024/ --workers 8
+    python backfill.py --local-dir ./geojson_sample --checkpoint sample.ckpt.json
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, List, Callable, Optional
+
+from entrypoint import process_geojson, SUPPORTED_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT = ".backfill_checkpoint.json"
+
+
+def list_local_sources(directory: str) -> List[str]:
+    """
+    List GeoJSON files below a local directory, sorted for a stable order.
+
+    Args:
+        directory: Directory to walk recursively
+
+    Returns:
+        List of file paths with a supported extension
+    """
+    if not os.path.isdir(directory):
+        raise FileNotFoundError(f"Directory not found: {directory}")
+
+    sources = []
+    for root, _dirs, files in os.walk(directory):
+        for filename in files:
+            if filename.lower().endswith(SUPPORTED_EXTENSIONS):
+                sources.append(os.path.join(root, filename))
+    return sorted(sources)
+
+
+def list_s3_sources(bucket: str, prefix: str, client: Any) -> List[str]:
+    """
+    List GeoJSON object keys under an S3 prefix.
+
+    Args:
+        bucket: S3 bucket name
+        prefix: Key prefix to list (may be empty)
+        client: boto3 S3 client
+
+    Returns:
+        List of object keys with a supported extension
+    """
+    keys = []
+    paginator = client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            if obj["Key"].lower().endswith(SUPPORTED_EXTENSIONS):
+                keys.append(obj["Key"])
+    return keys
+
+
+class Checkpoint:
+    """
+    Thread-safe record of completed and failed sources, persisted as JSON lines.
+
+    Every result is appended to the file as one line ({"source", "inserted"}
+    or {"source", "error"}), so recording a file costs O(1) I/O however long
+    the run. Loading replays the lines in order; a line cut short by a killed
+    process is ignored. A checkpoint in the older single-document format
+    ({"completed", "failed"}) is still read.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.completed: Dict[str, int] = {}
+        self.failed: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._pending_newline = False
+
+        if os.path.exists(path):
+            self._load()
+            logger.info(f"Loaded checkpoint {path}: {len(self.completed)} completed, "
+                        f"{len(self.failed)} failed")
+
+    def _load(self) -> None:
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                # Terminate a cut-off last line before appending after it
+                self._pending_newline = not line.endswith("\n")
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    logger.warning(f"Ignoring truncated line in checkpoint {self.path}")
+                    continue
+                if "completed" in entry or "failed" in entry:
+                    self.completed.update(entry.get("completed", {}))
+                    self.failed.update(entry.get("failed", {}))
+                elif "error" in entry:
+                    self.failed[entry["source"]] = entry["error"]
+                else:
+                    self.completed[entry["source"]] = entry["inserted"]
+                    self.failed.pop(entry["source"], None)
+
+    def mark_completed(self, source: str, inserted: int) -> None:
+        with self._lock:
+            self.completed[source] = inserted
+            self.failed.pop(source, None)
+            self._append({"source": source, "inserted": inserted})
+
+    def mark_failed(self, source: str, error: str) -> None:
+        with self._lock:
+            self.failed[source] = error
+            self._append({"source": source, "error": error})
+
+    def _append(self, entry: Dict[str, Any]) -> None:
+        with open(self.path, 'a', encoding='utf-8') as f:
+            if self._pending_newline:
+                f.write("\n")
+                self._pending_newline = False
+            f.write(json.dumps(entry) + "\n")
+
+
+class Progress:
+    """Aggregate throughput and ETA reporting for a backfill run."""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.features = 0
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, inserted: Optional[int]) -> None:
+        with self._lock:
+            self.done += 1
+            if inserted is None:
+                self.failed += 1
+            else:
+                self.features += inserted
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            elapsed = max(time.monotonic() - self.started, 1e-9)
+            files_per_sec = self.done / elapsed
+            remaining = self.total - self.done
+            eta = remaining / files_per_sec if files_per_sec > 0 else None
+            return {
+                "done": self.done,
+                "total": self.total,
+                "failed": self.failed,
+                "features": self.features,
+                "elapsed_s": round(elapsed, 2),
+                "files_per_s": round(files_per_sec, 2),
+                "features_per_s": round(self.features / elapsed, 2),
+                "eta_s": round(eta, 1) if eta is not None else None,
+            }
+
+    def log(self) -> None:
+        s = self.snapshot()
+        eta = f"{s['eta_s']}s" if s["eta_s"] is not None else "unknown"
+        logger.info(f"Progress: {s['done']}/{s['total']} files ({s['failed']} failed), "
+                    f"{s['features']} features, {s['files_per_s']} files/s, "
+                    f"{s['features_per_s']} features/s, ETA {eta}")
+
+
+def run_backfill(sources: List[str], process_one: Callable[[str], int],
+                 checkpoint: Checkpoint, workers: int = 4,
+                 retry_failed: bool = True, log_every: int = 10) -> Dict[str, Any]:
+    """
+    Process sources with a worker pool, skipping those already checkpointed.
+
+    Args:
+        sources: Source identifiers (local paths or S3 keys)
+        process_one: Callable that ingests one source and returns features inserted
+        checkpoint: Checkpoint used to skip finished work and record results
+        workers: Number of concurrent workers
+        retry_failed: Whether sources that failed in a previous run are retried
+        log_every: Log aggregate progress after this many completed sources
+
+    Returns:
+        Summary dictionary with counts, throughput and elapsed time
+    """
+    pending = [
+        s for s in sources
+        if s not in checkpoint.completed and (retry_failed or s not in checkpoint.failed)
+    ]
+    skipped = len(sources) - len(pending)
+    if skipped:
+        logger.info(f"Skipping {skipped} source(s) already recorded in checkpoint")
+
+    progress = Progress(len(pending))
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(process_one, source): source for source in pending}
+        for future in as_completed(futures):
+            source = futures[future]
+            try:
+                inserted = future.result()
+                checkpoint.mark_completed(source, inserted)
+                progress.record(inserted)
+            except Exception as e:
+                logger.error(f"Failed to process {source}: {e}")
+                checkpoint.mark_failed(source, f"{type(e).__name__}: {e}")
+                progress.record(None)
+            if progress.done % log_every == 0 or progress.done == progress.total:
+                progress.log()
+
+    summary = progress.snapshot()
+    summary["skipped"] = skipped
+    return summary
+
+
+def make_s3_processor(bucket: str, client: Any) -> Callable[[str], int]:
+    """
+    Build a worker function that downloads one S3 object and processes it.
+
+    Args:
+        bucket: S3 bucket name
+        client: boto3 S3 client (shared between worker threads)
+
+    Returns:
+        Callable taking an object key and returning features inserted
+    """
+    def process_key(key: str) -> int:
+        safe_filename = re.sub(r'[^a-zA-Z0-9._-]', '_', os.path.basename(key))
+        fd, tmp_path = tempfile.mkstemp(suffix=f"_{safe_filename}")
+        os.close(fd)
+        try:
+            client.download_file(bucket, key, tmp_path)
+            return process_geojson(tmp_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    return process_key
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Reprocess GeoJSON objects in bulk")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--bucket", help="S3 bucket to list")
+    source.add_argument("--local-dir", help="Local directory to process instead of S3")
+    parser.add_argument("--prefix", default="", help="S3 key prefix (with --bucket)")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("BACKFILL_WORKERS", "4")),
+                        help="Number of concurrent workers")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT,
+                        help="Checkpoint file used to resume interrupted runs")
+    parser.add_argument("--no-retry-failed", action="store_true",
+                        help="Do not retry sources that failed in a previous run")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    if args.bucket:
+        import boto3
+        client = boto3.client("s3")
+        sources = list_s3_sources(args.bucket, args.prefix, client)
+        process_one = make_s3_processor(args.bucket, client)
+    else:
+        sources = list_local_sources(args.local_dir)
+        process_one = process_geojson
+
+    logger.info(f"Found {len(sources)} source(s) to backfill with {args.workers} worker(s)")
+    checkpoint = Checkpoint(args.checkpoint)
+    summary = run_backfill(sources, process_one, checkpoint, workers=args.workers,
+                           retry_failed=not args.no_retry_failed)
+    print(json.dumps(summary, indent=2))
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""
+Process-wide bounded PostgreSQL connection pool with wait metrics.
+
+Wraps psycopg2's ThreadedConnectionPool, which raises immediately when it is
+exhausted, with a semaphore so callers wait (up to a timeout) for a free
+connection instead. Wait times are recorded so pool pressure is visible.
+
+Returned connections are kept open in the wrapper rather than handed back to
+psycopg2, which closes every returned connection beyond minconn: with the
+default DB_POOL_MIN=1 nearly every borrow would open a new connection and
+lose its prepared statements.
+"""
+import time
+import threading
+import logging
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection becomes available within the pool timeout."""
+
+
+class BoundedConnectionPool:
+    """
+    Thread-safe pool of at most maxconn connections.
+
+    Args:
+        minconn: Connections opened eagerly
+        maxconn: Upper bound on open connections, all kept open once opened
+        timeout: Seconds to wait for a free connection before PoolTimeoutError
+        **connect_kwargs: Passed to psycopg2.connect
+    """
+
+    def __init__(self, minconn: int, maxconn: int, timeout: float = 5.0, **connect_kwargs):
+        from psycopg2.pool import ThreadedConnectionPool  # Lazy import, as in entrypoint
+
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self._pool = ThreadedConnectionPool(minconn, maxconn, **connect_kwargs)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._idle = deque()
+        self._in_use = 0
+        self._acquired = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._recent_waits = deque(maxlen=1000)
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a connection for the duration of the with-block.
+
+        The connection is rolled back if the block raises or leaves a
+        transaction open, and discarded if it was closed by the server.
+        """
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._timeouts += 1
+            raise PoolTimeoutError(f"No database connection available within {self.timeout}s")
+        waited = time.monotonic() - started
+
+        try:
+            conn = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._in_use += 1
+            self._acquired += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+            self._recent_waits.append(waited)
+
+        broken = False
+        try:
+            yield conn
+        except Exception:
+            broken = self._reset(conn)
+            raise
+        else:
+            broken = self._reset(conn)
+        finally:
+            if broken or conn.closed:
+                self._pool.putconn(conn, close=True)
+                with self._lock:
+                    self._in_use -= 1
+            else:
+                with self._lock:
+                    self._idle.append(conn)
+                    self._in_use -= 1
+            self._slots.release()
+
+    def _checkout(self):
+        """Most recently returned idle connection, else one from the psycopg2 pool."""
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._pool.getconn()
+
+    @staticmethod
+    def _reset(conn) -> bool:
+        """Roll back any open transaction; return True if the connection is unusable."""
+        if conn.closed:
+            return True
+        try:
+            conn.rollback()
+            return False
+        except Exception as e:
+            logger.warning(f"Discarding pooled connection after failed rollback: {e}")
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of pool usage and wait-time metrics (milliseconds)."""
+        with self._lock:
+            waits = sorted(self._recent_waits)
+            acquired = self._acquired
+            return {
+                "max_size": self.maxconn,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "acquired": acquired,
+                "timeouts": self._timeouts,
+                "wait_ms_avg": round(self._wait_total / acquired * 1000, 3) if acquired else 0.0,
+                "wait_ms_p50": round(_percentile(waits, 50) * 1000, 3),
+                "wait_ms_p99": round(_percentile(waits, 99) * 1000, 3),
+                "wait_ms_max": round(self._wait_max * 1000, 3),
+            }
+
+    def close(self) -> None:
+        # Idle connections are still checked out of the psycopg2 pool, so
+        # closeall closes them too
+        with self._lock:
+            self._idle.clear()
+        self._pool.closeall()
+
+
+def _percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+_pool: Optional[BoundedConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(factory) -> BoundedConnectionPool:
+    """
+    Return the process-wide pool, creating it with factory() on first use.
+
+    Creation is lazy so that each pre-forked server worker builds its own
+    pool after the fork rather than sharing sockets with its parent.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = factory()
+    return _pool
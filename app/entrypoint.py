@@ -2,14 +2,37 @@
 Core GeoJSON processing module for Lambda and local execution.
 """
 import os
-import json
+import io
+import gzip
 import logging
 # Lazy import psycopg2 to allow Lambda to start even if import fails
 # import psycopg2  # Moved inside function
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple, BinaryIO
+
+import json_backend
+from upload_stats import (
+    UploadStats, UPLOADS_DDL, INGEST_GENERATION_DDL, new_upload_id, record_upload, bump_generation
+)
+from reproject import detect_crs, default_source_crs, is_wgs84, reproject_geometries
+from grid_aggregates import GRID_CELLS_DDL, grid_aggregates_enabled, update_grid_cells
+from ingest_progress import INGEST_PROGRESS_DDL
+from overlaps import overlap_policy, apply_overlap_policy
 
 logger = logging.getLogger(__name__)
 
+GEOJSON_EXTENSIONS = ('.geojson', '.json')
+# Newline- or RS-delimited features (RFC 8142 GeoJSON text sequences)
+GEOJSONSEQ_EXTENSIONS = ('.geojsonl', '.geojsons', '.geojsonseq')
+COMPRESSION_EXTENSIONS = {'.gz': 'gzip', '.zst': 'zstd'}
+SUPPORTED_EXTENSIONS = tuple(
+    base + suffix
+    for base in GEOJSON_EXTENSIONS + GEOJSONSEQ_EXTENSIONS
+    for suffix in ('',) + tuple(COMPRESSION_EXTENSIONS)
+)
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
 
 def get_db_conn():  # Type hint removed since psycopg2 is lazy imported
     """
@@ -74,6 +97,84 @@ def get_db_conn():  # Type hint removed since psycopg2 is lazy imported
                 raise
 
 
+def detect_compression(filepath: str) -> Optional[str]:
+    """
+    Detect the compression of a file by extension, falling back to magic bytes.
+    
+    Args:
+        filepath: Path to the input file
+        
+    Returns:
+        "gzip", "zstd" or None for uncompressed input
+    """
+    _, ext = os.path.splitext(filepath.lower())
+    if ext in COMPRESSION_EXTENSIONS:
+        return COMPRESSION_EXTENSIONS[ext]
+    with open(filepath, 'rb') as f:
+        magic = f.read(4)
+    if magic.startswith(GZIP_MAGIC):
+        return "gzip"
+    if magic.startswith(ZSTD_MAGIC):
+        return "zstd"
+    return None
+
+
+def is_geojson_seq(filepath: str) -> bool:
+    """Return True if the file name denotes a GeoJSON text sequence."""
+    name = filepath.lower()
+    root, ext = os.path.splitext(name)
+    if ext in COMPRESSION_EXTENSIONS:
+        name = root
+    return name.endswith(GEOJSONSEQ_EXTENSIONS)
+
+
+def open_geojson_binary(filepath: str) -> BinaryIO:
+    """
+    Open a (possibly compressed) GeoJSON file as a decompressing binary stream.
+    
+    Decompression happens on the fly as the stream is read; no uncompressed
+    copy is written to disk.
+    
+    Raises:
+        ValueError: If the input is zstd-compressed and zstandard is not installed
+    """
+    compression = detect_compression(filepath)
+    if compression == "gzip":
+        return gzip.open(filepath, 'rb')
+    if compression == "zstd":
+        try:
+            import zstandard  # Optional dependency, only needed for .zst input
+        except ImportError:
+            raise ValueError("zstd-compressed input requires the 'zstandard' package")
+        reader = zstandard.ZstdDecompressor().stream_reader(open(filepath, 'rb'), closefd=True)
+        # Buffered wrapper adds readline/iteration, which the raw reader lacks
+        return io.BufferedReader(reader)
+    return open(filepath, 'rb')
+
+
+def read_geojson_seq(stream: BinaryIO) -> List[Dict[str, Any]]:
+    """
+    Read features from a binary GeoJSON text sequence, one JSON text per line.
+    
+    Leading RS (0x1E) separators are stripped; FeatureCollection members are
+    flattened into their features.
+    """
+    features = []
+    for line_no, line in enumerate(stream, 1):
+        line = line.strip().lstrip(b'\x1e')
+        if not line:
+            continue
+        try:
+            item = json_backend.loads(line)
+        except json_backend.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON on line {line_no} of GeoJSON sequence: {e}")
+        if isinstance(item, dict) and item.get("type") == "FeatureCollection":
+            features.extend(item.get("features", []))
+        else:
+            features.append(item)
+    return features
+
+
 def validate_geojson_feature(feature: Dict[str, Any], index: int) -> Dict[str, Any]:
     """
     Validate a GeoJSON feature using Shapely for geometry validation.
@@ -85,6 +186,26 @@ def validate_geojson_feature(feature: Dict[str, Any], index: int) -> Dict[str, A
     Returns:
         Validated feature dictionary
         
+    Raises:
+        ValueError: If feature is invalid
+    """
+    return validate_feature_geometry(feature, index)[0]
+
+
+def validate_feature_geometry(feature: Dict[str, Any], index: int) -> Tuple[Dict[str, Any], Any]:
+    """
+    Validate a GeoJSON feature and return it with its parsed Shapely geometry.
+    
+    The geometry is kept so the insert path can send WKB instead of
+    re-serializing the GeoJSON geometry for every feature.
+    
+    Args:
+        feature: Feature dictionary to validate
+        index: Feature index for error reporting
+        
+    Returns:
+        Tuple of (feature, Shapely geometry or None when Shapely is unavailable)
+        
     Raises:
         ValueError: If feature is invalid
     """
@@ -101,7 +222,7 @@ def validate_geojson_feature(feature: Dict[str, Any], index: int) -> Dict[str, A
             raise ValueError(f"Feature {index}: Feature type must be 'Feature'")
         if "geometry" not in feature:
             raise ValueError(f"Feature {index}: Feature must have a 'geometry' field")
-        return feature
+        return feature, None
     
     # Validate feature structure
     if not isinstance(feature, dict):
@@ -129,33 +250,90 @@ def validate_geojson_feature(feature: Dict[str, Any], index: int) -> Dict[str, A
     except Exception as e:
         raise ValueError(f"Feature {index}: Geometry validation failed: {str(e)}")
     
-    return feature
+    return feature, shapely_geom
+
+
+def dedup_enabled() -> bool:
+    """Return True if geometry-hash deduplication is enabled via GEO_DEDUP."""
+    return os.getenv("GEO_DEDUP", "false").lower() in ("1", "true", "yes")
 
 
-def process_geojson(filepath: str) -> int:
+def process_geojson(filepath: str, conn=None, dedup: Optional[bool] = None,
+                    upload_id: Optional[str] = None) -> int:
     """
     Process a GeoJSON file and insert features into PostGIS database.
     Enhanced with validation similar to geojson-ingestion-saas.
     
     Args:
-        filepath: Path to the GeoJSON file to process
+        filepath: Path to the GeoJSON file to process. gzip (.gz) and zstd
+            (.zst) input is decompressed on the fly; .geojsonl/.geojsons are
+            read as GeoJSON text sequences. Input declaring another CRS
+            through a legacy crs member (or GEO_SOURCE_CRS) is reprojected
+            to EPSG:4326.
+        conn: Optional open psycopg2 connection to reuse (e.g. across an SQS
+            batch). The caller owns the transaction and must commit. When
+            omitted a new connection is opened and committed for this file.
+        dedup: Skip features whose normalized geometry and name already exist.
+            Defaults to the GEO_DEDUP environment variable.
+        upload_id: Id the inserted rows are tagged with and summarized under
+            in the uploads table. A new id is generated when omitted.
         
     Returns:
         Number of features inserted
         
     Raises:
         FileNotFoundError: If file doesn't exist
-        json.JSONDecodeError: If file is not valid JSON
-        ValueError: If GeoJSON structure is invalid
+        json.JSONDecodeError: If file is not valid JSON (raised by the
+            active json_backend; orjson's error subclasses it)
+        ValueError: If GeoJSON structure is invalid or compression unsupported
         psycopg2.Error: If database operation fails
     """
+    return ingest_geojson(filepath, conn=conn, dedup=dedup, upload_id=upload_id)["inserted"]
+
+
+def ingest_geojson(filepath: str, conn=None, dedup: Optional[bool] = None,
+                   upload_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Process a GeoJSON file like process_geojson and return an ingestion summary.
+    
+    Args:
+        filepath: Path to the GeoJSON file to process
+        conn: Optional open psycopg2 connection (see process_geojson)
+        dedup: Enable geometry-hash deduplication (see process_geojson)
+        upload_id: Upload id for the rows and summary (see process_geojson)
+        
+    Returns:
+        Summary dictionary with keys features, valid, inserted, duplicates,
+        errors and upload_id
+        
+    Raises:
+        Same as process_geojson
+    """
+    features, crs = load_features(filepath)
+    return ingest_features(features, conn=conn, dedup=dedup, source=filepath,
+                           upload_id=upload_id, crs=crs)
+
+
+def load_features(filepath: str) -> Tuple[List[Any], Optional[str]]:
+    """
+    Read and structurally check a GeoJSON file (see process_geojson for formats).
+    
+    Returns:
+        Tuple of (features, declared CRS or None)
+        
+    Raises:
+        Same as process_geojson, except database errors
+    """
     if not os.path.exists(filepath):
         raise FileNotFoundError(f"GeoJSON file not found: {filepath}")
     
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-    except json.JSONDecodeError as e:
+        with open_geojson_binary(filepath) as f:
+            if is_geojson_seq(filepath):
+                data = {"type": "FeatureCollection", "features": read_geojson_seq(f)}
+            else:
+                data = json_backend.load(f)
+    except json_backend.JSONDecodeError as e:
         logger.error(f"Invalid JSON in file {filepath}: {e}")
         raise
 
@@ -170,79 +348,365 @@ def process_geojson(filepath: str) -> int:
     if not isinstance(features, list):
         raise ValueError("Features must be an array")
     
+    return features, detect_crs(data)
+
+
+def ingest_features(features: List[Any], conn=None, dedup: Optional[bool] = None,
+                    source: str = "features", upload_id: Optional[str] = None,
+                    crs: Optional[str] = None, first_index: int = 0,
+                    overlaps: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Validate and insert already-parsed GeoJSON features.
+    
+    Shared by ingest_geojson and the shard workers in splitter.py, which
+    parse byte ranges of a FeatureCollection rather than whole files.
+    
+    Args:
+        features: List of GeoJSON feature dictionaries
+        conn: Optional open psycopg2 connection (see process_geojson)
+        dedup: Enable geometry-hash deduplication (see process_geojson)
+        source: Label used in log messages and recorded as the upload source
+        upload_id: Upload id for the rows and summary (see process_geojson);
+            shards of one file pass the same id so their statistics merge
+        crs: Declared CRS of the features; None means WGS84 unless
+            GEO_SOURCE_CRS is set. Other CRSs are reprojected to EPSG:4326.
+        first_index: Position of features[0] in the file, for batches of a
+            larger file (see ingest_progress.py); used in log messages and
+            generated names
+        overlaps: Overlap policy (off, tag, skip or merge, see overlaps.py).
+            Defaults to the GEO_OVERLAP_POLICY environment variable.
+        
+    Returns:
+        Summary dictionary with keys features, valid, inserted, duplicates,
+        errors and upload_id, plus overlaps (counts) when a policy is active
+    
+    Raises:
+        RuntimeError: If an insert failed on a caller's connection, whose
+            transaction is then aborted and must be rolled back
+    """
+    if dedup is None:
+        dedup = dedup_enabled()
+    if overlaps is None:
+        overlaps = overlap_policy()
+    if upload_id is None:
+        upload_id = new_upload_id()
+    summary = {"features": 0, "valid": 0, "inserted": 0, "duplicates": 0, "errors": 0,
+               "upload_id": upload_id}
+    
     if not features:
-        logger.warning(f"No features found in {filepath}")
-        return 0
+        logger.warning(f"No features found in {source}")
+        return summary
 
-    logger.info(f"Processing {len(features)} features from {filepath}")
+    summary["features"] = len(features)
+    logger.info(f"Processing {len(features)} features from {source}")
     
     # Validate and process features
     validated_features = []
     for i, feature in enumerate(features):
         try:
-            validated_feature = validate_geojson_feature(feature, i)
-            validated_features.append(validated_feature)
+            validated_features.append(validate_feature_geometry(feature, first_index + i))
         except ValueError as e:
-            logger.warning(f"Feature {i} validation failed: {e}")
+            logger.warning(f"Feature {first_index + i} validation failed: {e}")
             continue
         except Exception as e:
-            logger.warning(f"Feature {i} validation error: {e}")
+            logger.warning(f"Feature {first_index + i} validation error: {e}")
             continue
     
     if not validated_features:
-        logger.warning(f"No valid features found in {filepath}")
-        return 0
+        logger.warning(f"No valid features found in {source}")
+        return summary
     
+    summary["valid"] = len(validated_features)
     logger.info(f"Validated {len(validated_features)} out of {len(features)} features")
     
+    if crs is None:
+        crs = default_source_crs()
+    if not is_wgs84(crs):
+        validated_features = _reproject_validated(validated_features, crs)
+    
     try:
+        if conn is not None:
+            summary.update(_insert_features(conn, validated_features, dedup, upload_id, source,
+                                            first_index, overlaps))
+            if summary["errors"]:
+                # The failed statement aborted the caller's transaction, so its
+                # commit would silently roll back; make the caller roll back instead
+                raise RuntimeError(f"{summary['errors']} feature insert(s) failed for {source}; "
+                                   f"the transaction is aborted")
+            return summary
         with get_db_conn() as conn:
-            with conn.cursor() as cur:
-                # Ensure table exists with proper schema
-                cur.execute("""
-                    CREATE EXTENSION IF NOT EXISTS postgis;
-                    CREATE TABLE IF NOT EXISTS geo_data (
-                        id SERIAL PRIMARY KEY,
-                        name TEXT,
-                        geom GEOMETRY(Geometry, 4326),
-                        uploaded_at TIMESTAMP DEFAULT NOW()
-                    );
-                    CREATE INDEX IF NOT EXISTS idx_geo_data_geom ON geo_data USING GIST (geom);
-                """)
-                conn.commit()
-                
-                inserted_count = 0
-                errors = []
-                
-                for idx, feature in enumerate(validated_features):
-                    try:
-                        properties = feature.get("properties", {})
-                        name = properties.get("name") or properties.get("NAME") or properties.get("id") or f"Feature_{idx}"
-                        geometry = feature.get("geometry")
-                        
-                        if not geometry:
-                            logger.warning(f"Skipping feature {idx}: no geometry")
-                            continue
-                        
-                        geom_json = json.dumps(geometry)
-                        cur.execute(
-                            "INSERT INTO geo_data (name, geom) VALUES (%s, ST_SetSRID(ST_GeomFromGeoJSON(%s), 4326))",
-                            (name, geom_json)
-                        )
-                        inserted_count += 1
-                    except Exception as e:
-                        error_msg = f"Error inserting feature {idx}: {e}"
-                        logger.error(error_msg)
-                        errors.append(error_msg)
-                        # Continue processing other features
-                        continue
-                
-                conn.commit()
-                logger.info(f"Successfully inserted {inserted_count} features into database")
-                if errors:
-                    logger.warning(f"Encountered {len(errors)} errors during processing")
-                return inserted_count
-                
+            summary.update(_insert_features(conn, validated_features, dedup, upload_id, source,
+                                            first_index, overlaps))
+            conn.commit()
+            return summary
     except Exception as e:
-        logger.error(f"Database error while processing {filepath}: {e}")
+        logger.error(f"Database error while processing {source}: {e}")
         raise
+
+
+def _reproject_validated(validated_features: List[Tuple[Dict[str, Any], Any]],
+                         crs: str) -> List[Tuple[Dict[str, Any], Any]]:
+    """Reproject the Shapely geometries of validated pairs from crs to EPSG:4326 in bulk."""
+    if any(geom is None for _, geom in validated_features):
+        raise ValueError(f"Input is in {crs}; reprojecting to EPSG:4326 requires Shapely")
+    geoms = reproject_geometries([geom for _, geom in validated_features], crs)
+    return [(feature, geom) for (feature, _), geom in zip(validated_features, geoms)]
+
+
+_schema_ready = False
+_dedup_index_ready = False
+
+SCHEMA_DDL = """
+    CREATE EXTENSION IF NOT EXISTS postgis;
+    CREATE TABLE IF NOT EXISTS geo_data (
+        id SERIAL PRIMARY KEY,
+        name TEXT,
+        geom GEOMETRY(Geometry, 4326),
+        uploaded_at TIMESTAMP DEFAULT NOW()
+    );
+    CREATE INDEX IF NOT EXISTS idx_geo_data_geom ON geo_data USING GIST (geom);
+    ALTER TABLE geo_data ADD COLUMN IF NOT EXISTS geom_hash TEXT;
+    ALTER TABLE geo_data ADD COLUMN IF NOT EXISTS upload_id TEXT;
+    CREATE INDEX IF NOT EXISTS idx_geo_data_upload_id ON geo_data (upload_id);
+    ALTER TABLE geo_data ADD COLUMN IF NOT EXISTS overlap_count INTEGER;
+"""
+
+# Serializes the table DDL of concurrent cold starts; a separate key guards
+# the (possibly long) dedup index build so they do not queue behind it
+SCHEMA_LOCK_SQL = "SELECT pg_advisory_lock(hashtext('geo_data:schema'))"
+SCHEMA_UNLOCK_SQL = "SELECT pg_advisory_unlock(hashtext('geo_data:schema'))"
+DEDUP_INDEX_TRY_LOCK_SQL = "SELECT pg_try_advisory_lock(hashtext('geo_data:dedup_index'))"
+DEDUP_INDEX_STATE_SQL = """
+    SELECT i.indisvalid FROM pg_index i
+    JOIN pg_class c ON c.oid = i.indexrelid
+    WHERE c.relname = 'idx_geo_data_dedup'
+"""
+# CONCURRENTLY does not block writes to geo_data, but cannot run in a transaction
+DEDUP_INDEX_DDL = "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_geo_data_dedup ON geo_data (geom_hash, name)"
+DROP_DEDUP_INDEX_SQL = "DROP INDEX CONCURRENTLY IF EXISTS idx_geo_data_dedup"
+
+
+def ensure_schema(dedup: bool = False) -> None:
+    """
+    Create the PostGIS extension, geo_data, uploads, grid_cells,
+    ingest_progress and ingest_generation tables and indexes if missing.
+    
+    Runs once per process (warm Lambda containers skip it) on its own
+    short-lived autocommit connection, so DDL locks are never held in, and
+    nothing is committed on, a caller's ingest transaction.
+    
+    The dedup index is only needed by dedup ingests, so it is only built
+    when dedup is requested, with CREATE INDEX CONCURRENTLY, which does not
+    block writes. An invocation that finds another one building it carries
+    on without waiting; its dedup inserts then fail in
+    require_dedup_index until the build is done. On a large existing
+    geo_data, create the index ahead of time from db/init.sql instead of
+    during a cold start.
+    
+    Args:
+        dedup: Also make sure idx_geo_data_dedup exists
+    """
+    global _schema_ready, _dedup_index_ready
+    if _schema_ready and (_dedup_index_ready or not dedup):
+        return
+    conn = get_db_conn()
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            if not _schema_ready:
+                cur.execute(SCHEMA_LOCK_SQL)
+                try:
+                    cur.execute(SCHEMA_DDL)
+                    cur.execute(UPLOADS_DDL)
+                    cur.execute(GRID_CELLS_DDL)
+                    cur.execute(INGEST_PROGRESS_DDL)
+                    cur.execute(INGEST_GENERATION_DDL)
+                finally:
+                    cur.execute(SCHEMA_UNLOCK_SQL)
+                _schema_ready = True
+            if dedup:
+                _dedup_index_ready = _ensure_dedup_index(cur)
+    finally:
+        conn.close()
+
+
+def _ensure_dedup_index(cur) -> bool:
+    """
+    Build idx_geo_data_dedup concurrently unless it exists or is being built.
+    
+    Returns:
+        True if the index is valid afterwards
+    """
+    cur.execute(DEDUP_INDEX_STATE_SQL)
+    row = cur.fetchone()
+    if row and row[0]:
+        return True
+    cur.execute(DEDUP_INDEX_TRY_LOCK_SQL)
+    if not cur.fetchone()[0]:
+        logger.info("idx_geo_data_dedup is being built by another process")
+        return False
+    # A failed concurrent build leaves an invalid index behind; rebuild it
+    if row:
+        logger.warning("Rebuilding invalid idx_geo_data_dedup")
+        cur.execute(DROP_DEDUP_INDEX_SQL)
+    logger.info("Building idx_geo_data_dedup concurrently")
+    cur.execute(DEDUP_INDEX_DDL)
+    return True
+
+
+def require_dedup_index(cur) -> None:
+    """
+    Make sure idx_geo_data_dedup is valid before ON CONFLICT relies on it.
+    
+    Raises:
+        RuntimeError: If the index is missing, still being built or invalid
+    """
+    global _dedup_index_ready
+    if _dedup_index_ready:
+        return
+    cur.execute(DEDUP_INDEX_STATE_SQL)
+    row = cur.fetchone()
+    if not (row and row[0]):
+        raise RuntimeError("Deduplication requires idx_geo_data_dedup, which is "
+                           f"{'still being built or invalid' if row else 'missing'}; "
+                           "create it from db/init.sql or retry once the build is done")
+    _dedup_index_ready = True
+
+
+# Geometry is sent as WKB from the Shapely geometry built during validation;
+# GeoJSON text is only used when Shapely is unavailable.
+GEOM_FROM_WKB = "ST_GeomFromWKB(%s, 4326)"
+GEOM_FROM_GEOJSON = "ST_SetSRID(ST_GeomFromGeoJSON(%s), 4326)"
+
+# Rows inserted without dedup leave geom_hash NULL and never conflict, since
+# NULLs are distinct in a unique index. {tag_column}/{tag_value} add
+# overlap_count under the tag overlap policy (see _insert_sql).
+INSERT_SQL = "INSERT INTO geo_data (name, geom, upload_id{tag_column}) VALUES (%s, {geom}, %s{tag_value})"
+INSERT_DEDUP_SQL = """
+    INSERT INTO geo_data (name, geom, upload_id{tag_column}, geom_hash)
+    SELECT %s, g, upload_id{tag_column}, md5(ST_AsBinary(ST_Normalize(g)))
+    FROM (SELECT {geom} AS g, %s::text AS upload_id{tag_value}) AS src
+    ON CONFLICT (geom_hash, name) DO NOTHING
+"""
+
+
+def _insert_sql(geom_sql: str, dedup: bool, tagged: bool) -> str:
+    """The per-feature INSERT, taking (name, geometry, upload_id[, overlap_count])."""
+    if not tagged:
+        return (INSERT_DEDUP_SQL if dedup else INSERT_SQL).format(geom=geom_sql, tag_column="", tag_value="")
+    if dedup:
+        return INSERT_DEDUP_SQL.format(geom=geom_sql, tag_column=", overlap_count",
+                                       tag_value=", %s::integer AS overlap_count")
+    return INSERT_SQL.format(geom=geom_sql, tag_column=", overlap_count", tag_value=", %s")
+
+
+def _geometry_params(validated_features: List[Tuple[Dict[str, Any], Any]]) -> Tuple[str, List[Any]]:
+    """
+    Build the per-feature geometry parameters for the insert statement.
+    
+    Returns:
+        Tuple of (SQL geometry expression, list of WKB bytes or GeoJSON strings)
+    """
+    geoms = [geom for _, geom in validated_features]
+    if geoms and all(geom is not None for geom in geoms):
+        import shapely
+        # One vectorized call for the whole file; 2D to match the geom column
+        return GEOM_FROM_WKB, [bytes(wkb) for wkb in shapely.to_wkb(geoms, output_dimension=2)]
+    return GEOM_FROM_GEOJSON, [json_backend.dumps(feature.get("geometry")) for feature, _ in validated_features]
+
+
+def _insert_features(conn, validated_features: List[Tuple[Dict[str, Any], Any]],
+                     dedup: bool = False, upload_id: Optional[str] = None,
+                     source: str = "features", first_index: int = 0,
+                     overlaps: str = "off") -> Dict[str, Any]:
+    """
+    Insert validated features using an open connection without committing.
+    
+    Rows are tagged with upload_id. The statistics of the rows actually
+    inserted are upserted into the uploads table, and their grid cells into
+    grid_cells, in the same transaction, which finally bumps the ingest
+    generation so cached API responses are invalidated on commit. With an
+    overlap policy, the batch is first checked against itself and the
+    existing rows in its extent (see overlaps.py).
+    
+    Args:
+        conn: Open psycopg2 connection
+        validated_features: (feature, geometry) pairs from validate_feature_geometry
+        dedup: Use ON CONFLICT on the normalized geometry hash and name
+        upload_id: Upload id for the rows and summary row
+        source: Recorded as the upload source
+        first_index: Offset added to feature numbers in generated names
+        overlaps: Overlap policy; "off" skips the check
+        
+    Returns:
+        Dictionary with inserted, duplicates and errors counts, plus the
+        overlaps summary when a policy is active
+    """
+    ensure_schema(dedup=dedup)
+    if dedup:
+        with conn.cursor() as cur:
+            require_dedup_index(cur)
+    overlap_summary, overlap_counts = None, None
+    if overlaps != "off":
+        with conn.cursor() as cur:
+            validated_features, overlap_counts, overlap_summary = apply_overlap_policy(
+                cur, validated_features, overlaps)
+        logger.info(f"Overlaps in batch: {overlap_summary}")
+    geom_sql, geom_params = _geometry_params(validated_features)
+    insert_sql = _insert_sql(geom_sql, dedup, tagged=overlap_counts is not None)
+    with conn.cursor() as cur:
+        inserted_count = 0
+        duplicate_count = 0
+        errors = []
+        stats = UploadStats()
+        inserted_geoms = []
+        
+        for idx, (feature, shapely_geom) in enumerate(validated_features):
+            try:
+                properties = feature.get("properties") or {}
+                name = properties.get("name") or properties.get("NAME") or properties.get("id") or f"Feature_{first_index + idx}"
+                geometry = feature.get("geometry")
+                
+                if not geometry:
+                    logger.warning(f"Skipping feature {idx}: no geometry")
+                    continue
+                
+                params = (name, geom_params[idx], upload_id)
+                if overlap_counts is not None:
+                    params += (overlap_counts[idx],)
+                cur.execute(insert_sql, params)
+                if dedup and cur.rowcount == 0:
+                    duplicate_count += 1
+                else:
+                    inserted_count += 1
+                    if shapely_geom is not None:
+                        inserted_geoms.append(shapely_geom)
+                    else:
+                        stats.add_geojson(geometry)
+            except Exception as e:
+                error_msg = f"Error inserting feature {idx}: {e}"
+                logger.error(error_msg)
+                errors.append(error_msg)
+                # Continue processing other features
+                continue
+        
+        if errors:
+            # A failed statement aborts the transaction, so nothing is summarized
+            logger.warning(f"Not recording upload {upload_id}: insert errors occurred")
+        elif upload_id is not None:
+            stats.add_geometries(inserted_geoms)
+            record_upload(cur, upload_id, source, stats)
+        if not errors and grid_aggregates_enabled():
+            update_grid_cells(cur, inserted_geoms)
+        if not errors and inserted_count:
+            bump_generation(cur)
+        
+        logger.info(f"Successfully inserted {inserted_count} features into database")
+        if dedup:
+            logger.info(f"Skipped {duplicate_count} duplicate features")
+        if errors:
+            logger.warning(f"Encountered {len(errors)} errors during processing")
+        result = {"inserted": inserted_count, "duplicates": duplicate_count, "errors": len(errors)}
+        if overlap_summary is not None:
+            result["overlaps"] = overlap_summary
+        return result
@@ -0,0 +1,313 @@
+"""
+Constant-memory export of geo_data to GeoJSONSeq, FlatGeobuf or GeoParquet.
+
+Rows are read through a server-side (named) cursor in fixed-size batches, so
+neither the database client nor the writer ever holds more than one batch.
+Output is produced as an iterator of byte chunks that the /export endpoint
+streams as the HTTP response body and the CLI writes to a file or stdout.
+
+- GeoJSONSeq: one feature per line; geometry rendered by ST_AsGeoJSON.
+- GeoParquet: one Arrow record batch (WKB geometry column) per row group,
+  with GeoParquet 1.0 "geo" metadata.
+- FlatGeobuf: written with fiona to a temporary file (the format's header is
+  only complete once all features are written) and streamed from there.
+
+Usage:
+    python export.py --format parquet --output geo_data.parquet
+    python export.py --format geojsonseq --bbox -10,40,5,52 --upload-id 3f2a... > out.geojsonl
+"""
+import os
+import sys
+import uuid
+import argparse
+import logging
+import tempfile
+from typing import Dict, Any, List, Iterator, Optional, Tuple
+
+import json_backend
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 5000
+READ_CHUNK_SIZE = 1024 * 1024
+
+EXPORT_FORMATS = {
+    # name -> (content type, file extension)
+    "geojsonseq": ("application/geo+json-seq", ".geojsonl"),
+    "fgb": ("application/octet-stream", ".fgb"),
+    "parquet": ("application/vnd.apache.parquet", ".parquet"),
+}
+
+
+def table_has_properties(conn) -> bool:
+    """
+    Whether geo_data has a properties column.
+
+    The Flask app's table stores feature properties; the Lambda schema
+    (db/init.sql) does not.
+    """
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'geo_data' AND column_name = 'properties'
+        """)
+        return cur.fetchone() is not None
+
+
+def build_query(geometry_sql: str, with_properties: bool,
+                bbox: Optional[Tuple[float, float, float, float]] = None,
+                upload_id: Optional[str] = None,
+                limit: Optional[int] = None) -> Tuple[str, List[Any]]:
+    """
+    Build the export SELECT and its parameters.
+
+    Rows are (id, name, upload_id, properties, geometry), ordered by id.
+
+    Args:
+        geometry_sql: Expression rendering geom, e.g. ST_AsBinary(geom)
+        with_properties: Select the properties column (else NULL)
+        bbox: Optional (minx, miny, maxx, maxy) filter using the GIST index
+        upload_id: Optional upload filter
+        limit: Optional maximum number of rows
+    """
+    conditions, params = [], []
+    if bbox is not None:
+        conditions.append("geom && ST_MakeEnvelope(%s, %s, %s, %s, 4326)")
+        params.extend(bbox)
+    if upload_id is not None:
+        conditions.append("upload_id = %s")
+        params.append(upload_id)
+    sql = (f"SELECT id, name, upload_id, {'properties' if with_properties else 'NULL'}, {geometry_sql} "
+           f"FROM geo_data")
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY id"
+    if limit is not None:
+        sql += " LIMIT %s"
+        params.append(limit)
+    return sql, params
+
+
+def iter_batches(conn, geometry_sql: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                 **filters) -> Iterator[List[tuple]]:
+    """
+    Yield lists of at most batch_size rows from a named server-side cursor.
+
+    The cursor lives in the connection's current transaction; the caller
+    owns the connection (and rolls back or closes it afterwards).
+    """
+    sql, params = build_query(geometry_sql, table_has_properties(conn), **filters)
+    with conn.cursor(name=f"geo_export_{uuid.uuid4().hex[:12]}") as cur:
+        cur.itersize = batch_size
+        cur.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                return
+            yield rows
+
+
+def _properties(row: tuple) -> Dict[str, Any]:
+    properties = dict(row[3]) if isinstance(row[3], dict) else {}
+    properties.setdefault("name", row[1])
+    properties["upload_id"] = row[2]
+    return properties
+
+
+def geojsonseq_chunks(batches: Iterator[List[tuple]]) -> Iterator[bytes]:
+    """Render batches of (…, GeoJSON geometry text) rows as newline-delimited features."""
+    for rows in batches:
+        lines = []
+        for row in rows:
+            feature = {
+                "type": "Feature",
+                "id": row[0],
+                "properties": _properties(row),
+                "geometry": json_backend.loads(row[4]) if row[4] is not None else None,
+            }
+            lines.append(json_backend.dumpb(feature))
+        yield b"\n".join(lines) + b"\n"
+
+
+class _DrainableSink:
+    """Write-only file object whose accumulated bytes are handed out after each batch."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def parquet_chunks(batches: Iterator[List[tuple]]) -> Iterator[bytes]:
+    """
+    Render batches of (…, WKB) rows as GeoParquet, one row group per batch.
+
+    pyarrow only needs a sequential sink: row groups are drained as they are
+    written and the footer follows the last one.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("name", pa.string()),
+        ("upload_id", pa.string()),
+        ("properties", pa.string()),
+        ("geometry", pa.binary()),
+    ]).with_metadata({"geo": json_backend.dumps({
+        "version": "1.0.0",
+        "primary_column": "geometry",
+        # No "crs" member: GeoParquet then means OGC:CRS84 (lon/lat WGS84),
+        # which is how geo_data stores EPSG:4326
+        "columns": {"geometry": {"encoding": "WKB", "geometry_types": []}},
+    })})
+
+    sink = _DrainableSink()
+    with pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema, compression="zstd") as writer:
+        for rows in batches:
+            writer.write_batch(pa.RecordBatch.from_arrays([
+                pa.array([row[0] for row in rows], pa.int64()),
+                pa.array([row[1] for row in rows], pa.string()),
+                pa.array([row[2] for row in rows], pa.string()),
+                pa.array([json_backend.dumps(row[3]) if row[3] is not None else None for row in rows],
+                         pa.string()),
+                pa.array([bytes(row[4]) if row[4] is not None else None for row in rows], pa.binary()),
+            ], schema=schema))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def flatgeobuf_chunks(batches: Iterator[List[tuple]], tmp_dir: Optional[str] = None) -> Iterator[bytes]:
+    """
+    Render batches of (…, WKB) rows as FlatGeobuf.
+
+    Features are appended to a temporary file batch by batch, then the file
+    is streamed in READ_CHUNK_SIZE pieces and removed. The spatial index is
+    disabled because GDAL keeps an index entry per feature in memory.
+    """
+    import fiona
+    import shapely
+    from shapely.geometry import mapping
+
+    schema = {
+        "geometry": "Unknown",
+        "properties": {"id": "int", "name": "str", "upload_id": "str", "properties": "str"},
+    }
+    fd, path = tempfile.mkstemp(suffix=".fgb", dir=tmp_dir)
+    os.close(fd)
+    os.remove(path)  # fiona refuses to overwrite an existing file
+    try:
+        with fiona.open(path, "w", driver="FlatGeobuf", schema=schema, crs="EPSG:4326",
+                        SPATIAL_INDEX="NO") as dst:
+            for rows in batches:
+                geoms = shapely.from_wkb([bytes(row[4]) if row[4] is not None else None for row in rows])
+                dst.writerecords({
+                    "geometry": mapping(geom) if geom is not None else None,
+                    "properties": {
+                        "id": row[0],
+                        "name": row[1],
+                        "upload_id": row[2],
+                        "properties": json_backend.dumps(row[3]) if row[3] is not None else None,
+                    },
+                } for row, geom in zip(rows, geoms))
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def stream_export(conn, fmt: str, batch_size: int = DEFAULT_BATCH_SIZE, **filters) -> Iterator[bytes]:
+    """
+    Export geo_data from conn in the given format as an iterator of bytes.
+
+    Args:
+        conn: Open psycopg2 connection, held until the iterator is exhausted
+        fmt: One of EXPORT_FORMATS
+        batch_size: Rows fetched from the server-side cursor per batch
+        **filters: bbox, upload_id and limit (see build_query)
+
+    Raises:
+        ValueError: If fmt is unknown
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}; expected one of {', '.join(EXPORT_FORMATS)}")
+    if fmt == "geojsonseq":
+        return geojsonseq_chunks(iter_batches(conn, "ST_AsGeoJSON(geom)", batch_size, **filters))
+    batches = iter_batches(conn, "ST_AsBinary(geom)", batch_size, **filters)
+    if fmt == "parquet":
+        return parquet_chunks(batches)
+    return flatgeobuf_chunks(batches)
+
+
+def parse_bbox(value: str) -> Tuple[float, float, float, float]:
+    """Parse 'minx,miny,maxx,maxy'."""
+    try:
+        minx, miny, maxx, maxy = (float(v) for v in value.split(","))
+    except (AttributeError, ValueError):
+        raise ValueError("bbox must be 'minx,miny,maxx,maxy'")
+    if minx > maxx or miny > maxy:
+        raise ValueError("bbox min values must not exceed max values")
+    return minx, miny, maxx, maxy
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Export geo_data with constant memory")
+    parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="geojsonseq")
+    parser.add_argument("--output", default="-", help="Output file, or - for stdout")
+    parser.add_argument("--bbox", type=parse_bbox, help="minx,miny,maxx,maxy filter")
+    parser.add_argument("--upload-id", help="Only rows from this upload")
+    parser.add_argument("--limit", type=int, help="Maximum number of rows")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s",
+                        stream=sys.stderr)
+    from entrypoint import get_db_conn
+
+    conn = get_db_conn()
+    out = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    written = 0
+    try:
+        for chunk in stream_export(conn, args.format, args.batch_size, bbox=args.bbox,
+                                   upload_id=args.upload_id, limit=args.limit):
+            out.write(chunk)
+            written += len(chunk)
+    finally:
+        conn.rollback()
+        conn.close()
+        if out is not sys.stdout.buffer:
+            out.close()
+    logger.info(f"Exported {written} bytes as {args.format}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,265 @@
+"""
+Incrementally maintained grid aggregates for density and heatmap queries.
+
+Every inserted feature is counted in one web-mercator tile (quadkey cell) per
+configured zoom level, keyed by the centre of its bounding box. Each cell
+keeps a feature count and the bbox of the features counted in it. Ingest
+upserts the cells touched by a batch in the same transaction as the rows, so
+density views read a few thousand aggregate rows instead of running
+``GROUP BY ST_SnapToGrid`` over geo_data.
+
+Counts only grow: geo_data has no delete path. After bulk deletes or when
+enabling aggregates on an existing table, rebuild with:
+
+    python grid_aggregates.py --rebuild
+"""
+import os
+import sys
+import math
+import argparse
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GRID_ZOOMS = (4, 8, 12)
+MAX_MERCATOR_LAT = 85.05112878
+
+GRID_CELLS_DDL = """
+    CREATE TABLE IF NOT EXISTS grid_cells (
+        zoom SMALLINT NOT NULL,
+        quadkey TEXT NOT NULL,
+        feature_count BIGINT NOT NULL DEFAULT 0,
+        minx DOUBLE PRECISION,
+        miny DOUBLE PRECISION,
+        maxx DOUBLE PRECISION,
+        maxy DOUBLE PRECISION,
+        updated_at TIMESTAMP DEFAULT NOW(),
+        PRIMARY KEY (zoom, quadkey)
+    );
+"""
+
+UPSERT_PAGE_SIZE = 1000
+UPSERT_CELLS_SQL = """
+    INSERT INTO grid_cells (zoom, quadkey, feature_count, minx, miny, maxx, maxy)
+    VALUES {values}
+    ON CONFLICT (zoom, quadkey) DO UPDATE SET
+        feature_count = grid_cells.feature_count + EXCLUDED.feature_count,
+        minx = LEAST(grid_cells.minx, EXCLUDED.minx),
+        miny = LEAST(grid_cells.miny, EXCLUDED.miny),
+        maxx = GREATEST(grid_cells.maxx, EXCLUDED.maxx),
+        maxy = GREATEST(grid_cells.maxy, EXCLUDED.maxy),
+        updated_at = NOW()
+"""
+
+
+def grid_aggregates_enabled() -> bool:
+    """Return True unless GRID_AGGREGATES is set to false."""
+    return os.getenv("GRID_AGGREGATES", "true").lower() not in ("0", "false", "no")
+
+
+def grid_zooms() -> Tuple[int, ...]:
+    """Zoom levels maintained (GRID_ZOOMS, comma separated, default 4,8,12)."""
+    value = os.getenv("GRID_ZOOMS")
+    if not value:
+        return DEFAULT_GRID_ZOOMS
+    return tuple(sorted({int(z) for z in value.split(",") if z.strip()}))
+
+
+def tile_xy(lon, lat, zoom: int):
+    """
+    Web-mercator tile indices for arrays of lon/lat at a zoom level.
+
+    Latitudes are clamped to the mercator limit so polar points land in the
+    edge rows.
+    """
+    import numpy as np
+
+    n = 1 << zoom
+    lat = np.radians(np.clip(lat, -MAX_MERCATOR_LAT, MAX_MERCATOR_LAT))
+    x = np.floor((np.asarray(lon) + 180.0) / 360.0 * n)
+    y = np.floor((1.0 - np.arcsinh(np.tan(lat)) / math.pi) / 2.0 * n)
+    return np.clip(x, 0, n - 1).astype(np.int64), np.clip(y, 0, n - 1).astype(np.int64)
+
+
+def quadkey(x: int, y: int, zoom: int) -> str:
+    """Bing-style quadkey of tile x/y at zoom."""
+    digits = []
+    for level in range(zoom, 0, -1):
+        mask = 1 << (level - 1)
+        digits.append(str((1 if x & mask else 0) + (2 if y & mask else 0)))
+    return "".join(digits)
+
+
+def quadkey_to_tile(key: str) -> Tuple[int, int, int]:
+    """Inverse of quadkey(): returns (x, y, zoom)."""
+    x = y = 0
+    zoom = len(key)
+    for i, digit in enumerate(key):
+        mask = 1 << (zoom - i - 1)
+        if digit in "13":
+            x |= mask
+        if digit in "23":
+            y |= mask
+    return x, y, zoom
+
+
+def tile_bounds(x: int, y: int, zoom: int) -> Tuple[float, float, float, float]:
+    """(minx, miny, maxx, maxy) in degrees of a web-mercator tile."""
+    n = 1 << zoom
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y)
+
+
+def aggregate_bounds(bounds, zooms: Tuple[int, ...]) -> List[tuple]:
+    """
+    Aggregate feature bounding boxes into grid cell rows.
+
+    Args:
+        bounds: (N, 4) array of minx, miny, maxx, maxy (NaN rows are skipped)
+        zooms: Zoom levels to aggregate at
+
+    Returns:
+        (zoom, quadkey, count, minx, miny, maxx, maxy) rows sorted by
+        (zoom, quadkey), so concurrent upserts lock cells in the same order
+    """
+    import numpy as np
+
+    bounds = np.asarray(bounds, dtype=float).reshape(-1, 4)
+    bounds = bounds[~np.isnan(bounds).any(axis=1)]
+    if len(bounds) == 0:
+        return []
+    cx = (bounds[:, 0] + bounds[:, 2]) / 2.0
+    cy = (bounds[:, 1] + bounds[:, 3]) / 2.0
+
+    rows = []
+    for zoom in zooms:
+        x, y = tile_xy(cx, cy, zoom)
+        keys = (x << zoom) | y
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        counts = np.diff(np.r_[starts, len(sorted_keys)])
+        ordered = bounds[order]
+        mins = np.minimum.reduceat(ordered[:, :2], starts)
+        maxs = np.maximum.reduceat(ordered[:, 2:], starts)
+        for i, start in enumerate(starts.tolist()):
+            key = int(sorted_keys[start])
+            rows.append((zoom, quadkey(key >> zoom, key & ((1 << zoom) - 1), zoom), int(counts[i]),
+                         float(mins[i, 0]), float(mins[i, 1]), float(maxs[i, 0]), float(maxs[i, 1])))
+    rows.sort(key=lambda row: (row[0], row[1]))
+    return rows
+
+
+def upsert_cells(cur, rows: List[tuple]) -> None:
+    """Upsert aggregated cell rows with multi-row INSERTs of UPSERT_PAGE_SIZE rows."""
+    for start in range(0, len(rows), UPSERT_PAGE_SIZE):
+        page = rows[start:start + UPSERT_PAGE_SIZE]
+        values = ", ".join(["(%s, %s, %s, %s, %s, %s, %s)"] * len(page))
+        cur.execute(UPSERT_CELLS_SQL.format(values=values), [v for row in page for v in row])
+
+
+def update_grid_cells(cur, geoms: List[Any], zooms: Optional[Tuple[int, ...]] = None) -> int:
+    """
+    Add a batch of inserted Shapely geometries to grid_cells (no commit).
+
+    Args:
+        cur: psycopg2 cursor inside the ingest transaction
+        geoms: Geometries inserted in this batch (None entries are skipped)
+        zooms: Zoom levels; defaults to grid_zooms()
+
+    Returns:
+        Number of cell rows upserted
+    """
+    geoms = [geom for geom in geoms if geom is not None]
+    if not geoms:
+        return 0
+    import shapely
+
+    rows = aggregate_bounds(shapely.bounds(geoms), zooms or grid_zooms())
+    upsert_cells(cur, rows)
+    logger.info(f"Updated {len(rows)} grid cell(s) for {len(geoms)} features")
+    return len(rows)
+
+
+def rebuild_grid_cells(conn, batch_size: int = 50000) -> int:
+    """
+    Recompute grid_cells from geo_data, streaming feature boxes in batches.
+
+    Runs in the caller's transaction; the caller commits.
+
+    Returns:
+        Number of features aggregated
+    """
+    import numpy as np
+
+    zooms = grid_zooms()
+    with conn.cursor() as cur:
+        cur.execute(GRID_CELLS_DDL)
+        cur.execute("TRUNCATE grid_cells")
+    total = 0
+    with conn.cursor(name="grid_cells_rebuild") as source, conn.cursor() as cur:
+        source.execute("SELECT ST_XMin(geom), ST_YMin(geom), ST_XMax(geom), ST_YMax(geom) "
+                       "FROM geo_data WHERE geom IS NOT NULL")
+        while True:
+            batch = source.fetchmany(batch_size)
+            if not batch:
+                break
+            upsert_cells(cur, aggregate_bounds(np.array(batch, dtype=float), zooms))
+            total += len(batch)
+            logger.info(f"Aggregated {total} features")
+    return total
+
+
+def density_cells(cur, zoom: int, bbox: Optional[Tuple[float, float, float, float]] = None,
+                  min_count: int = 1) -> List[Dict[str, Any]]:
+    """
+    Read the cells of one zoom level, optionally only those overlapping bbox.
+
+    Returns:
+        List of dicts with quadkey, x, y, count and bbox (of the features)
+    """
+    sql = "SELECT quadkey, feature_count, minx, miny, maxx, maxy FROM grid_cells WHERE zoom = %s"
+    params: List[Any] = [zoom]
+    if min_count > 1:
+        sql += " AND feature_count >= %s"
+        params.append(min_count)
+    if bbox is not None:
+        sql += " AND maxx >= %s AND maxy >= %s AND minx <= %s AND miny <= %s"
+        params.extend(bbox)
+    cur.execute(sql, params)
+    cells = []
+    for key, count, minx, miny, maxx, maxy in cur.fetchall():
+        x, y, _zoom = quadkey_to_tile(key)
+        cells.append({"quadkey": key, "x": x, "y": y, "count": count,
+                      "bbox": [minx, miny, maxx, maxy]})
+    return cells
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Maintain geo_data grid aggregates")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute grid_cells from geo_data")
+    parser.add_argument("--batch-size", type=int, default=50000)
+    args = parser.parse_args(argv)
+    if not args.rebuild:
+        parser.print_help()
+        return 1
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    from entrypoint import get_db_conn
+
+    conn = get_db_conn()
+    try:
+        total = rebuild_grid_cells(conn, args.batch_size)
+        conn.commit()
+    finally:
+        conn.close()
+    logger.info(f"Rebuilt grid_cells at zooms {grid_zooms()} from {total} features")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,343 @@
+"""
+Deadline-aware, resumable ingestion of large files.
+
+A Lambda invocation that reaches its timeout is killed mid-transaction: all
+of its work is rolled back and the retry starts from zero, only to hit the
+same wall. Here the features of a file are inserted in batches of
+INGEST_BATCH_SIZE, and each batch commits together with a resume cursor (the
+offset of the next feature) in the ``ingest_progress`` table. Before every
+batch the remaining invocation time is checked. When it is too short for
+another batch, ingestion stops at the batch boundary and reports where to
+resume.
+
+The next invocation re-reads the file and continues from the stored offset.
+That can be a continuation event sent by the handler or a retry of the same
+S3 event after a timeout. Rows and cursor commit atomically, so no feature is
+inserted twice and a completed file is not ingested again. A session-level
+advisory lock on the progress key keeps two invocations off the same file.
+
+The lock outlives an invocation killed at its timeout until the server
+notices the dead client, which short session keepalives speed up. An
+invocation that finds an incomplete file locked reports it as locked; the
+handler then retries it after a delay (see lock_retry_delay) rather than
+dropping it.
+
+The shards of a fanned-out file use the same table, one row per shard keyed
+by the file's progress key plus the shard number (see shard_progress_key).
+ingest_once commits a shard's rows together with its completion, so a retried
+shard or a re-dispatched file skips the shards that are already done.
+"""
+import os
+import time
+import logging
+from typing import Dict, Any, Optional, Callable, List, Set
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_DEADLINE_MARGIN_MS = 15000
+DEFAULT_MAX_INVOCATIONS = 20
+DEFAULT_LOCK_RETRIES = 8
+DEFAULT_LOCK_RETRY_DELAY_S = 30
+MAX_LOCK_RETRY_DELAY_S = 300
+
+INGEST_PROGRESS_DDL = """
+    CREATE TABLE IF NOT EXISTS ingest_progress (
+        progress_key TEXT PRIMARY KEY,
+        upload_id TEXT NOT NULL,
+        feature_offset BIGINT NOT NULL DEFAULT 0,
+        total_features BIGINT,
+        inserted BIGINT NOT NULL DEFAULT 0,
+        duplicates BIGINT NOT NULL DEFAULT 0,
+        invocations INTEGER NOT NULL DEFAULT 0,
+        completed_at TIMESTAMP,
+        created_at TIMESTAMP DEFAULT NOW(),
+        updated_at TIMESTAMP DEFAULT NOW()
+    );
+"""
+
+# Creates the row on the first invocation and counts later ones; either way
+# the stored cursor comes back
+BEGIN_PROGRESS_SQL = """
+    INSERT INTO ingest_progress (progress_key, upload_id, total_features, invocations)
+    VALUES (%s, %s, %s, 1)
+    ON CONFLICT (progress_key) DO UPDATE SET
+        invocations = ingest_progress.invocations + 1,
+        total_features = EXCLUDED.total_features,
+        updated_at = NOW()
+    RETURNING upload_id, feature_offset, inserted, duplicates, invocations, completed_at IS NOT NULL
+"""
+
+ADVANCE_PROGRESS_SQL = """
+    UPDATE ingest_progress SET
+        feature_offset = %s,
+        inserted = inserted + %s,
+        duplicates = duplicates + %s,
+        completed_at = CASE WHEN %s THEN NOW() END,
+        updated_at = NOW()
+    WHERE progress_key = %s
+"""
+
+TRY_LOCK_SQL = "SELECT pg_try_advisory_lock(hashtext(%s))"
+
+PROGRESS_STATE_SQL = """
+    SELECT feature_offset, completed_at IS NOT NULL FROM ingest_progress WHERE progress_key = %s
+"""
+
+COMPLETED_KEYS_SQL = """
+    SELECT progress_key FROM ingest_progress
+    WHERE progress_key = ANY(%s) AND completed_at IS NOT NULL
+"""
+
+# The server drops a dead session, and with it the advisory lock, after
+# about idle + interval * count seconds instead of the OS default (hours)
+SESSION_KEEPALIVE_SQL = """
+    SET tcp_keepalives_idle = 30;
+    SET tcp_keepalives_interval = 10;
+    SET tcp_keepalives_count = 3;
+"""
+
+
+def resumable_ingest_enabled() -> bool:
+    """Return True unless RESUMABLE_INGEST is set to false."""
+    return os.getenv("RESUMABLE_INGEST", "true").lower() not in ("0", "false", "no")
+
+
+def ingest_batch_size() -> int:
+    """Features committed per batch (INGEST_BATCH_SIZE, default 5000)."""
+    return int(os.getenv("INGEST_BATCH_SIZE", str(DEFAULT_BATCH_SIZE)))
+
+
+def lock_retries() -> int:
+    """Retries of a file locked by another invocation (INGEST_LOCK_RETRIES, default 8)."""
+    return int(os.getenv("INGEST_LOCK_RETRIES", str(DEFAULT_LOCK_RETRIES)))
+
+
+def lock_retry_delay(attempt: int) -> int:
+    """Seconds to wait before lock retry attempt (0-based): exponential, capped at 5 minutes."""
+    base = int(os.getenv("INGEST_LOCK_RETRY_DELAY_S", str(DEFAULT_LOCK_RETRY_DELAY_S)))
+    return min(base * 2 ** attempt, MAX_LOCK_RETRY_DELAY_S)
+
+
+def progress_key(bucket: str, key: str, etag: str) -> str:
+    """Progress key of one version of an S3 object; a re-upload starts afresh."""
+    etag = etag.strip('"')
+    return f"s3://{bucket}/{key}#{etag}"
+
+
+def shard_progress_key(file_key: str, shard: int) -> str:
+    """Progress key of one shard of the file with progress key file_key."""
+    return f"{file_key}#shard-{shard:05d}"
+
+
+def completed_keys(keys: List[str]) -> Set[str]:
+    """Return the subset of progress keys that are marked complete."""
+    from entrypoint import get_db_conn, ensure_schema
+
+    if not keys:
+        return set()
+    ensure_schema()
+    conn = get_db_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(COMPLETED_KEYS_SQL, (list(keys),))
+            return {row[0] for row in cur.fetchall()}
+    finally:
+        conn.close()
+
+
+def ingest_once(key: str, ingest: Callable[[Any], Dict[str, Any]], upload_id: str,
+                total: int) -> Dict[str, Any]:
+    """
+    Run ingest(conn) at most once to completion for key.
+
+    The rows ingest inserts on conn and the completion of key commit in one
+    transaction, so a failure leaves nothing behind and a retry after success
+    does nothing.
+
+    Args:
+        key: Progress key, e.g. from shard_progress_key()
+        ingest: Callable inserting the features on the given connection
+            without committing, returning an ingestion summary
+        upload_id: Recorded on the progress row
+        total: Number of features ingest covers
+
+    Returns:
+        ingest's summary with already_ingested False, or a zero summary with
+        already_ingested True if key was completed before
+
+    Raises:
+        RuntimeError: If another invocation holds key
+        Same as ingest otherwise
+    """
+    from entrypoint import get_db_conn, ensure_schema
+
+    ensure_schema()
+    conn = get_db_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(SESSION_KEEPALIVE_SQL)
+            cur.execute(TRY_LOCK_SQL, (key,))
+            if not cur.fetchone()[0]:
+                raise RuntimeError(f"{key} is locked by another invocation")
+            cur.execute(BEGIN_PROGRESS_SQL, (key, upload_id, total))
+            complete = cur.fetchone()[5]
+        if complete:
+            conn.commit()
+            logger.info(f"{key} was already ingested completely; nothing to do")
+            return {"features": total, "inserted": 0, "duplicates": 0, "errors": 0,
+                    "already_ingested": True}
+
+        summary = ingest(conn)
+        with conn.cursor() as cur:
+            cur.execute(ADVANCE_PROGRESS_SQL, (total, summary["inserted"], summary["duplicates"],
+                                               True, key))
+        conn.commit()
+        summary["already_ingested"] = False
+        return summary
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        # Closing the session also releases the advisory lock
+        conn.close()
+
+
+class IngestDeadline:
+    """
+    Decides at batch boundaries whether another batch fits in the invocation.
+
+    A batch is started only if the remaining time exceeds the safety margin
+    (INGEST_DEADLINE_MARGIN_MS) plus 1.5x the slowest batch so far. Without
+    a context there is no deadline.
+    """
+
+    def __init__(self, context: Any = None, margin_ms: Optional[int] = None):
+        self.context = context
+        if margin_ms is None:
+            margin_ms = int(os.getenv("INGEST_DEADLINE_MARGIN_MS", str(DEFAULT_DEADLINE_MARGIN_MS)))
+        self.margin_ms = margin_ms
+        self.slowest_batch_ms = 0.0
+
+    def remaining_ms(self) -> Optional[int]:
+        if self.context is None or not hasattr(self.context, "get_remaining_time_in_millis"):
+            return None
+        return self.context.get_remaining_time_in_millis()
+
+    def record_batch(self, seconds: float) -> None:
+        self.slowest_batch_ms = max(self.slowest_batch_ms, seconds * 1000.0)
+
+    def should_stop(self) -> bool:
+        remaining = self.remaining_ms()
+        return remaining is not None and remaining < self.margin_ms + 1.5 * self.slowest_batch_ms
+
+
+def ingest_resumable(filepath: str, key: str, context: Any = None, dedup: Optional[bool] = None,
+                     source: Optional[str] = None, batch_size: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Ingest a file in committed batches, resuming from the cursor stored under key.
+
+    Opens its own connection, since batches must commit independently of any
+    caller transaction.
+
+    Args:
+        filepath: GeoJSON file (any input ingest_geojson accepts)
+        key: Progress key identifying this file, e.g. from progress_key()
+        context: Lambda context; its remaining time decides when to stop
+        dedup: Enable geometry-hash deduplication (see process_geojson)
+        source: Recorded as the upload source; defaults to filepath
+        batch_size: Features per committed batch; defaults to INGEST_BATCH_SIZE
+
+    Returns:
+        Summary with features, inserted and duplicates (this invocation),
+        total_inserted and total_duplicates (all invocations), upload_id,
+        batches, resume_offset, complete and locked (another invocation holds
+        the file; nothing was done, and complete and resume_offset come from
+        the stored cursor)
+
+    Raises:
+        RuntimeError: If the file is still incomplete after
+            INGEST_MAX_INVOCATIONS invocations
+        Same as process_geojson otherwise
+    """
+    from entrypoint import get_db_conn, ensure_schema, load_features, ingest_features
+    from upload_stats import new_upload_id
+    from overlaps import add_overlap_summary
+
+    batch_size = batch_size or ingest_batch_size()
+    max_invocations = int(os.getenv("INGEST_MAX_INVOCATIONS", str(DEFAULT_MAX_INVOCATIONS)))
+    deadline = IngestDeadline(context)
+    features, crs = load_features(filepath)
+    total = len(features)
+    summary = {"features": total, "inserted": 0, "duplicates": 0, "batches": 0,
+               "upload_id": None, "locked": False}
+
+    ensure_schema()
+    conn = get_db_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(SESSION_KEEPALIVE_SQL)
+            cur.execute(TRY_LOCK_SQL, (key,))
+            if not cur.fetchone()[0]:
+                cur.execute(PROGRESS_STATE_SQL, (key,))
+                state = cur.fetchone()
+                offset, complete = state if state else (0, False)
+                logger.warning(f"{key} is locked by another invocation "
+                               f"({'complete' if complete else f'at feature {offset}/{total}'})")
+                summary.update({"locked": True, "complete": complete, "resume_offset": offset,
+                                "total_inserted": None, "total_duplicates": None})
+                return summary
+            cur.execute(BEGIN_PROGRESS_SQL, (key, new_upload_id(), total))
+            upload_id, offset, total_inserted, total_duplicates, invocations, complete = cur.fetchone()
+        conn.commit()
+        summary["upload_id"] = upload_id
+
+        if complete:
+            logger.info(f"{key} was already ingested completely; nothing to do")
+        elif offset:
+            logger.info(f"Resuming {key} at feature {offset}/{total} (invocation {invocations})")
+
+        while not complete and offset < total:
+            if deadline.should_stop():
+                logger.warning(f"Stopping {key} at feature {offset}/{total}: "
+                               f"{deadline.remaining_ms()} ms left")
+                break
+            started = time.monotonic()
+            batch = features[offset:offset + batch_size]
+            result = ingest_features(batch, conn=conn, dedup=dedup, source=source or filepath,
+                                     upload_id=upload_id, crs=crs, first_index=offset)
+            offset += len(batch)
+            complete = offset >= total
+            with conn.cursor() as cur:
+                cur.execute(ADVANCE_PROGRESS_SQL, (offset, result["inserted"], result["duplicates"],
+                                                   complete, key))
+            conn.commit()
+            deadline.record_batch(time.monotonic() - started)
+            summary["inserted"] += result["inserted"]
+            summary["duplicates"] += result["duplicates"]
+            summary["batches"] += 1
+            if result.get("overlaps"):
+                summary["overlaps"] = add_overlap_summary(summary.get("overlaps"), result["overlaps"])
+            logger.info(f"Committed {key} through feature {offset}/{total}")
+
+        if not total and not complete:
+            with conn.cursor() as cur:
+                cur.execute(ADVANCE_PROGRESS_SQL, (0, 0, 0, True, key))
+            conn.commit()
+            complete = True
+        if not complete and invocations >= max_invocations:
+            raise RuntimeError(f"{key} still incomplete at feature {offset}/{total} after "
+                               f"{invocations} invocations")
+        summary.update({
+            "total_inserted": total_inserted + summary["inserted"],
+            "total_duplicates": total_duplicates + summary["duplicates"],
+            "resume_offset": offset,
+            "complete": complete,
+        })
+        return summary
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        # Closing the session also releases the advisory lock
+        conn.close()
@@ -0,0 +1,51 @@
+"""
+Pluggable JSON backend for the ingest and API hot paths.
+
+Uses orjson when it is installed and falls back to the standard library json
+module otherwise. Set JSON_BACKEND=json to force the standard library.
+"""
+import os
+import json
+import logging
+from typing import Any, BinaryIO, Union
+
+logger = logging.getLogger(__name__)
+
+orjson = None
+if os.getenv("JSON_BACKEND", "auto").lower() != "json":
+    try:
+        import orjson  # Optional accelerated parser/serializer
+    except ImportError:
+        orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers can catch
+# this (or json.JSONDecodeError / ValueError) regardless of the backend.
+JSONDecodeError = orjson.JSONDecodeError if orjson is not None else json.JSONDecodeError
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """Parse a JSON document from str or bytes."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def load(stream: BinaryIO) -> Any:
+    """Parse a JSON document from a binary stream (read in one go)."""
+    return loads(stream.read())
+
+
+def dumpb(obj: Any) -> bytes:
+    """Serialize obj to UTF-8 encoded JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str)
+    return json.dumps(obj, default=str, separators=(",", ":")).encode("utf-8")
+
+
+def dumps(obj: Any) -> str:
+    """Serialize obj to a JSON string."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str).decode("utf-8")
+    return json.dumps(obj, default=str)
@@ -2,13 +2,23 @@
 AWS Lambda handler for processing GeoJSON files from S3 events.
 Enhanced with better error handling and logging.
 """
-import json
 import boto3
 import os
+import re
 import logging
 import traceback
-from typing import Dict, Any
-from entrypoint import process_geojson
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List
+from urllib.parse import unquote_plus
+from concurrent.futures import ThreadPoolExecutor
+from entrypoint import ingest_geojson, get_db_conn, is_geojson_seq, SUPPORTED_EXTENSIONS, COMPRESSION_EXTENSIONS
+from upload_stats import new_upload_id
+from ingest_progress import (
+    ingest_resumable, ingest_once, completed_keys, progress_key, shard_progress_key,
+    resumable_ingest_enabled, lock_retries, lock_retry_delay
+)
+import json_backend
 
 # Configure structured logging
 logger = logging.getLogger()
@@ -17,6 +27,12 @@ logger.setLevel(logging.INFO)
 # Initialize S3 client
 s3 = boto3.client("s3")
 
+# Lambda client for shard fan-out, created on first use
+_lambda_client = None
+
+# EventBridge Scheduler client for delayed lock retries, created on first use
+_scheduler_client = None
+
 
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
@@ -41,70 +57,40 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     logger.info(f"Context: function_name={context.function_name if context else 'N/A'}, "
                 f"request_id={context.aws_request_id if context else 'N/A'}")
     
+    if _is_sqs_event(event):
+        return sqs_batch_handler(event, context)
+    
+    if "shard" in event:
+        return shard_worker_handler(event, context)
+    
+    if "resume" in event:
+        return resume_handler(event, context)
+    
     results = []
-    tmp_path = None
     
     try:
         if not event.get("Records"):
             logger.warning("No records found in event")
             return {
                 "statusCode": 400,
-                "body": json.dumps({"error": "No records in event", "event": str(event)[:500]})
+                "body": json_backend.dumps({"error": "No records in event", "event": str(event)[:500]})
             }
         
         logger.info(f"Processing {len(event['Records'])} record(s)")
         
         for record_idx, record in enumerate(event["Records"]):
-            tmp_path = None
             try:
                 # Extract S3 information
-                bucket = record["s3"]["bucket"]["name"]
-                key = record["s3"]["object"]["key"]
-                
-                # Sanitize filename to prevent path traversal
-                import re
-                safe_filename = re.sub(r'[^a-zA-Z0-9._-]', '_', os.path.basename(key))
-                tmp_path = f"/tmp/{safe_filename}"
-                
+                bucket, key = _s3_location(record)
+                size = record["s3"]["object"].get("size")
+                etag = record["s3"]["object"].get("eTag")
                 logger.info(f"Processing record {record_idx + 1}: s3://{bucket}/{key}")
-                
-                # Validate file extension
-                if not key.lower().endswith(('.geojson', '.json')):
-                    logger.warning(f"Skipping non-GeoJSON file: {key}")
-                    results.append({
-                        "key": key,
-                        "error": "File must be GeoJSON (.geojson or .json)",
-                        "status": "skipped"
-                    })
-                    continue
-                
-                # Download file from S3
-                logger.info(f"Downloading file from S3 to {tmp_path}")
-                s3.download_file(bucket, key, tmp_path)
-                
-                # Verify file was downloaded
-                if not os.path.exists(tmp_path):
-                    raise FileNotFoundError(f"Downloaded file not found at {tmp_path}")
-                
-                file_size = os.path.getsize(tmp_path)
-                logger.info(f"Downloaded file size: {file_size} bytes")
-                
-                # Process GeoJSON
-                logger.info(f"Starting GeoJSON processing for {key}")
-                inserted = process_geojson(tmp_path)
-                logger.info(f"Successfully processed {inserted} features from {key}")
-                
-                results.append({
-                    "key": key,
-                    "inserted": inserted,
-                    "status": "success",
-                    "file_size": file_size
-                })
+                results.append(_process_s3_object(bucket, key, size=size, context=context, etag=etag))
                 
             except KeyError as e:
                 error_msg = f"Invalid event structure: {str(e)}"
                 logger.error(f"KeyError in record {record_idx}: {error_msg}", exc_info=True)
-                logger.error(f"Record structure: {json.dumps(record, default=str)[:500]}")
+                logger.error(f"Record structure: {json_backend.dumps(record)[:500]}")
                 results.append({
                     "key": record.get("s3", {}).get("object", {}).get("key", "unknown"),
                     "error": error_msg,
@@ -122,14 +108,6 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     "status": "error",
                     "error_type": type(e).__name__
                 })
-            finally:
-                # Clean up temporary file
-                if tmp_path and os.path.exists(tmp_path):
-                    try:
-                        os.remove(tmp_path)
-                        logger.debug(f"Cleaned up temp file: {tmp_path}")
-                    except OSError as e:
-                        logger.warning(f"Failed to remove temp file {tmp_path}: {e}")
 
         # Determine overall status
         has_errors = any(r.get("status") == "error" for r in results)
@@ -150,7 +128,7 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         
         return {
             "statusCode": status_code,
-            "body": json.dumps(response_body)
+            "body": json_backend.dumps(response_body)
         }
         
     except Exception as e:
@@ -162,9 +140,447 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         
         return {
             "statusCode": 500,
-            "body": json.dumps({
+            "body": json_backend.dumps({
                 "error": error_msg,
                 "error_type": type(e).__name__,
                 "results": results
             })
         }
+
+
+def _s3_location(record: Dict[str, Any]) -> tuple:
+    """
+    Extract (bucket, key) from an S3 event notification record.
+    
+    Object keys in S3 notifications are URL-encoded (spaces become '+').
+    """
+    bucket = record["s3"]["bucket"]["name"]
+    key = unquote_plus(record["s3"]["object"]["key"])
+    return bucket, key
+
+
+def _process_s3_object(bucket: str, key: str, conn=None, size: int = None,
+                       context: Any = None, etag: str = None, lock_attempt: int = 0) -> Dict[str, Any]:
+    """
+    Download a single S3 object to /tmp and ingest it.
+    
+    Objects larger than SPLIT_THRESHOLD_BYTES are fanned out to parallel
+    shard workers instead (see _fan_out_s3_object). When the ETag is known
+    and no connection is shared, the object is ingested in committed batches
+    that stop before the invocation times out (see ingest_progress.py); the
+    rest is handed to a continuation invocation.
+    
+    Args:
+        bucket: S3 bucket name
+        key: S3 object key
+        conn: Optional open database connection to reuse
+        size: Object size from the S3 notification, if known
+        context: Lambda context, used to find this function's name for fan-out
+            and continuations and the remaining time
+        etag: Object ETag from the S3 notification, if known
+        lock_attempt: Retries so far of an object found locked by another
+            invocation (set by continuation events)
+        
+    Returns:
+        Result dictionary with status "success", "in_progress" or "skipped"
+        
+    Raises:
+        Exception: If the download or processing fails
+    """
+    # Validate file extension (plain, sequence and .gz/.zst compressed GeoJSON)
+    if not key.lower().endswith(SUPPORTED_EXTENSIONS):
+        logger.warning(f"Skipping non-GeoJSON file: {key}")
+        return {
+            "key": key,
+            "error": "File must be GeoJSON (.geojson, .json, .geojsonl or .geojsons, optionally .gz/.zst)",
+            "status": "skipped"
+        }
+    
+    if size and _should_fan_out(key, size):
+        return _fan_out_s3_object(bucket, key, context, etag=etag)
+    
+    # Sanitize filename to prevent path traversal
+    safe_filename = re.sub(r'[^a-zA-Z0-9._-]', '_', os.path.basename(key))
+    tmp_path = f"/tmp/{safe_filename}"
+    
+    try:
+        # Download file from S3
+        logger.info(f"Downloading file from S3 to {tmp_path}")
+        s3.download_file(bucket, key, tmp_path)
+        
+        # Verify file was downloaded
+        if not os.path.exists(tmp_path):
+            raise FileNotFoundError(f"Downloaded file not found at {tmp_path}")
+        
+        file_size = os.path.getsize(tmp_path)
+        logger.info(f"Downloaded file size: {file_size} bytes")
+        
+        if conn is None and etag and resumable_ingest_enabled():
+            return _ingest_resumable_s3_object(tmp_path, bucket, key, etag, size, context, file_size,
+                                               lock_attempt)
+        
+        # Process GeoJSON
+        logger.info(f"Starting GeoJSON processing for {key}")
+        summary = ingest_geojson(tmp_path, conn=conn)
+        if summary.get("errors"):
+            # Insert errors abort the transaction: nothing of the object was stored
+            raise RuntimeError(f"{summary['errors']} feature insert(s) failed for {key}")
+        logger.info(f"Successfully processed {summary['inserted']} features from {key}")
+        
+        result = {
+            "key": key,
+            "inserted": summary["inserted"],
+            "duplicates": summary["duplicates"],
+            "upload_id": summary["upload_id"],
+            "status": "success",
+            "file_size": file_size
+        }
+        if summary.get("overlaps"):
+            result["overlaps"] = summary["overlaps"]
+        return result
+    finally:
+        # Clean up temporary file
+        if os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+                logger.debug(f"Cleaned up temp file: {tmp_path}")
+            except OSError as e:
+                logger.warning(f"Failed to remove temp file {tmp_path}: {e}")
+
+
+def _ingest_resumable_s3_object(tmp_path: str, bucket: str, key: str, etag: str, size: int,
+                                context: Any, file_size: int, lock_attempt: int = 0) -> Dict[str, Any]:
+    """
+    Ingest a downloaded object in deadline-aware batches.
+    
+    If the invocation runs short of time, the remaining features are left to
+    a continuation event sent asynchronously to this function, which resumes
+    from the committed cursor. A timeout before that point is covered as well:
+    the retry of the S3 event resumes from the same cursor. If the object is
+    incomplete but locked, typically by the session of an invocation killed
+    at its timeout that the server has not dropped yet, a continuation is
+    scheduled to try again later (see _schedule_continuation); after
+    INGEST_LOCK_RETRIES attempts the object fails.
+    
+    Raises:
+        RuntimeError: If the object is still locked after the last retry
+    """
+    summary = ingest_resumable(tmp_path, progress_key(bucket, key, etag), context=context,
+                               source=f"s3://{bucket}/{key}")
+    result = {
+        "key": key,
+        "inserted": summary["inserted"],
+        "duplicates": summary["duplicates"],
+        "upload_id": summary["upload_id"],
+        "status": "success",
+        "file_size": file_size
+    }
+    if summary.get("overlaps"):
+        result["overlaps"] = summary["overlaps"]
+    if summary["locked"] and not summary["complete"]:
+        if lock_attempt >= lock_retries():
+            raise RuntimeError(f"s3://{bucket}/{key} is still locked by another invocation at feature "
+                               f"{summary['resume_offset']} after {lock_attempt} retries")
+        delay = lock_retry_delay(lock_attempt)
+        logger.warning(f"s3://{bucket}/{key} is locked by another invocation; retrying in {delay} s")
+        _schedule_continuation(context, {"bucket": bucket, "key": key, "etag": etag, "size": size,
+                                         "lock_attempt": lock_attempt + 1}, delay)
+        result.update({"status": "in_progress", "resume_offset": summary["resume_offset"],
+                       "error": "Object is locked by another invocation; retry scheduled"})
+    elif not summary["complete"]:
+        logger.info(f"Continuing s3://{bucket}/{key} from feature {summary['resume_offset']} "
+                    f"in a new invocation")
+        _invoke_continuation(context, {"bucket": bucket, "key": key, "etag": etag, "size": size})
+        result.update({"status": "in_progress", "resume_offset": summary["resume_offset"]})
+    return result
+
+
+def _invoke_continuation(context: Any, resume: Dict[str, Any]) -> None:
+    """Send a {"resume": ...} event to this function asynchronously."""
+    function_name = os.getenv("CONTINUATION_FUNCTION") or context.function_name
+    _get_lambda_client().invoke(
+        FunctionName=function_name,
+        InvocationType="Event",
+        Payload=json_backend.dumpb({"resume": resume})
+    )
+
+
+def _get_scheduler_client():
+    global _scheduler_client
+    if _scheduler_client is None:
+        _scheduler_client = boto3.client("scheduler")
+    return _scheduler_client
+
+
+def _schedule_continuation(context: Any, resume: Dict[str, Any], delay_s: int) -> None:
+    """
+    Send a {"resume": ...} event to this function in delay_s seconds.
+    
+    A one-time EventBridge Scheduler schedule invokes the function, assuming
+    RETRY_SCHEDULER_ROLE_ARN, and deletes itself afterwards, so no invocation
+    is billed while waiting.
+    
+    Raises:
+        RuntimeError: If RETRY_SCHEDULER_ROLE_ARN is not set
+    """
+    role_arn = os.getenv("RETRY_SCHEDULER_ROLE_ARN")
+    if not role_arn:
+        raise RuntimeError(f"s3://{resume['bucket']}/{resume['key']} is locked and "
+                           f"RETRY_SCHEDULER_ROLE_ARN is not set to schedule a retry")
+    run_at = datetime.now(timezone.utc) + timedelta(seconds=delay_s)
+    _get_scheduler_client().create_schedule(
+        Name=f"ingest-retry-{uuid.uuid4().hex}",
+        ScheduleExpression=f"at({run_at.strftime('%Y-%m-%dT%H:%M:%S')})",
+        ScheduleExpressionTimezone="UTC",
+        FlexibleTimeWindow={"Mode": "OFF"},
+        ActionAfterCompletion="DELETE",
+        Target={
+            "Arn": context.invoked_function_arn,
+            "RoleArn": role_arn,
+            "Input": json_backend.dumps({"resume": resume})
+        }
+    )
+
+
+def resume_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Continue a deadline-interrupted ingest from its committed cursor.
+    
+    Args:
+        event: {"resume": {"bucket", "key", "etag", "size"[, "lock_attempt"]}}
+            as sent by _invoke_continuation or _schedule_continuation
+        context: Lambda context object
+        
+    Returns:
+        Result dictionary as for one S3 record
+    """
+    resume = event["resume"]
+    logger.info(f"Resuming s3://{resume['bucket']}/{resume['key']}")
+    return _process_s3_object(resume["bucket"], resume["key"], size=resume.get("size"),
+                              context=context, etag=resume["etag"],
+                              lock_attempt=resume.get("lock_attempt", 0))
+
+
+def _is_sqs_event(event: Dict[str, Any]) -> bool:
+    """Return True if the event is an SQS batch from an event source mapping."""
+    records = event.get("Records") or []
+    return bool(records) and records[0].get("eventSource") == "aws:sqs"
+
+
+def _s3_records_from_sqs_message(message: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Unwrap the S3 notification records carried by one SQS message.
+    
+    Handles raw S3 -> SQS notifications as well as S3 -> SNS -> SQS fan-out,
+    where the notification is nested in the SNS "Message" field. The
+    s3:TestEvent sent when a notification is configured yields no records.
+    """
+    body = json_backend.loads(message["body"])
+    if body.get("Type") == "Notification" and "Message" in body:
+        body = json_backend.loads(body["Message"])
+    if body.get("Event") == "s3:TestEvent":
+        return []
+    return body.get("Records", [])
+
+
+def sqs_batch_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Consume an SQS batch of S3 notifications with partial batch failure reporting.
+    
+    One database connection is opened for the whole batch. Each message is
+    processed in its own transaction: it is committed when all of its S3
+    objects are ingested, otherwise rolled back and reported in
+    batchItemFailures so that only that message is retried by SQS. Requires
+    ReportBatchItemFailures on the event source mapping.
+    
+    Args:
+        event: SQS event with Records carrying S3 notifications in their body
+        context: Lambda context object
+        
+    Returns:
+        Dictionary with batchItemFailures listing failed message IDs
+    """
+    messages = event["Records"]
+    logger.info(f"Processing SQS batch of {len(messages)} message(s)")
+    
+    failures = []
+    conn = None
+    try:
+        conn = get_db_conn()
+    except Exception as e:
+        logger.error(f"Database connection failed, failing whole batch: {e}")
+        return {"batchItemFailures": [{"itemIdentifier": m["messageId"]} for m in messages]}
+    
+    try:
+        for message in messages:
+            message_id = message["messageId"]
+            try:
+                for record in _s3_records_from_sqs_message(message):
+                    bucket, key = _s3_location(record)
+                    size = record["s3"]["object"].get("size")
+                    logger.info(f"Message {message_id}: processing s3://{bucket}/{key}")
+                    _process_s3_object(bucket, key, conn=conn, size=size, context=context)
+                conn.commit()
+            except Exception as e:
+                logger.error(f"Message {message_id} failed: {type(e).__name__}: {e}")
+                logger.error(f"Traceback: {traceback.format_exc()}")
+                try:
+                    conn.rollback()
+                except Exception as rollback_error:
+                    logger.warning(f"Rollback failed for message {message_id}: {rollback_error}")
+                failures.append({"itemIdentifier": message_id})
+    finally:
+        conn.close()
+    
+    logger.info(f"SQS batch complete: {len(messages) - len(failures)} succeeded, "
+                f"{len(failures)} failed")
+    return {"batchItemFailures": failures}
+
+
+def _should_fan_out(key: str, size: int) -> bool:
+    """Large, uncompressed FeatureCollections are split across shard workers."""
+    from splitter import split_threshold_bytes
+    _, ext = os.path.splitext(key.lower())
+    return (size > split_threshold_bytes()
+            and ext not in COMPRESSION_EXTENSIONS
+            and not is_geojson_seq(key))
+
+
+def _get_lambda_client():
+    global _lambda_client
+    if _lambda_client is None:
+        _lambda_client = boto3.client("lambda")
+    return _lambda_client
+
+
+def _fan_out_s3_object(bucket: str, key: str, context: Any, etag: str = None) -> Dict[str, Any]:
+    """
+    Coordinate ingestion of a large object across parallel shard workers.
+    
+    The object is streamed once to find feature byte offsets and the shard
+    plan is stored under SHARD_MANIFEST_PREFIX, keyed by the object's ETag, so
+    a retried file reuses the same shard boundaries and upload id. Each shard
+    not yet marked complete in ingest_progress is sent to an asynchronous
+    invocation of SHARD_WORKER_FUNCTION (this function by default), which
+    commits the shard's rows together with its completion (see
+    ingest_progress.ingest_once). The coordinator does not wait for the
+    workers: failed shards are retried by Lambda and then land in the
+    function's dead-letter queue, and re-delivering the S3 event dispatches
+    only the shards still missing.
+    
+    Returns:
+        Result dictionary with status "in_progress" while shards were
+        dispatched, or "success" once every shard is complete
+    """
+    if not etag:
+        etag = s3.head_object(Bucket=bucket, Key=key)["ETag"]
+    file_key = progress_key(bucket, key, etag)
+    manifests = _load_or_plan_shards(bucket, key, etag)
+    for manifest in manifests:
+        manifest["progress_key"] = shard_progress_key(file_key, manifest["shard"])
+    
+    done = completed_keys([m["progress_key"] for m in manifests])
+    pending = [m for m in manifests if m["progress_key"] not in done]
+    if pending:
+        function_name = os.getenv("SHARD_WORKER_FUNCTION") or context.function_name
+        concurrency = int(os.getenv("FANOUT_CONCURRENCY", "16"))
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(pending)))) as pool:
+            list(pool.map(lambda m: _dispatch_shard(function_name, m), pending))
+    logger.info(f"s3://{bucket}/{key}: {len(done)} of {len(manifests)} shard(s) complete, "
+                f"{len(pending)} dispatched")
+    
+    return {
+        "key": key,
+        "inserted": 0,
+        "duplicates": 0,
+        "upload_id": manifests[0]["upload_id"] if manifests else None,
+        "status": "in_progress" if pending else "success",
+        "shards": len(manifests),
+        "shards_complete": len(done),
+        "shards_dispatched": len(pending)
+    }
+
+
+def _load_or_plan_shards(bucket: str, key: str, etag: str) -> List[Dict[str, Any]]:
+    """Return the stored shard plan of this object version, planning it on first use."""
+    from botocore.exceptions import ClientError
+    from splitter import scan_feature_offsets, plan_shards, DEFAULT_SHARD_BYTES
+    from reproject import detect_crs_in_header, HEADER_SCAN_BYTES
+    
+    manifest_prefix = os.getenv("SHARD_MANIFEST_PREFIX", "_shards/")
+    version = etag.strip('"')
+    plan_key = f"{manifest_prefix}{key}/{version}/plan.json"
+    try:
+        manifests = json_backend.loads(s3.get_object(Bucket=bucket, Key=plan_key)["Body"].read())
+        logger.info(f"Reusing the plan of {len(manifests)} shard(s) in {plan_key}")
+        return manifests
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") not in ("NoSuchKey", "404"):
+            raise
+    
+    shard_bytes = int(os.getenv("SHARD_BYTES", str(DEFAULT_SHARD_BYTES)))
+    logger.info(f"Planning shards of s3://{bucket}/{key}")
+    head = s3.get_object(Bucket=bucket, Key=key, Range=f"bytes=0-{HEADER_SCAN_BYTES - 1}",
+                         IfMatch=etag)["Body"].read()
+    crs = detect_crs_in_header(head)
+    body = s3.get_object(Bucket=bucket, Key=key, IfMatch=etag)["Body"]
+    offsets = scan_feature_offsets(body)
+    manifests = plan_shards(offsets, f"s3://{bucket}/{key}", shard_bytes,
+                            upload_id=new_upload_id(), crs=crs)
+    for manifest in manifests:
+        manifest.update({"bucket": bucket, "key": key, "etag": etag})
+    s3.put_object(Bucket=bucket, Key=plan_key, Body=json_backend.dumpb(manifests))
+    logger.info(f"Planned {len(manifests)} shard(s) for {len(offsets)} features")
+    return manifests
+
+
+def _dispatch_shard(function_name: str, manifest: Dict[str, Any]) -> None:
+    """Send a {"shard": manifest} event to a shard worker asynchronously."""
+    _get_lambda_client().invoke(
+        FunctionName=function_name,
+        InvocationType="Event",
+        Payload=json_backend.dumpb({"shard": manifest})
+    )
+
+
+def shard_worker_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Ingest one shard of a large object: a byte range GET plus ingest_shard.
+    
+    A manifest with a progress_key (as dispatched by _fan_out_s3_object) is
+    ingested at most once: a shard already complete is not downloaded again.
+    
+    Args:
+        event: {"shard": manifest} as sent by _fan_out_s3_object
+        context: Lambda context object
+        
+    Returns:
+        Shard ingestion summary (see splitter.ingest_shard)
+        
+    Raises:
+        RuntimeError: If another invocation is ingesting the same shard, so
+            that Lambda retries the event
+    """
+    from splitter import ingest_shard
+    
+    manifest = event["shard"]
+    logger.info(f"Shard worker: s3://{manifest['bucket']}/{manifest['key']} shard "
+                f"{manifest['shard'] + 1}/{manifest['shards']} bytes {manifest['start']}-{manifest['end']}")
+    
+    def read_range() -> bytes:
+        get_args = {"IfMatch": manifest["etag"]} if manifest.get("etag") else {}
+        response = s3.get_object(
+            Bucket=manifest["bucket"],
+            Key=manifest["key"],
+            Range=f"bytes={manifest['start']}-{manifest['end'] - 1}",
+            **get_args
+        )
+        return response["Body"].read()
+    
+    if not manifest.get("progress_key"):
+        return ingest_shard(manifest, read_range())
+    summary = ingest_once(manifest["progress_key"],
+                          lambda conn: ingest_shard(manifest, read_range(), conn=conn),
+                          manifest["upload_id"], manifest["features"])
+    summary["shard"] = manifest["shard"]
+    return summary
@@ -0,0 +1,238 @@
+"""
+Overlap detection for incoming features, in bulk with Shapely STRtrees.
+
+Each insert batch is checked against itself and against the existing
+geo_data rows inside the batch's extent. Both checks are one vectorized
+``STRtree.query(geoms, predicate=...)`` call each instead of a database
+query per feature. What happens to overlapping features depends on the
+policy (GEO_OVERLAP_POLICY):
+
+- off: no check (default)
+- tag: insert everything and record in geo_data.overlap_count how many
+  batch features and existing rows each feature overlaps
+- skip: drop a feature that overlaps an existing row or an earlier kept
+  feature of the batch
+- merge: union each group of mutually overlapping batch features into one
+  feature, which keeps the first feature's properties. Existing rows are
+  never rewritten, so overlaps with them are only counted.
+
+"Overlap" means the GEO_OVERLAP_PREDICATE holds (default ``intersects``).
+Existing geometries are pulled only where their bounding box meets the
+envelope of some batch feature, so a spread-out batch does not load
+everything in between. The pull is capped at OVERLAP_EXISTING_LIMIT rows;
+a batch that hits the cap is checked against an arbitrary subset of its
+candidates, which the summary flags as ``truncated``.
+
+Only committed rows are seen. Features ingested concurrently, such as the
+shards of a fanned-out file or two uploads at once, are not checked against
+each other.
+"""
+import os
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+OVERLAP_POLICIES = ("off", "tag", "skip", "merge")
+OVERLAP_PREDICATES = ("intersects", "overlaps", "contains", "within", "covers", "covered_by",
+                      "crosses", "contains_properly")
+DEFAULT_EXISTING_LIMIT = 500000
+
+# Candidates whose bbox meets at least one feature envelope (GIST-indexed
+# && per envelope); the IN keeps rows matched by several envelopes once
+EXISTING_GEOMETRIES_SQL = """
+    SELECT ST_AsBinary(g.geom) FROM geo_data g
+    WHERE g.id IN (
+        SELECT d.id
+        FROM unnest(%s::float8[], %s::float8[], %s::float8[], %s::float8[]) AS b(xmin, ymin, xmax, ymax)
+        JOIN geo_data d ON d.geom && ST_MakeEnvelope(b.xmin, b.ymin, b.xmax, b.ymax, 4326)
+    )
+    LIMIT %s
+"""
+
+
+def overlap_policy() -> str:
+    """Policy from GEO_OVERLAP_POLICY (off, tag, skip or merge; default off)."""
+    policy = os.getenv("GEO_OVERLAP_POLICY", "off").lower()
+    if policy not in OVERLAP_POLICIES:
+        raise ValueError(f"GEO_OVERLAP_POLICY must be one of {', '.join(OVERLAP_POLICIES)}, got {policy!r}")
+    return policy
+
+
+def overlap_predicate() -> str:
+    """STRtree predicate from GEO_OVERLAP_PREDICATE (default intersects)."""
+    predicate = os.getenv("GEO_OVERLAP_PREDICATE", "intersects").lower()
+    if predicate not in OVERLAP_PREDICATES:
+        raise ValueError(f"GEO_OVERLAP_PREDICATE must be one of {', '.join(OVERLAP_PREDICATES)}, "
+                         f"got {predicate!r}")
+    return predicate
+
+
+def batch_overlap_pairs(geoms, predicate: str = "intersects"):
+    """
+    Index pairs (i, j), i < j, of batch geometries for which the predicate holds.
+
+    Returns:
+        (K, 2) int array, sorted by j then i
+    """
+    import numpy as np
+    import shapely
+
+    tree = shapely.STRtree(geoms)
+    # query(geoms) tests input i against tree geometry j
+    left, right = tree.query(geoms, predicate=predicate)
+    # Asymmetric predicates (contains, within, ...) may hold one way only;
+    # normalize each hit to (lower, higher) and drop self-matches
+    low, high = np.minimum(left, right), np.maximum(left, right)
+    keep = low != high
+    pairs = np.unique(np.column_stack([low[keep], high[keep]]), axis=0)
+    return pairs[np.lexsort((pairs[:, 0], pairs[:, 1]))] if len(pairs) else pairs.reshape(0, 2)
+
+
+def existing_overlap_counts(geoms, existing, predicate: str = "intersects"):
+    """Per batch geometry, the number of existing geometries it overlaps."""
+    import numpy as np
+    import shapely
+
+    if len(existing) == 0:
+        return np.zeros(len(geoms), dtype=np.int64)
+    tree = shapely.STRtree(existing)
+    batch_idx, _existing_idx = tree.query(geoms, predicate=predicate)
+    return np.bincount(batch_idx, minlength=len(geoms))
+
+
+def fetch_existing_geometries(cur, geoms, limit: Optional[int] = None):
+    """
+    Pull stored geometries whose bounding box meets the envelope of a batch geometry.
+
+    Returns:
+        Tuple of (array of Shapely geometries, truncated: whether there were
+        more than limit candidates and only limit of them were pulled)
+    """
+    import numpy as np
+    import shapely
+
+    bounds = shapely.bounds(geoms)
+    bounds = bounds[~np.isnan(bounds).any(axis=1)]
+    if not len(bounds):
+        return np.empty(0, dtype=object), False
+    limit = limit or int(os.getenv("OVERLAP_EXISTING_LIMIT", str(DEFAULT_EXISTING_LIMIT)))
+    # One row past the limit tells a truncated pull from an exact fit
+    cur.execute(EXISTING_GEOMETRIES_SQL, (*[bounds[:, i].tolist() for i in range(4)], limit + 1))
+    rows = cur.fetchall()
+    truncated = len(rows) > limit
+    if truncated:
+        logger.warning(f"Existing-overlap check truncated to {limit} candidate rows "
+                       f"(OVERLAP_EXISTING_LIMIT); overlaps with other rows are missed")
+        rows = rows[:limit]
+    return shapely.from_wkb([bytes(row[0]) for row in rows]), truncated
+
+
+def _components(n: int, pairs) -> List[List[int]]:
+    """Connected components (groups of indices) of the overlap graph, by first member."""
+    parent = list(range(n))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in pairs.tolist():
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+    groups: Dict[int, List[int]] = {}
+    for i in range(n):
+        groups.setdefault(find(i), []).append(i)
+    return [groups[root] for root in sorted(groups)]
+
+
+def apply_overlap_policy(cur, validated_features: List[Tuple[Dict[str, Any], Any]], policy: str,
+                         predicate: Optional[str] = None
+                         ) -> Tuple[List[Tuple[Dict[str, Any], Any]], Optional[List[int]], Dict[str, Any]]:
+    """
+    Detect overlaps in a batch and apply policy to it.
+
+    Args:
+        cur: Cursor in the ingest transaction, used to pull existing geometries
+        validated_features: (feature, Shapely geometry) pairs
+        policy: One of OVERLAP_POLICIES other than off
+        predicate: STRtree predicate; defaults to overlap_predicate()
+
+    Returns:
+        Tuple of (features to insert, per-feature overlap counts for the tag
+        policy or None, overlap summary; its truncated flag is set when
+        OVERLAP_EXISTING_LIMIT cut the pull of existing rows short)
+
+    Raises:
+        ValueError: If Shapely geometries are unavailable or policy is unknown
+    """
+    import numpy as np
+
+    if policy not in OVERLAP_POLICIES[1:]:
+        raise ValueError(f"Unknown overlap policy {policy!r}")
+    if any(geom is None for _, geom in validated_features):
+        raise ValueError("Overlap detection requires Shapely")
+    predicate = predicate or overlap_predicate()
+    geoms = np.array([geom for _, geom in validated_features], dtype=object)
+
+    pairs = batch_overlap_pairs(geoms, predicate)
+    existing, truncated = fetch_existing_geometries(cur, geoms)
+    existing_counts = existing_overlap_counts(geoms, existing, predicate)
+    batch_counts = np.bincount(pairs.ravel().astype(np.int64), minlength=len(geoms))
+    summary = {
+        "policy": policy,
+        "predicate": predicate,
+        "batch_pairs": int(len(pairs)),
+        "existing_pairs": int(existing_counts.sum()),
+        "overlapping": int(np.count_nonzero(batch_counts + existing_counts)),
+        "skipped": 0,
+        "merged": 0,
+        "truncated": truncated,
+    }
+
+    if policy == "tag":
+        return validated_features, (batch_counts + existing_counts).tolist(), summary
+
+    if policy == "skip":
+        dropped = existing_counts > 0
+        # Pairs are ordered by their later member, so a feature's earlier
+        # partners have been decided by the time it is reached
+        for i, j in pairs.tolist():
+            if not dropped[i]:
+                dropped[j] = True
+        summary["skipped"] = int(dropped.sum())
+        return [pair for pair, drop in zip(validated_features, dropped.tolist()) if not drop], None, summary
+
+    import shapely
+
+    result = []
+    for group in _components(len(geoms), pairs):
+        feature, geom = validated_features[group[0]]
+        if len(group) > 1:
+            geom = shapely.union_all(geoms[group])
+            summary["merged"] += len(group) - 1
+        result.append((feature, geom))
+    return result, None, summary
+
+
+def add_overlap_summary(total: Optional[Dict[str, Any]], part: Optional[Dict[str, Any]]
+                        ) -> Optional[Dict[str, Any]]:
+    """
+    Combine two overlap summaries (of batches or shards of one upload):
+    counts are summed, and the result is truncated if either part was.
+    """
+    if part is None:
+        return total
+    if total is None:
+        return dict(part)
+    merged = {}
+    for key, value in part.items():
+        if isinstance(value, bool):
+            merged[key] = bool(total.get(key)) or value
+        elif isinstance(value, int):
+            merged[key] = total.get(key, 0) + value
+        else:
+            merged[key] = value
+    return merged
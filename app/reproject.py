@@ -0,0 +1,193 @@
+"""
+CRS detection and bulk reprojection to EPSG:4326.
+
+RFC 7946 GeoJSON is always WGS84 longitude/latitude, but many producers still
+write the legacy ``crs`` member (e.g. UTM output from ogr2ogr). Geometries are
+stored in geo_data as SRID 4326, so anything declared in another CRS is
+reprojected before insert.
+
+pyproj Transformer construction is expensive compared to transforming a batch
+of points, so transformers are cached per source CRS for the life of the
+process (warm Lambda containers reuse them across invocations), and all
+coordinates of a chunk of geometries go through one transform call.
+"""
+import os
+import re
+import json
+import logging
+from functools import lru_cache
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TARGET_CRS = "EPSG:4326"
+REPROJECT_CHUNK_SIZE = 50000  # geometries per transform call
+HEADER_SCAN_BYTES = 64 * 1024
+
+# Identifiers that all mean WGS84 longitude/latitude
+WGS84_ALIASES = {"EPSG:4326", "OGC:CRS84", "CRS84", "EPSG:4979"}
+
+_URN_EPSG = re.compile(r"^urn:ogc:def:crs:EPSG:[\d.]*:(\d+)$", re.IGNORECASE)
+_URN_OGC = re.compile(r"^urn:ogc:def:crs:OGC:[\d.]*:(\w+)$", re.IGNORECASE)
+_EPSG_URL = re.compile(r"^https?://www\.opengis\.net/def/crs/EPSG/0/(\d+)$", re.IGNORECASE)
+_CRS_MEMBER = re.compile(rb'"crs"\s*:')
+
+
+def default_source_crs() -> Optional[str]:
+    """CRS assumed for input without a crs member (GEO_SOURCE_CRS, default WGS84)."""
+    value = os.getenv("GEO_SOURCE_CRS")
+    return normalize_crs_name(value) if value else None
+
+
+def normalize_crs_name(name: str) -> str:
+    """
+    Normalize a CRS identifier to the AUTHORITY:CODE form pyproj accepts.
+
+    Handles EPSG:n, urn:ogc:def:crs:EPSG::n, urn:ogc:def:crs:OGC:1.3:CRS84
+    and opengis.net EPSG URLs; anything else is passed through unchanged.
+    """
+    name = name.strip()
+    for pattern, authority in ((_URN_EPSG, "EPSG"), (_EPSG_URL, "EPSG"), (_URN_OGC, "OGC")):
+        match = pattern.match(name)
+        if match:
+            return f"{authority}:{match.group(1).upper()}"
+    if name.upper().startswith("EPSG:"):
+        return name.upper()
+    return name
+
+
+def parse_crs_member(crs: Any) -> Optional[str]:
+    """
+    Read a legacy GeoJSON (2008) crs member.
+
+    Args:
+        crs: Value of the crs member, e.g. {"type": "name", "properties":
+            {"name": "EPSG:32633"}} or {"type": "EPSG", "properties": {"code": 32633}}
+
+    Returns:
+        Normalized CRS identifier, or None if the member is null
+
+    Raises:
+        ValueError: If the member cannot be interpreted (e.g. a "link" crs)
+    """
+    if crs is None:
+        return None
+    if not isinstance(crs, dict):
+        raise ValueError(f"Unsupported crs member: {crs!r}")
+    properties = crs.get("properties") or {}
+    crs_type = str(crs.get("type", "")).lower()
+    if crs_type == "name" and properties.get("name"):
+        return normalize_crs_name(str(properties["name"]))
+    if crs_type == "epsg" and properties.get("code") is not None:
+        return f"EPSG:{int(properties['code'])}"
+    raise ValueError(f"Unsupported crs member: {crs!r}")
+
+
+def detect_crs(data: Dict[str, Any]) -> Optional[str]:
+    """
+    Return the declared source CRS of a parsed FeatureCollection.
+
+    Falls back to default_source_crs() when there is no crs member. None
+    means the data is already WGS84.
+    """
+    if isinstance(data, dict) and "crs" in data:
+        crs = parse_crs_member(data["crs"])
+        if crs is not None:
+            return crs
+    return default_source_crs()
+
+
+def detect_crs_in_header(head: bytes) -> Optional[str]:
+    """
+    Find the crs member in the first bytes of a FeatureCollection.
+
+    Used by the shard splitter, which never parses the whole document. Only
+    a crs member that precedes the features array (as GDAL writes it) can
+    be found this way.
+    """
+    match = _CRS_MEMBER.search(head)
+    if match is None:
+        return default_source_crs()
+    try:
+        crs, _end = json.JSONDecoder().raw_decode(head[match.end():].decode("utf-8", "replace").lstrip())
+    except ValueError:
+        logger.warning("crs member found in header but could not be parsed; assuming default CRS")
+        return default_source_crs()
+    return parse_crs_member(crs) or default_source_crs()
+
+
+def has_crs_member(head: bytes) -> bool:
+    """True if a crs member appears in the first bytes of a FeatureCollection."""
+    return _CRS_MEMBER.search(head) is not None
+
+
+def is_wgs84(crs: Optional[str]) -> bool:
+    """True if no reprojection is needed for crs."""
+    return crs is None or normalize_crs_name(crs).upper() in WGS84_ALIASES
+
+
+@lru_cache(maxsize=32)
+def get_transformer(source_crs: str):
+    """
+    Return a cached Transformer from source_crs to EPSG:4326 (x=lon, y=lat).
+
+    Raises:
+        ValueError: If pyproj does not recognize source_crs
+    """
+    from pyproj import Transformer  # Lazy import, only needed for non-WGS84 input
+    from pyproj.exceptions import CRSError
+
+    try:
+        return Transformer.from_crs(source_crs, TARGET_CRS, always_xy=True)
+    except CRSError as e:
+        raise ValueError(f"Unknown CRS {source_crs!r}: {e}")
+
+
+def coords_transform(transformer):
+    """
+    Adapt transformer for shapely.transform, which passes an (N, 2) array.
+
+    The interleaved=False keyword that would take pyproj's (x, y) signature
+    directly only exists from Shapely 2.1.
+    """
+    import numpy as np
+
+    def transform(coords):
+        return np.column_stack(transformer.transform(coords[:, 0], coords[:, 1]))
+    return transform
+
+
+def reproject_geometries(geoms: List[Any], source_crs: Optional[str],
+                         chunk_size: int = REPROJECT_CHUNK_SIZE) -> List[Any]:
+    """
+    Reproject Shapely geometries from source_crs to EPSG:4326.
+
+    Each chunk of geometries is transformed with a single call: Shapely
+    gathers all of their coordinates into arrays, pyproj transforms them in
+    bulk, and the geometries are rebuilt around the new coordinates.
+
+    Args:
+        geoms: Shapely geometries (None entries are kept as None)
+        source_crs: Source CRS identifier; WGS84 or None returns geoms unchanged
+        chunk_size: Geometries per transform call, bounding temporary memory
+
+    Returns:
+        List of reprojected geometries in the same order
+    """
+    if is_wgs84(source_crs) or not geoms:
+        return list(geoms)
+    import numpy as np
+    import shapely
+
+    transform = coords_transform(get_transformer(normalize_crs_name(source_crs)))
+    result = []
+    for start in range(0, len(geoms), chunk_size):
+        chunk = np.asarray(geoms[start:start + chunk_size], dtype=object)
+        transformed = shapely.transform(chunk, transform)
+        # pyproj returns inf for points it cannot transform
+        present = ~shapely.is_missing(transformed) & ~shapely.is_empty(transformed)
+        if not np.isfinite(shapely.bounds(transformed[present])).all():
+            raise ValueError(f"Coordinates outside the valid area of {source_crs}")
+        result.extend(transformed.tolist())
+    logger.info(f"Reprojected {len(result)} geometries from {source_crs} to {TARGET_CRS}")
+    return result
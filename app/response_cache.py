@@ -0,0 +1,241 @@
+"""
+Ingest-generation-aware cache for API query responses.
+
+geo_data only changes when an ingest commits, and every such commit bumps the
+ingest generation (see upload_stats.bump_generation). Responses are cached
+under (generation, endpoint, normalized parameters), so a new generation
+invalidates everything at once and stale entries simply age out of the LRU.
+The generation is read from the database at most once per
+INGEST_GENERATION_TTL seconds, which bounds how long an ingest by another
+process (the Lambda, another worker) can go unnoticed. Uploads handled by
+this process are noticed immediately.
+
+The ETag of a response is derived from the generation and the cache key, so
+a matching If-None-Match is answered with 304 without building the body.
+
+By default entries live in a bounded in-process LRU. With RESPONSE_CACHE_URL
+(redis://...) they are stored in Redis instead and shared by all workers;
+the optional ``redis`` package is then required.
+"""
+import os
+import time
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Optional
+
+import json_backend
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_GENERATION_TTL = 1.0
+DEFAULT_SHARED_TTL = 300
+
+
+def cache_key(endpoint: str, params: Any) -> str:
+    """Stable key for an endpoint and its parsed (normalized) parameters."""
+    return hashlib.sha1(json_backend.dumpb([endpoint, params])).hexdigest()
+
+
+def make_etag(generation: int, key: str) -> str:
+    return f'"g{generation}-{key[:16]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header value matches etag (weak comparison)."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+class LRUStore:
+    """Thread-safe LRU bounded by entry count and total body bytes."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def set(self, key: str, body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = body
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"backend": "memory", "entries": len(self._entries), "bytes": self._bytes,
+                    "max_entries": self.max_entries, "max_bytes": self.max_bytes,
+                    "evictions": self.evictions}
+
+
+class RedisStore:
+    """Shared store in Redis; entries expire after ttl seconds."""
+
+    def __init__(self, url: str, ttl: int = DEFAULT_SHARED_TTL, prefix: str = "geo_api:"):
+        try:
+            import redis  # Optional dependency, only needed for a shared cache
+        except ImportError:
+            raise ValueError("RESPONSE_CACHE_URL requires the 'redis' package")
+        self._client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._client.get(self.prefix + key)
+
+    def set(self, key: str, body: bytes) -> None:
+        self._client.set(self.prefix + key, body, ex=self.ttl)
+
+    def clear(self) -> None:
+        for key in self._client.scan_iter(match=self.prefix + "*"):
+            self._client.delete(key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "redis", "ttl": self.ttl}
+
+
+class ResponseCache:
+    """
+    Generation-keyed response cache with hit/miss accounting.
+
+    Args:
+        read_generation: Callable returning the committed ingest generation
+            (a database round trip); called at most once per generation_ttl
+        store: LRUStore or RedisStore holding the response bodies
+        generation_ttl: Seconds a read generation is trusted
+    """
+
+    def __init__(self, read_generation: Callable[[], int], store=None,
+                 generation_ttl: float = DEFAULT_GENERATION_TTL):
+        self.read_generation = read_generation
+        self.store = store if store is not None else LRUStore()
+        self.generation_ttl = generation_ttl
+        self._generation: Optional[int] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._counts = {"hits": 0, "misses": 0, "not_modified": 0, "bypassed": 0}
+
+    def generation(self) -> int:
+        """The ingest generation, refreshed from the database when older than the TTL."""
+        now = time.monotonic()
+        if self._generation is not None and now - self._checked_at < self.generation_ttl:
+            return self._generation
+        generation = self.read_generation()
+        with self._lock:
+            # Never go backwards if a local upload noted a newer generation meanwhile
+            if self._generation is None or generation >= self._generation:
+                self._generation = generation
+            self._checked_at = now
+            return self._generation
+
+    def note_generation(self, generation: int) -> None:
+        """Record a generation committed by this process, so it applies immediately."""
+        with self._lock:
+            if self._generation is None or generation > self._generation:
+                self._generation = generation
+            self._checked_at = time.monotonic()
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counts[name] += 1
+
+    def lookup(self, endpoint: str, params: Any, build: Callable[[], bytes],
+               if_none_match: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Serve a response body from the cache, building and storing it on a miss.
+
+        Args:
+            endpoint: Endpoint name, part of the key
+            params: Parsed request parameters (JSON-serializable), part of the key
+            build: Produces the response body; exceptions propagate and
+                nothing is cached
+            if_none_match: The request's If-None-Match header
+
+        Returns:
+            Dictionary with status ("hit", "miss", "not_modified" or
+            "bypassed"), body (None for not_modified) and etag (None when
+            bypassed)
+        """
+        try:
+            generation = self.generation()
+        except Exception as e:
+            # Without a generation nothing can be validated; serve uncached
+            logger.warning(f"Response cache bypassed, ingest generation unavailable: {e}")
+            self._count("bypassed")
+            return {"status": "bypassed", "body": build(), "etag": None}
+
+        key = cache_key(endpoint, params)
+        etag = make_etag(generation, key)
+        if etag_matches(if_none_match, etag):
+            self._count("not_modified")
+            return {"status": "not_modified", "body": None, "etag": etag}
+
+        stored_key = f"{generation}:{key}"
+        try:
+            body = self.store.get(stored_key)
+        except Exception as e:
+            logger.warning(f"Response cache read failed: {e}")
+            body = None
+        if body is not None:
+            self._count("hits")
+            return {"status": "hit", "body": body, "etag": etag}
+
+        self._count("misses")
+        body = build()
+        try:
+            self.store.set(stored_key, body)
+        except Exception as e:
+            logger.warning(f"Response cache write failed: {e}")
+        return {"status": "miss", "body": body, "etag": etag}
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters, hit ratio, current generation and store usage."""
+        with self._lock:
+            counts = dict(self._counts)
+            generation = self._generation
+        served = counts["hits"] + counts["misses"] + counts["not_modified"]
+        return {
+            **counts,
+            "hit_ratio": round((counts["hits"] + counts["not_modified"]) / served, 4) if served else 0.0,
+            "generation": generation,
+            **self.store.stats(),
+        }
+
+
+def create_store():
+    """Store configured by RESPONSE_CACHE_URL, RESPONSE_CACHE_SIZE and RESPONSE_CACHE_MAX_BYTES."""
+    url = os.getenv("RESPONSE_CACHE_URL")
+    if url:
+        return RedisStore(url, ttl=int(os.getenv("RESPONSE_CACHE_TTL", str(DEFAULT_SHARED_TTL))))
+    return LRUStore(
+        max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", str(DEFAULT_MAX_ENTRIES))),
+        max_bytes=int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(DEFAULT_MAX_BYTES))),
+    )
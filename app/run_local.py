@@ -1,8 +1,26 @@
 import os
-import json
+import time
+import threading
+from datetime import datetime, timezone
 import psycopg2
-from flask import Flask, request, jsonify
+import psycopg2.errors
+from flask import Flask, Response, request, jsonify
 from geojson import load
+from entrypoint import open_geojson_binary, SUPPORTED_EXTENSIONS
+from db_pool import BoundedConnectionPool, get_pool
+from upload_stats import (
+    UploadStats, UPLOADS_DDL, INGEST_GENERATION_DDL, new_upload_id, record_upload,
+    bump_generation, read_generation
+)
+from response_cache import ResponseCache, create_store
+from reproject import (
+    default_source_crs, has_crs_member, is_wgs84, reproject_geometries, HEADER_SCAN_BYTES
+)
+from export import EXPORT_FORMATS, DEFAULT_BATCH_SIZE, parse_bbox, stream_export
+from grid_aggregates import (
+    GRID_CELLS_DDL, grid_aggregates_enabled, grid_zooms, update_grid_cells, density_cells, tile_bounds
+)
+import json_backend
 import geopandas as gpd
 import logging
 
@@ -12,33 +30,53 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
+def db_connection_params():
+    """Connection parameters from the environment"""
+    return {
+        "dbname": os.getenv("DB_NAME", "silver_saas"),
+        "user": os.getenv("DB_USER", "postgres"),
+        "password": os.getenv("DB_PASS", "password"),
+        "host": os.getenv("DB_HOST", "localhost"),
+        "port": os.getenv("DB_PORT", "5432")
+    }
+
 def get_db_conn():
-    """Get database connection with error handling"""
-    try:
-        return psycopg2.connect(
-            dbname=os.getenv("DB_NAME", "silver_saas"),
-            user=os.getenv("DB_USER", "postgres"),
-            password=os.getenv("DB_PASS", "password"),
-            host=os.getenv("DB_HOST", "localhost"),
-            port=os.getenv("DB_PORT", "5432")
-        )
+    """Get a dedicated (unpooled) database connection with error handling"""
+    try:
+        return psycopg2.connect(**db_connection_params())
     except Exception as e:
         logger.error(f"Database connection failed: {e}")
         raise
 
-def process_geojson(filepath):
-    """Process GeoJSON file with GeoPandas and store in database"""
-    try:
-        # Load with GeoPandas for validation and processing
-        gdf = gpd.read_file(filepath)
-        
-        # Validate geometry
-        if not gdf.crs:
-            gdf.set_crs(epsg=4326, inplace=True)
-        
-        with get_db_conn() as conn:
+def _create_pool():
+    """Build the process-wide pool; DB_POOL_MAX should cover WEB_THREADS"""
+    return BoundedConnectionPool(
+        minconn=int(os.getenv("DB_POOL_MIN", "1")),
+        maxconn=int(os.getenv("DB_POOL_MAX", "10")),
+        timeout=float(os.getenv("DB_POOL_TIMEOUT", "5")),
+        connect_timeout=10,
+        **db_connection_params()
+    )
+
+def db_connection():
+    """Borrow a pooled connection: `with db_connection() as conn:`"""
+    return get_pool(_create_pool).connection()
+
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+def ensure_schema():
+    """Create geo_data, uploads, grid_cells and ingest_generation once per
+    process, committed on a dedicated connection: DDL takes table locks
+    (ALTER TABLE an ACCESS EXCLUSIVE one, even when nothing changes) that
+    would otherwise be held by every upload transaction and stall queries"""
+    global _schema_ready
+    with _schema_lock:
+        if _schema_ready:
+            return
+        conn = get_db_conn()
+        try:
             with conn.cursor() as cur:
-                # Create table if not exists
                 cur.execute("""
                     CREATE TABLE IF NOT EXISTS geo_data (
                         id SERIAL PRIMARY KEY,
@@ -48,19 +86,73 @@ def process_geojson(filepath):
                         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                     )
                 """)
+                cur.execute("""
+                    ALTER TABLE geo_data ADD COLUMN IF NOT EXISTS upload_id TEXT;
+                    CREATE INDEX IF NOT EXISTS idx_geo_data_upload_id ON geo_data (upload_id);
+                """)
+                cur.execute(UPLOADS_DDL)
+                cur.execute(GRID_CELLS_DDL)
+                cur.execute(INGEST_GENERATION_DDL)
+            conn.commit()
+        finally:
+            conn.close()
+        _schema_ready = True
+
+def declares_crs(filepath):
+    """Return True if the file has a crs member within its first HEADER_SCAN_BYTES"""
+    with open_geojson_binary(filepath) as f:
+        return has_crs_member(f.read(HEADER_SCAN_BYTES))
+
+def process_geojson(filepath, upload_id=None):
+    """Process GeoJSON file with GeoPandas and store in database, tagged with upload_id"""
+    try:
+        # Load with GeoPandas for validation and processing; compressed input
+        # is decompressed as a stream rather than to a temporary file
+        with open_geojson_binary(filepath) as f:
+            gdf = gpd.read_file(f)
+        
+        # Files without a declared CRS are WGS84 (RFC 7946) unless
+        # GEO_SOURCE_CRS says otherwise; anything else is reprojected. GDAL
+        # reports EPSG:4326 for those files too, so the crs member is looked
+        # for in the header, as the S3 shard splitter does
+        configured_crs = default_source_crs()
+        if configured_crs and not declares_crs(filepath):
+            gdf.set_crs(configured_crs, inplace=True, allow_override=True)
+        elif not gdf.crs:
+            gdf.set_crs("EPSG:4326", inplace=True)
+        source_crs = gdf.crs.to_string()
+        if not is_wgs84(source_crs):
+            gdf = gdf.set_geometry(
+                reproject_geometries(list(gdf.geometry.values), source_crs), crs="EPSG:4326"
+            )
+        
+        ensure_schema()
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                upload_id = upload_id or new_upload_id()
+                
+                # Geometries go over the wire as WKB, encoded in one vectorized
+                # call instead of a WKT round trip per feature
+                wkbs = gdf.geometry.to_wkb(output_dimension=2)
                 
                 # Insert each feature
                 for idx, row in gdf.iterrows():
                     name = row.get('name', f'Feature_{idx}')
-                    geom = row.geometry.wkt
-                    properties = json.dumps(row.drop('geometry').to_dict())
+                    properties = json_backend.dumps(row.drop('geometry').to_dict())
                     
                     cur.execute("""
-                        INSERT INTO geo_data (name, geom, properties) 
-                        VALUES (%s, ST_SetSRID(ST_GeomFromText(%s), 4326), %s)
-                    """, (name, geom, properties))
+                        INSERT INTO geo_data (name, geom, properties, upload_id) 
+                        VALUES (%s, ST_GeomFromWKB(%s, 4326), %s, %s)
+                    """, (name, wkbs[idx], properties, upload_id))
                 
+                stats = UploadStats()
+                stats.add_geometries(list(gdf.geometry.values))
+                record_upload(cur, upload_id, filepath, stats)
+                if grid_aggregates_enabled():
+                    update_grid_cells(cur, list(gdf.geometry.values))
+                generation = bump_generation(cur)
                 conn.commit()
+                get_response_cache().note_generation(generation)
                 logger.info(f"Processed {len(gdf)} features from {filepath}")
                 return len(gdf)
                 
@@ -68,27 +160,117 @@ def process_geojson(filepath):
         logger.error(f"Error processing {filepath}: {e}")
         raise
 
+# Cached database status for /health, refreshed at most once per TTL so
+# frequent probes do not each cost a database round trip
+HEALTH_CACHE_TTL = float(os.getenv("HEALTH_CACHE_TTL", "5"))
+_health_lock = threading.Lock()
+_health_state = {"checked_at": None, "healthy": False, "error": None, "timestamp": None}
+
+def database_status():
+    """Return the cached DB status, refreshing it with a pooled connection when stale"""
+    if _is_fresh():
+        return dict(_health_state)
+    # One thread refreshes; others serve the previous result if there is one
+    if not _health_lock.acquire(blocking=_health_state["checked_at"] is None):
+        return dict(_health_state)
+    try:
+        if not _is_fresh():
+            try:
+                with db_connection() as conn:
+                    with conn.cursor() as cur:
+                        cur.execute("SELECT 1")
+                        cur.fetchone()
+                _health_state.update(healthy=True, error=None)
+            except Exception as e:
+                logger.error(f"Health check failed: {e}")
+                _health_state.update(healthy=False, error=str(e))
+            _health_state["checked_at"] = time.monotonic()
+            _health_state["timestamp"] = datetime.now(timezone.utc).isoformat()
+        return dict(_health_state)
+    finally:
+        _health_lock.release()
+
+def _is_fresh():
+    checked_at = _health_state["checked_at"]
+    return checked_at is not None and time.monotonic() - checked_at < HEALTH_CACHE_TTL
+
+# Query responses cached per ingest generation (see response_cache.py);
+# RESPONSE_CACHE=false serves every request from the database
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+def read_ingest_generation():
+    """Committed ingest generation, 0 before the first upload created the table"""
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            try:
+                return int(read_generation(cur))
+            except psycopg2.errors.UndefinedTable:
+                return 0
+
+def get_response_cache():
+    """Process-wide response cache, created lazily (after a pre-fork)"""
+    global _response_cache
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                _response_cache = ResponseCache(
+                    read_ingest_generation, create_store(),
+                    generation_ttl=float(os.getenv("INGEST_GENERATION_TTL", "1"))
+                )
+    return _response_cache
+
+def response_cache_enabled():
+    return os.getenv("RESPONSE_CACHE", "true").lower() not in ("0", "false", "no")
+
+def cached_json_response(endpoint, params, build):
+    """
+    Serve the JSON payload from build() through the response cache.
+    
+    Responses carry an ETag (valid until the next ingest) and are answered
+    with 304 when If-None-Match matches; X-Cache reports HIT, MISS,
+    NOT_MODIFIED or BYPASSED.
+    """
+    if not response_cache_enabled():
+        return jsonify(build()), 200
+    result = get_response_cache().lookup(
+        endpoint, params, lambda: json_backend.dumpb(build()),
+        if_none_match=request.headers.get("If-None-Match")
+    )
+    if result["status"] == "not_modified":
+        response = Response(status=304)
+    else:
+        response = Response(result["body"], status=200, mimetype="application/json")
+    if result["etag"]:
+        response.headers["ETag"] = result["etag"]
+        response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Cache"] = result["status"].upper()
+    return response
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    try:
-        # Check database connection
-        with get_db_conn() as conn:
-            with conn.cursor() as cur:
-                cur.execute("SELECT 1")
-                cur.fetchone()
-        
+    status = database_status()
+    if status["healthy"]:
         return jsonify({
             "status": "healthy",
             "database": "connected",
-            "timestamp": "2024-01-01T00:00:00Z"
+            "timestamp": status["timestamp"]
         }), 200
-    except Exception as e:
-        logger.error(f"Health check failed: {e}")
-        return jsonify({
-            "status": "unhealthy",
-            "error": str(e)
-        }), 500
+    return jsonify({
+        "status": "unhealthy",
+        "error": status["error"],
+        "timestamp": status["timestamp"]
+    }), 500
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Connection pool wait metrics, response cache counters and cached health state"""
+    return jsonify({
+        "pool": get_pool(_create_pool).stats(),
+        "response_cache": get_response_cache().stats() if response_cache_enabled() else None,
+        "health": database_status()
+    }), 200
 
 @app.route('/ready', methods=['GET'])
 def ready_check():
@@ -117,13 +299,13 @@ def upload_geojson():
         if file.filename == '':
             return jsonify({"error": "No file selected"}), 400
         
-        if not file.filename.endswith('.geojson'):
+        if not file.filename.lower().endswith(SUPPORTED_EXTENSIONS):
             return jsonify({"error": "File must be GeoJSON"}), 400
         
         # Sanitize filename to prevent path traversal
         import re
         safe_filename = re.sub(r'[^a-zA-Z0-9._-]', '_', os.path.basename(file.filename))
-        if not safe_filename.endswith('.geojson'):
+        if not safe_filename.lower().endswith(SUPPORTED_EXTENSIONS):
             safe_filename = safe_filename.rsplit('.', 1)[0] + '.geojson'
         
         # Save file temporarily with sanitized name
@@ -131,7 +313,8 @@ def upload_geojson():
         file.save(temp_path)
         
         # Process the file
-        features_processed = process_geojson(temp_path)
+        upload_id = new_upload_id()
+        features_processed = process_geojson(temp_path, upload_id=upload_id)
         
         # Clean up
         os.remove(temp_path)
@@ -139,7 +322,8 @@ def upload_geojson():
         return jsonify({
             "message": "File processed successfully",
             "features_processed": features_processed,
-            "filename": file.filename
+            "filename": file.filename,
+            "upload_id": upload_id
         }), 200
         
     except Exception as e:
@@ -150,35 +334,297 @@ def upload_geojson():
 def get_geo_data():
     """Retrieve processed geographic data"""
     try:
-        with get_db_conn() as conn:
+        return cached_json_response("data", [], latest_features)
+    except Exception as e:
+        logger.error(f"Data retrieval failed: {e}")
+        return jsonify({"error": str(e)}), 500
+
+def latest_features():
+    """The 100 most recent features as a FeatureCollection"""
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT id, name, ST_AsGeoJSON(geom) as geometry, properties, created_at
+                FROM geo_data
+                ORDER BY created_at DESC
+                LIMIT 100
+            """)
+            rows = cur.fetchall()
+    
+    features = []
+    for row in rows:
+        features.append({
+            "id": row[0],
+            "name": row[1],
+            "geometry": json_backend.loads(row[2]),
+            "properties": row[3],
+            "created_at": row[4].isoformat()
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+# Spatial queries run as server-side prepared statements so the plan (an
+# index scan on idx_geo_data_geom) is reused across calls on a connection.
+# name -> (parameter types, statement body)
+SPATIAL_STATEMENTS = {
+    "geo_nearest": ("float8, float8, int", """
+        SELECT id, name, ST_AsGeoJSON(geom),
+               ST_Distance(geom::geography, ST_SetSRID(ST_MakePoint($1, $2), 4326)::geography)
+        FROM geo_data
+        ORDER BY geom <-> ST_SetSRID(ST_MakePoint($1, $2), 4326)
+        LIMIT $3
+    """),
+    "geo_within": ("float8, float8, float8, float8, int", """
+        SELECT id, name, ST_AsGeoJSON(geom), NULL
+        FROM geo_data
+        WHERE ST_Within(geom, ST_MakeEnvelope($1, $2, $3, $4, 4326))
+        LIMIT $5
+    """),
+    "geo_intersects": ("text, int", """
+        SELECT id, name, ST_AsGeoJSON(geom), NULL
+        FROM geo_data
+        WHERE ST_Intersects(geom, ST_SetSRID(ST_GeomFromGeoJSON($1), 4326))
+        LIMIT $2
+    """),
+}
+
+MAX_QUERY_LIMIT = 1000
+
+def execute_prepared(conn, name, params):
+    """
+    Execute a statement from SPATIAL_STATEMENTS, preparing it on first use.
+    
+    Prepared statements live for the lifetime of the server session, so the
+    PREPARE round trip is only paid once per connection.
+    """
+    placeholders = ", ".join(["%s"] * len(params))
+    cur = conn.cursor()
+    try:
+        cur.execute(f"EXECUTE {name} ({placeholders})", params)
+    except psycopg2.errors.InvalidSqlStatementName:
+        conn.rollback()
+        param_types, body = SPATIAL_STATEMENTS[name]
+        cur.execute(f"PREPARE {name} ({param_types}) AS {body}")
+        cur.execute(f"EXECUTE {name} ({placeholders})", params)
+    return cur
+
+def parse_limit(value, default=100):
+    """Parse and bound a limit/k query parameter"""
+    limit = int(value) if value is not None else default
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    return min(limit, MAX_QUERY_LIMIT)
+
+def spatial_query_response(name, params):
+    """Cached response for a prepared spatial query (see spatial_query_features)"""
+    return cached_json_response(name, list(params), lambda: spatial_query_features(name, params))
+
+def spatial_query_features(name, params):
+    """Run a prepared spatial query and return its rows as a FeatureCollection"""
+    with db_connection() as conn:
+        cur = execute_prepared(conn, name, params)
+        rows = cur.fetchall()
+        cur.close()
+    
+    features = []
+    for row in rows:
+        properties = {"name": row[1]}
+        if row[3] is not None:
+            properties["distance_m"] = row[3]
+        features.append({
+            "type": "Feature",
+            "id": row[0],
+            "geometry": json_backend.loads(row[2]),
+            "properties": properties
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+@app.route('/nearest', methods=['GET'])
+def nearest():
+    """K nearest features to a point (KNN index scan)"""
+    try:
+        lon = float(request.args["lon"])
+        lat = float(request.args["lat"])
+        k = parse_limit(request.args.get("k"), default=10)
+    except (KeyError, ValueError) as e:
+        return jsonify({"error": f"lon, lat required as numbers and k positive: {e}"}), 400
+    
+    try:
+        return spatial_query_response("geo_nearest", (lon, lat, k))
+    except Exception as e:
+        logger.error(f"Nearest query failed: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/within', methods=['GET'])
+def within():
+    """Features fully within a bbox"""
+    try:
+        bbox = parse_bbox(request.args.get("bbox"))
+        limit = parse_limit(request.args.get("limit"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        return spatial_query_response("geo_within", (*bbox, limit))
+    except Exception as e:
+        logger.error(f"Within query failed: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/intersects', methods=['GET'])
+def intersects():
+    """Features intersecting a bbox or a GeoJSON geometry"""
+    try:
+        limit = parse_limit(request.args.get("limit"))
+        if request.args.get("geometry"):
+            geometry = json_backend.loads(request.args["geometry"])
+            if not isinstance(geometry, dict) or "type" not in geometry:
+                raise ValueError("geometry must be a GeoJSON geometry object")
+        else:
+            minx, miny, maxx, maxy = parse_bbox(request.args.get("bbox"))
+            geometry = {
+                "type": "Polygon",
+                "coordinates": [[[minx, miny], [maxx, miny], [maxx, maxy], [minx, maxy], [minx, miny]]]
+            }
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        return spatial_query_response("geo_intersects", (json_backend.dumps(geometry), limit))
+    except Exception as e:
+        logger.error(f"Intersects query failed: {e}")
+        return jsonify({"error": str(e)}), 500
+
+def upload_summary(row):
+    """Shape an uploads row (see UPLOADS_COLUMNS) as JSON"""
+    return {
+        "upload_id": row[0],
+        "source": row[1],
+        "feature_count": row[2],
+        "vertex_count": row[3],
+        "geom_types": row[4],
+        "bbox": list(row[5:9]) if row[5] is not None else None,
+        "created_at": row[9].isoformat() if row[9] else None,
+        "updated_at": row[10].isoformat() if row[10] else None
+    }
+
+UPLOADS_COLUMNS = """
+    upload_id, source, feature_count, vertex_count, geom_types,
+    ST_XMin(extent), ST_YMin(extent), ST_XMax(extent), ST_YMax(extent),
+    created_at, updated_at
+"""
+
+@app.route('/uploads', methods=['GET'])
+def list_uploads():
+    """Upload summaries, optionally only those whose extent touches a bbox"""
+    try:
+        limit = parse_limit(request.args.get("limit"))
+        bbox = parse_bbox(request.args["bbox"]) if request.args.get("bbox") else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        with db_connection() as conn:
             with conn.cursor() as cur:
-                cur.execute("""
-                    SELECT id, name, ST_AsGeoJSON(geom) as geometry, properties, created_at
-                    FROM geo_data
-                    ORDER BY created_at DESC
-                    LIMIT 100
-                """)
+                if bbox:
+                    # && against the GIST-indexed extent; geo_data is never scanned
+                    cur.execute(f"""
+                        SELECT {UPLOADS_COLUMNS} FROM uploads
+                        WHERE extent && ST_MakeEnvelope(%s, %s, %s, %s, 4326)
+                        ORDER BY created_at DESC LIMIT %s
+                    """, (*bbox, limit))
+                else:
+                    cur.execute(f"""
+                        SELECT {UPLOADS_COLUMNS} FROM uploads
+                        ORDER BY created_at DESC LIMIT %s
+                    """, (limit,))
                 rows = cur.fetchall()
-                
-                features = []
-                for row in rows:
-                    features.append({
-                        "id": row[0],
-                        "name": row[1],
-                        "geometry": json.loads(row[2]),
-                        "properties": row[3],
-                        "created_at": row[4].isoformat()
-                    })
-                
-                return jsonify({
-                    "type": "FeatureCollection",
-                    "features": features
-                }), 200
-                
+        return jsonify({"uploads": [upload_summary(row) for row in rows]}), 200
     except Exception as e:
-        logger.error(f"Data retrieval failed: {e}")
+        logger.error(f"Upload listing failed: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/uploads/<upload_id>', methods=['GET'])
+def get_upload(upload_id):
+    """Extent and statistics of one upload"""
+    try:
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"SELECT {UPLOADS_COLUMNS} FROM uploads WHERE upload_id = %s", (upload_id,))
+                row = cur.fetchone()
+        if row is None:
+            return jsonify({"error": f"Upload {upload_id} not found"}), 404
+        return jsonify(upload_summary(row)), 200
+    except Exception as e:
+        logger.error(f"Upload lookup failed: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/density', methods=['GET'])
+def density():
+    """Feature counts per quadkey cell at zoom z, read from the grid_cells aggregates"""
+    zooms = grid_zooms()
+    try:
+        zoom = int(request.args["z"])
+        if zoom not in zooms:
+            raise ValueError(f"z must be one of {list(zooms)}")
+        bbox = parse_bbox(request.args["bbox"]) if request.args.get("bbox") else None
+        min_count = int(request.args.get("min_count", 1))
+    except KeyError:
+        return jsonify({"error": f"z is required, one of {list(zooms)}"}), 400
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                cells = density_cells(cur, zoom, bbox, min_count)
+    except Exception as e:
+        logger.error(f"Density query failed: {e}")
+        return jsonify({"error": str(e)}), 500
+    
+    features = []
+    for cell in cells:
+        minx, miny, maxx, maxy = tile_bounds(cell["x"], cell["y"], zoom)
+        features.append({
+            "type": "Feature",
+            "id": cell["quadkey"],
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": [[[minx, miny], [maxx, miny], [maxx, maxy], [minx, maxy], [minx, miny]]]
+            },
+            "properties": {"zoom": zoom, "x": cell["x"], "y": cell["y"],
+                           "count": cell["count"], "bbox": cell["bbox"]}
+        })
+    return jsonify({"type": "FeatureCollection", "features": features}), 200
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", str(DEFAULT_BATCH_SIZE)))
+
+@app.route('/export', methods=['GET'])
+def export_data():
+    """Stream geo_data as GeoJSONSeq, FlatGeobuf or GeoParquet with constant memory"""
+    fmt = request.args.get("format", "geojsonseq")
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+    try:
+        filters = {
+            "bbox": parse_bbox(request.args["bbox"]) if request.args.get("bbox") else None,
+            "upload_id": request.args.get("upload_id"),
+            "limit": int(request.args["limit"]) if request.args.get("limit") else None,
+        }
+        if filters["limit"] is not None and filters["limit"] < 1:
+            raise ValueError("limit must be positive")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    def generate():
+        # The pooled connection (and its server-side cursor) is held only
+        # while the response body is being sent
+        with db_connection() as conn:
+            yield from stream_export(conn, fmt, EXPORT_BATCH_SIZE, **filters)
+    
+    content_type, extension = EXPORT_FORMATS[fmt]
+    return Response(generate(), mimetype=content_type, headers={
+        "Content-Disposition": f'attachment; filename="geo_data{extension}"'
+    })
+
 @app.route('/', methods=['GET'])
 def index():
     """Main application endpoint"""
@@ -188,11 +634,52 @@ def index():
         "endpoints": {
             "health": "/health",
             "ready": "/ready",
+            "metrics": "/metrics",
             "upload": "/upload",
-            "data": "/data"
+            "data": "/data",
+            "uploads": "/uploads?bbox= or /uploads/<upload_id>",
+            "density": "/density?z=&bbox=",
+            "export": "/export?format=geojsonseq|fgb|parquet&bbox=&upload_id=&limit=",
+            "nearest": "/nearest?lon=&lat=&k=",
+            "within": "/within?bbox=minx,miny,maxx,maxy",
+            "intersects": "/intersects?bbox= or ?geometry="
         }
     }), 200
 
+def run_production_server(port):
+    """
+    Serve the app with gunicorn: WEB_WORKERS pre-forked processes, each with
+    WEB_THREADS threads sharing that process's connection pool.
+    """
+    from gunicorn.app.base import BaseApplication
+
+    class StandaloneApplication(BaseApplication):
+        def __init__(self, application, options):
+            self.application = application
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+    options = {
+        "bind": f"0.0.0.0:{port}",
+        "workers": int(os.getenv("WEB_WORKERS", str((os.cpu_count() or 1) * 2 + 1))),
+        "worker_class": "gthread",
+        "threads": int(os.getenv("WEB_THREADS", "4")),
+        "timeout": int(os.getenv("WEB_TIMEOUT", "120")),
+        "accesslog": "-",
+    }
+    logger.info(f"Starting production server: {options}")
+    StandaloneApplication(app, options).run()
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port, debug=False)
+    if os.getenv("SERVER_MODE", "development").lower() == "production":
+        run_production_server(port)
+    else:
+        app.run(host='0.0.0.0', port=port, debug=False)
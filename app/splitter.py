@@ -0,0 +1,345 @@
+"""
+Fan-out splitting of very large GeoJSON FeatureCollections.
+
+A single pass over the input finds the byte offsets of every feature in the
+top-level "features" array. Consecutive features are grouped into shards of
+roughly equal byte size; each shard manifest records a contiguous byte range
+that parses on its own as ``[<range>]``. Shards are handed to parallel workers
+(separate Lambda invocations in AWS, a multiprocessing pool locally) and the
+per-shard results are aggregated into one ingestion summary.
+
+Usage:
+    python splitter.py big.geojson --workers 8 --shard-mb 64 --manifest-dir ./shards
+"""
+import os
+import sys
+import json
+import argparse
+import logging
+from multiprocessing import Pool
+from typing import Dict, Any, List, Tuple, Optional, BinaryIO
+
+import numpy as np
+
+import json_backend
+from entrypoint import ingest_features, detect_compression, is_geojson_seq
+from upload_stats import new_upload_id
+from reproject import detect_crs_in_header, HEADER_SCAN_BYTES
+from overlaps import add_overlap_summary
+
+logger = logging.getLogger(__name__)
+
+SCAN_CHUNK_SIZE = 16 * 1024 * 1024
+DEFAULT_SHARD_BYTES = 64 * 1024 * 1024
+
+_QUOTE, _BACKSLASH, _COLON, _COMMA = 0x22, 0x5C, 0x3A, 0x2C
+_OPENERS, _CLOSERS = (0x7B, 0x5B), (0x7D, 0x5D)  # { [  and  } ]
+
+
+def is_splittable(filepath: str) -> bool:
+    """Only uncompressed FeatureCollections can be addressed by byte range."""
+    return detect_compression(filepath) is None and not is_geojson_seq(filepath)
+
+
+def split_threshold_bytes() -> int:
+    """Input size above which files are fanned out (SPLIT_THRESHOLD_BYTES)."""
+    return int(os.getenv("SPLIT_THRESHOLD_BYTES", str(256 * 1024 * 1024)))
+
+
+def _find_features_array(stream: BinaryIO, chunk_size: int) -> Tuple[int, bytes]:
+    """
+    Scan the FeatureCollection header byte by byte for the "features" array.
+
+    The header ("type", "crs", "bbox", ...) is normally tiny, so a simple
+    per-byte state machine is fine here.
+
+    Returns:
+        Tuple of (absolute offset just past the opening '[', unread remainder
+        of the current chunk)
+    """
+    depth = 0
+    in_string = escape = False
+    current = bytearray()
+    last_string = key = None
+    pos = 0
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            raise ValueError("No top-level 'features' array found")
+        for i, b in enumerate(chunk):
+            if in_string:
+                if escape:
+                    escape = False
+                elif b == _BACKSLASH:
+                    escape = True
+                elif b == _QUOTE:
+                    in_string = False
+                    last_string = bytes(current)
+                    continue
+                if depth == 1:
+                    current.append(b)
+            elif b == _QUOTE:
+                in_string = True
+                current.clear()
+            elif b == _COLON and depth == 1:
+                key = last_string
+            elif b == _COMMA and depth == 1:
+                key = None
+            elif b in _OPENERS:
+                if b == 0x5B and depth == 1 and key == b"features":
+                    return pos + i + 1, chunk[i + 1:]
+                depth += 1
+            elif b in _CLOSERS:
+                depth -= 1
+        pos += len(chunk)
+
+
+def scan_feature_offsets(stream: BinaryIO, chunk_size: int = SCAN_CHUNK_SIZE) -> np.ndarray:
+    """
+    Find the [start, end) byte range of every feature in a FeatureCollection.
+
+    The stream is read once, sequentially, so it can be a local file or an S3
+    StreamingBody. Inside the features array, quotes, backslashes and
+    brackets are located with numpy; only escapes need a Python loop, and
+    only in chunks that contain backslashes.
+
+    Args:
+        stream: Binary stream positioned at the start of the document
+        chunk_size: Bytes read per iteration
+
+    Returns:
+        (N, 2) int64 array of start, end offsets, end exclusive (16 bytes a
+        feature rather than a Python tuple each)
+    """
+    base, chunk = _find_features_array(stream, chunk_size)
+    pieces = []
+    depth = 1  # inside the features array
+    in_string = False
+    escaped_pos = -1  # absolute offset of a byte escaped by a trailing backslash
+    feature_start = None
+
+    while True:
+        if not chunk:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                raise ValueError("Unterminated 'features' array")
+        arr = np.frombuffer(chunk, dtype=np.uint8)
+
+        # String spans. Without backslashes every quote toggles (fast path);
+        # otherwise walk quotes and backslashes in order to honour escapes.
+        start_state = in_string
+        quotes = np.flatnonzero(arr == _QUOTE)
+        backslashes = np.flatnonzero(arr == _BACKSLASH)
+        if len(backslashes) == 0 and escaped_pos != base:
+            toggles = quotes
+        else:
+            toggles = []
+            for p in np.union1d(quotes, backslashes).tolist():
+                if base + p == escaped_pos:
+                    continue
+                if chunk[p] == _BACKSLASH:
+                    if in_string:
+                        escaped_pos = base + p + 1
+                else:
+                    in_string = not in_string
+                    toggles.append(p)
+        in_string = start_state ^ (len(toggles) % 2 == 1)
+
+        # Depth is only tracked over bracket positions outside strings; a
+        # bracket is inside a string when an odd number of toggles precede it.
+        brackets = np.flatnonzero((arr == 0x7B) | (arr == 0x5B) | (arr == 0x7D) | (arr == 0x5D))
+        if len(toggles):
+            preceding = np.searchsorted(np.asarray(toggles), brackets, side='right')
+            brackets = brackets[(preceding % 2 == 1) == start_state]
+        elif start_state:
+            brackets = brackets[:0]
+        values = arr[brackets]
+        is_open = (values == 0x7B) | (values == 0x5B)
+        delta = np.where(is_open, 1, -1).astype(np.int32)
+        depth_after = depth + np.cumsum(delta, dtype=np.int64)
+        depth_before = depth_after - delta
+
+        starts = brackets[is_open & (depth_before == 1)]
+        ends = brackets[~is_open & (depth_after == 1)]
+        array_end = brackets[~is_open & (depth_after == 0)]
+        limit = int(array_end[0]) if len(array_end) else len(arr)
+
+        # Features at depth 1 strictly alternate start, end: the first end
+        # closes a feature carried over from the previous chunk, and a
+        # trailing start is carried into the next one
+        starts = starts[starts < limit].astype(np.int64) + base
+        ends = ends[ends < limit].astype(np.int64) + base + 1
+        if feature_start is not None:
+            starts = np.concatenate(([feature_start], starts))
+        pieces.append(np.column_stack((starts[:len(ends)], ends)))
+        feature_start = int(starts[len(ends)]) if len(starts) > len(ends) else None
+
+        if len(array_end):
+            return np.concatenate(pieces) if pieces else np.empty((0, 2), dtype=np.int64)
+        if len(depth_after):
+            depth = int(depth_after[-1])
+        base += len(arr)
+        chunk = b""
+
+
+def plan_shards(offsets: np.ndarray, source: str,
+                shard_bytes: int = DEFAULT_SHARD_BYTES,
+                upload_id: Optional[str] = None, crs: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Group consecutive features into shards of about shard_bytes each.
+
+    Args:
+        offsets: Feature byte ranges from scan_feature_offsets
+        source: Source identifier recorded in each manifest
+        shard_bytes: Target shard size in bytes
+        upload_id: Upload id shared by all shards, so their statistics
+            merge into one uploads row (generated when omitted)
+        crs: Source CRS from the document header (detect_crs_in_header);
+            shards never see the header themselves
+
+    Returns:
+        List of shard manifests with source, upload_id, crs, shard, shards,
+        start, end, first_feature and features
+    """
+    if upload_id is None:
+        upload_id = new_upload_id()
+    offsets = np.asarray(offsets, dtype=np.int64).reshape(-1, 2)
+    starts, ends = offsets[:, 0], offsets[:, 1]
+    manifests = []
+    first = 0
+    while first < len(offsets):
+        # Last feature ending within shard_bytes of the shard start (at least one)
+        last = max(first, int(np.searchsorted(ends, starts[first] + shard_bytes, side='right')) - 1)
+        manifests.append({
+            "source": source,
+            "upload_id": upload_id,
+            "crs": crs,
+            "shard": len(manifests),
+            "start": int(starts[first]),
+            "end": int(ends[last]),
+            "first_feature": first,
+            "features": last - first + 1,
+        })
+        first = last + 1
+    for manifest in manifests:
+        manifest["shards"] = len(manifests)
+    return manifests
+
+
+def write_manifests(manifests: List[Dict[str, Any]], directory: str) -> List[str]:
+    """Write one JSON manifest per shard to directory and return the paths."""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for manifest in manifests:
+        path = os.path.join(directory, f"shard-{manifest['shard']:05d}.manifest")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        paths.append(path)
+    return paths
+
+
+def parse_shard(data: bytes) -> List[Dict[str, Any]]:
+    """Parse the bytes of a shard range (features separated by commas)."""
+    return json_backend.loads(b"[" + data + b"]")
+
+
+def ingest_shard(manifest: Dict[str, Any], data: bytes, conn=None) -> Dict[str, Any]:
+    """
+    Ingest one shard given its manifest and the bytes of its range.
+
+    Returns:
+        Ingestion summary with the shard number added
+    """
+    features = parse_shard(data)
+    if len(features) != manifest["features"]:
+        raise ValueError(f"Shard {manifest['shard']}: expected {manifest['features']} "
+                         f"features, parsed {len(features)}")
+    summary = ingest_features(features, conn=conn, source=manifest["source"],
+                              upload_id=manifest.get("upload_id"), crs=manifest.get("crs"))
+    summary["shard"] = manifest["shard"]
+    return summary
+
+
+def _ingest_local_shard(manifest: Dict[str, Any]) -> Dict[str, Any]:
+    """multiprocessing worker: read the shard's byte range from disk and ingest it."""
+    try:
+        with open(manifest["source"], 'rb') as f:
+            f.seek(manifest["start"])
+            data = f.read(manifest["end"] - manifest["start"])
+        return ingest_shard(manifest, data)
+    except Exception as e:
+        logger.error(f"Shard {manifest['shard']} failed: {e}")
+        return {"shard": manifest["shard"], "error": f"{type(e).__name__}: {e}"}
+
+
+def aggregate_results(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Combine per-shard summaries into one ingestion summary.
+
+    Shards that returned an "error" key are listed in failed_shards.
+    """
+    summary = {"features": 0, "valid": 0, "inserted": 0, "duplicates": 0, "errors": 0,
+               "shards": len(results), "failed_shards": []}
+    for result in sorted(results, key=lambda r: r["shard"]):
+        if "error" in result:
+            summary["failed_shards"].append({"shard": result["shard"], "error": result["error"]})
+            continue
+        for field in ("features", "valid", "inserted", "duplicates", "errors"):
+            summary[field] += result.get(field, 0)
+        if result.get("overlaps"):
+            summary["overlaps"] = add_overlap_summary(summary.get("overlaps"), result["overlaps"])
+    return summary
+
+
+def split_and_ingest(filepath: str, workers: int = 4, shard_bytes: int = DEFAULT_SHARD_BYTES,
+                     manifest_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Local coordinator: scan, plan shards and ingest them with a process pool.
+
+    Args:
+        filepath: Uncompressed GeoJSON FeatureCollection
+        workers: Number of worker processes
+        shard_bytes: Target shard size in bytes
+        manifest_dir: Optional directory to write shard manifests to
+
+    Returns:
+        Aggregated ingestion summary
+    """
+    if not is_splittable(filepath):
+        raise ValueError(f"{filepath} is compressed or a GeoJSON sequence and cannot be split")
+
+    with open(filepath, 'rb') as f:
+        crs = detect_crs_in_header(f.read(HEADER_SCAN_BYTES))
+        f.seek(0)
+        offsets = scan_feature_offsets(f)
+    manifests = plan_shards(offsets, os.path.abspath(filepath), shard_bytes, crs=crs)
+    logger.info(f"Split {filepath} into {len(manifests)} shard(s) covering {len(offsets)} features")
+    if manifest_dir:
+        write_manifests(manifests, manifest_dir)
+
+    with Pool(processes=max(1, min(workers, len(manifests) or 1))) as pool:
+        results = pool.map(_ingest_local_shard, manifests)
+    summary = aggregate_results(results)
+    summary["upload_id"] = manifests[0]["upload_id"] if manifests else None
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Split a large GeoJSON file and ingest shards in parallel")
+    parser.add_argument("filepath", help="Uncompressed GeoJSON FeatureCollection")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--shard-mb", type=float, default=DEFAULT_SHARD_BYTES / (1024 * 1024),
+                        help="Target shard size in MB")
+    parser.add_argument("--manifest-dir", help="Directory to write shard manifests to")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    summary = split_and_ingest(args.filepath, workers=args.workers,
+                               shard_bytes=int(args.shard_mb * 1024 * 1024),
+                               manifest_dir=args.manifest_dir)
+    print(json.dumps(summary, indent=2))
+    return 1 if summary["failed_shards"] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,205 @@
+"""
+Per-upload extent and statistics summaries.
+
+Every ingest tags its geo_data rows with an upload id and records one row in
+the ``uploads`` table: bounding box (GIST indexed), feature count, geometry
+type histogram and vertex total. Questions like "what is the extent of upload
+X" or "which uploads touch this tile" are answered from that small table
+instead of scanning geo_data.
+
+Statistics are accumulated in Python from the Shapely geometries built during
+validation, so they cost no extra pass over the data. Several batches (or
+fan-out shards) of one upload merge into the same row.
+
+Every ingest transaction that inserts rows also bumps a single ingest
+generation counter, so readers (the API response cache) can tell whether
+geo_data may have changed with one primary key lookup.
+"""
+import uuid
+import logging
+from collections import Counter
+from typing import Dict, Any, List, Optional
+
+import json_backend
+
+logger = logging.getLogger(__name__)
+
+UPLOADS_DDL = """
+    CREATE TABLE IF NOT EXISTS uploads (
+        upload_id TEXT PRIMARY KEY,
+        source TEXT,
+        feature_count BIGINT NOT NULL DEFAULT 0,
+        vertex_count BIGINT NOT NULL DEFAULT 0,
+        geom_types JSONB NOT NULL DEFAULT '{}'::jsonb,
+        extent GEOMETRY(Polygon, 4326),
+        created_at TIMESTAMP DEFAULT NOW(),
+        updated_at TIMESTAMP DEFAULT NOW()
+    );
+    CREATE INDEX IF NOT EXISTS idx_uploads_extent ON uploads USING GIST (extent);
+"""
+
+# Counts are added and extents widened when an upload already has a row.
+# LEAST/GREATEST ignore NULLs, so an empty side leaves the other extent as is.
+UPSERT_UPLOAD_SQL = """
+    INSERT INTO uploads (upload_id, source, feature_count, vertex_count, geom_types, extent)
+    VALUES (%s, %s, %s, %s, %s::jsonb, ST_MakeEnvelope(%s, %s, %s, %s, 4326))
+    ON CONFLICT (upload_id) DO UPDATE SET
+        feature_count = uploads.feature_count + EXCLUDED.feature_count,
+        vertex_count = uploads.vertex_count + EXCLUDED.vertex_count,
+        geom_types = (
+            SELECT COALESCE(jsonb_object_agg(key, total), '{}'::jsonb)
+            FROM (
+                SELECT key, SUM(value::bigint) AS total
+                FROM (
+                    SELECT * FROM jsonb_each_text(uploads.geom_types)
+                    UNION ALL
+                    SELECT * FROM jsonb_each_text(EXCLUDED.geom_types)
+                ) AS counts
+                GROUP BY key
+            ) AS merged
+        ),
+        extent = ST_MakeEnvelope(
+            LEAST(ST_XMin(uploads.extent), ST_XMin(EXCLUDED.extent)),
+            LEAST(ST_YMin(uploads.extent), ST_YMin(EXCLUDED.extent)),
+            GREATEST(ST_XMax(uploads.extent), ST_XMax(EXCLUDED.extent)),
+            GREATEST(ST_YMax(uploads.extent), ST_YMax(EXCLUDED.extent)),
+            4326
+        ),
+        updated_at = NOW()
+"""
+
+INGEST_GENERATION_DDL = """
+    CREATE TABLE IF NOT EXISTS ingest_generation (
+        id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+        generation BIGINT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT NOW()
+    );
+"""
+
+BUMP_GENERATION_SQL = """
+    INSERT INTO ingest_generation (id, generation) VALUES (1, 1)
+    ON CONFLICT (id) DO UPDATE SET
+        generation = ingest_generation.generation + 1,
+        updated_at = NOW()
+    RETURNING generation
+"""
+
+# shapely.get_type_id() codes
+GEOMETRY_TYPES = ("Point", "LineString", "LinearRing", "Polygon", "MultiPoint",
+                  "MultiLineString", "MultiPolygon", "GeometryCollection")
+
+
+def new_upload_id() -> str:
+    """Return a fresh upload id."""
+    return uuid.uuid4().hex
+
+
+class UploadStats:
+    """Running extent, feature count, geometry-type histogram and vertex total."""
+
+    def __init__(self):
+        self.feature_count = 0
+        self.vertex_count = 0
+        self.geom_types: Counter = Counter()
+        self.bounds: Optional[List[float]] = None  # [minx, miny, maxx, maxy]
+
+    def add_geometries(self, geoms: List[Any]) -> None:
+        """Add a batch of Shapely geometries using vectorized calls."""
+        geoms = [geom for geom in geoms if geom is not None]
+        if not geoms:
+            return
+        import numpy as np
+        import shapely
+
+        geoms = np.asarray(geoms, dtype=object)
+        self.feature_count += len(geoms)
+        self.vertex_count += int(shapely.get_num_coordinates(geoms).sum())
+        type_ids, counts = np.unique(shapely.get_type_id(geoms), return_counts=True)
+        for type_id, count in zip(type_ids.tolist(), counts.tolist()):
+            self.geom_types[GEOMETRY_TYPES[type_id]] += count
+        bounds = shapely.bounds(geoms)
+        if not np.isnan(bounds).all():  # all-empty batches have NaN bounds
+            self._extend([float(np.nanmin(bounds[:, 0])), float(np.nanmin(bounds[:, 1])),
+                          float(np.nanmax(bounds[:, 2])), float(np.nanmax(bounds[:, 3]))])
+
+    def add_geojson(self, geometry: Dict[str, Any]) -> None:
+        """Add one GeoJSON geometry dict (used when Shapely is unavailable)."""
+        self.feature_count += 1
+        self.geom_types[geometry.get("type")] += 1
+        xs, ys = [], []
+        _collect_coordinates(geometry, xs, ys)
+        self.vertex_count += len(xs)
+        if xs:
+            self._extend([min(xs), min(ys), max(xs), max(ys)])
+
+    def _extend(self, bounds: List[float]) -> None:
+        if self.bounds is None:
+            self.bounds = bounds
+        else:
+            self.bounds = [min(self.bounds[0], bounds[0]), min(self.bounds[1], bounds[1]),
+                           max(self.bounds[2], bounds[2]), max(self.bounds[3], bounds[3])]
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "feature_count": self.feature_count,
+            "vertex_count": self.vertex_count,
+            "geom_types": dict(self.geom_types),
+            "bbox": self.bounds,
+        }
+
+
+def _collect_coordinates(geometry: Dict[str, Any], xs: List[float], ys: List[float]) -> None:
+    if geometry.get("type") == "GeometryCollection":
+        for member in geometry.get("geometries") or []:
+            _collect_coordinates(member, xs, ys)
+        return
+
+    def walk(coords):
+        if coords and isinstance(coords[0], (int, float)):
+            xs.append(coords[0])
+            ys.append(coords[1])
+        else:
+            for item in coords or []:
+                walk(item)
+
+    walk(geometry.get("coordinates"))
+
+
+def record_upload(cur, upload_id: str, source: str, stats: UploadStats) -> None:
+    """
+    Upsert the summary row for upload_id on an open cursor (no commit).
+
+    Args:
+        cur: psycopg2 cursor inside the ingest transaction
+        upload_id: Upload id the geo_data rows were tagged with
+        source: File path or S3 key the upload came from
+        stats: Statistics of the rows inserted in this transaction
+    """
+    bounds = stats.bounds or [None, None, None, None]
+    cur.execute(UPSERT_UPLOAD_SQL, (
+        upload_id, source, stats.feature_count, stats.vertex_count,
+        json_backend.dumps(dict(stats.geom_types)), *bounds
+    ))
+    logger.info(f"Recorded upload {upload_id}: {stats.feature_count} features, "
+                f"{stats.vertex_count} vertices, bbox {stats.bounds}")
+
+
+def bump_generation(cur) -> int:
+    """
+    Increment the ingest generation on an open cursor (no commit).
+
+    The counter row stays locked until the caller commits, so call this as
+    the last statement of the ingest transaction.
+
+    Returns:
+        The new generation, visible to readers once committed
+    """
+    cur.execute(BUMP_GENERATION_SQL)
+    return cur.fetchone()[0]
+
+
+def read_generation(cur) -> int:
+    """Current ingest generation; 0 before the first ingest."""
+    cur.execute("SELECT generation FROM ingest_generation WHERE id = 1")
+    row = cur.fetchone()
+    return row[0] if row else 0
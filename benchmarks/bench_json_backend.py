@@ -0,0 +1,105 @@
+"""
+Micro-benchmark for the ingest parse/encode path.
+
+Compares the previous path (stdlib json parse plus json.dumps of every
+geometry for ST_GeomFromGeoJSON) with the current one (json_backend parse
+plus one vectorized Shapely WKB encode per file). No database is needed.
+
+Usage:
+    python benchmarks/bench_json_backend.py --features 50000 --repeat 5
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+import json_backend  # noqa: E402
+
+
+def make_collection(n_features: int, ring_size: int) -> bytes:
+    """Build a FeatureCollection of small polygons encoded as JSON bytes"""
+    rng = random.Random(42)
+    features = []
+    for i in range(n_features):
+        x, y = rng.uniform(-170, 170), rng.uniform(-80, 80)
+        ring = [[x + 0.01 * (j % 2), y + 0.01 * (j // 2 % 2)] for j in range(ring_size)]
+        ring.append(ring[0])
+        features.append({
+            "type": "Feature",
+            "properties": {"name": f"feature-{i}"},
+            "geometry": {"type": "Polygon", "coordinates": [ring]},
+        })
+    return json.dumps({"type": "FeatureCollection", "features": features}).encode()
+
+
+def old_path(payload: bytes) -> int:
+    from shapely.geometry import shape
+    data = json.loads(payload)
+    total = 0
+    for f in data["features"]:
+        shape(f["geometry"])  # validation, as in validate_geojson_feature
+        total += len(json.dumps(f["geometry"]))
+    return total
+
+
+def new_path(payload: bytes) -> int:
+    import shapely
+    from shapely.geometry import shape
+    data = json_backend.loads(payload)
+    geoms = [shape(f["geometry"]) for f in data["features"]]
+    return sum(len(w) for w in shapely.to_wkb(geoms, output_dimension=2))
+
+
+def parse_only(loads, payload: bytes) -> int:
+    return len(loads(payload)["features"])
+
+
+def best_of(fn, payload: bytes, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(payload)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--features", type=int, default=50000)
+    parser.add_argument("--ring-size", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    payload = make_collection(args.features, args.ring_size)
+    print(f"json_backend: {json_backend.BACKEND}, payload {len(payload) / 1e6:.1f} MB, "
+          f"{args.features} features")
+
+    parse_rows = [
+        ("parse: stdlib json", best_of(lambda p: parse_only(json.loads, p), payload, args.repeat)),
+        (f"parse: {json_backend.BACKEND}", best_of(lambda p: parse_only(json_backend.loads, p), payload, args.repeat)),
+    ]
+    report(parse_rows, args.features)
+
+    try:
+        ingest_rows = [
+            ("ingest: json + validate + json.dumps", best_of(old_path, payload, args.repeat)),
+            (f"ingest: {json_backend.BACKEND} + validate + batch WKB", best_of(new_path, payload, args.repeat)),
+        ]
+        report(ingest_rows, args.features)
+    except ImportError:
+        print("shapely not installed; skipping ingest path comparison")
+
+
+def report(rows, n_features: int) -> None:
+    baseline = rows[0][1]
+    for label, seconds in rows:
+        print(f"{label:<44} {seconds * 1000:9.1f} ms  {n_features / seconds:10.0f} features/s  "
+              f"x{baseline / seconds:.2f}")
+
+
+if __name__ == '__main__':
+    main()
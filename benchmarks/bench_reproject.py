@@ -0,0 +1,95 @@
+"""
+Micro-benchmark for the reprojection stage.
+
+Reprojects about a million vertices (polygons in UTM zone 33N) to EPSG:4326
+three ways: a new pyproj Transformer per feature (the naive approach), a
+cached Transformer applied feature by feature, and
+reproject.reproject_geometries (cached Transformer, one bulk transform per
+chunk). No database is needed.
+
+Usage:
+    python benchmarks/bench_reproject.py --vertices 1000000 --ring-size 20
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+import reproject  # noqa: E402
+
+SOURCE_CRS = "EPSG:32633"
+
+
+def make_geometries(n_vertices: int, ring_size: int):
+    """Build small UTM polygons totalling about n_vertices vertices"""
+    from shapely.geometry import Polygon
+    rng = random.Random(42)
+    geoms = []
+    for _ in range(max(1, n_vertices // (ring_size + 1))):
+        x, y = rng.uniform(200000, 800000), rng.uniform(0, 9000000)
+        ring = [(x + 50 * (j % 2), y + 50 * (j // 2 % 2)) for j in range(ring_size)]
+        geoms.append(Polygon(ring))
+    return geoms
+
+
+def per_feature_new_transformer(geoms):
+    import shapely
+    from pyproj import Transformer
+    return [shapely.transform(g, reproject.coords_transform(
+                Transformer.from_crs(SOURCE_CRS, "EPSG:4326", always_xy=True)))
+            for g in geoms]
+
+
+def per_feature_cached_transformer(geoms):
+    import shapely
+    transform = reproject.coords_transform(reproject.get_transformer(SOURCE_CRS))
+    return [shapely.transform(g, transform) for g in geoms]
+
+
+def bulk(geoms):
+    return reproject.reproject_geometries(geoms, SOURCE_CRS)
+
+
+def timed(fn, geoms, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(geoms)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--vertices", type=int, default=1_000_000)
+    parser.add_argument("--ring-size", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--naive-sample", type=int, default=2000,
+                        help="Features timed for the per-feature new-Transformer path (extrapolated)")
+    args = parser.parse_args()
+
+    import shapely
+    geoms = make_geometries(args.vertices, args.ring_size)
+    vertices = int(shapely.get_num_coordinates(geoms).sum())
+    print(f"{len(geoms)} polygons, {vertices} vertices, {SOURCE_CRS} -> EPSG:4326")
+
+    # Building a Transformer per feature is too slow to run on every feature;
+    # time a sample and scale it up
+    sample = geoms[:args.naive_sample]
+    naive = timed(per_feature_new_transformer, sample, 1) * len(geoms) / len(sample)
+    rows = [
+        ("per feature, new Transformer (extrapolated)", naive),
+        ("per feature, cached Transformer", timed(per_feature_cached_transformer, geoms, args.repeat)),
+        ("bulk per chunk, cached Transformer", timed(bulk, geoms, args.repeat)),
+    ]
+    baseline = rows[0][1]
+    for label, seconds in rows:
+        print(f"{label:<46} {seconds * 1000:10.1f} ms  {vertices / seconds / 1e6:7.2f} M vertices/s  "
+              f"x{baseline / seconds:.1f}")
+
+
+if __name__ == '__main__':
+    main()
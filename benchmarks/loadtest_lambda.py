@@ -0,0 +1,345 @@
+"""
+End-to-end load test for lambda_handler: S3 event -> download -> parse -> insert.
+
+The handler runs in-process against a local S3 stand-in and a real PostGIS:
+
+- S3: a filesystem-backed fake boto3 client (default), or any S3-compatible
+  endpoint such as ``moto_server`` via --s3-endpoint
+- PostGIS: the docker-compose ``postgis`` service (--compose starts it), or
+  whatever DB_HOST/DB_NAME/DB_USER/DB_PASS point at
+
+Synthetic FeatureCollections are generated once and S3 put events are fired
+at a fixed rate from a thread pool. The report has files/s, features/s,
+p50/p95/p99 per-record latency and peak RSS. ``compare`` runs the same load
+against two git revisions (checked out with ``git worktree``), each in its
+own process so peak RSS is per revision, and prints both side by side.
+
+Usage:
+    python benchmarks/loadtest_lambda.py run --files 40 --features 5000 --rate 4 --concurrency 4
+    python benchmarks/loadtest_lambda.py compare HEAD~5 HEAD --files 40 --features 5000 --compose
+"""
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import shutil
+import argparse
+import resource
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+BUCKET = "loadtest-bucket"
+
+
+class FakeS3Client:
+    """
+    Filesystem-backed stand-in for the boto3 S3 client calls the handler makes.
+
+    Objects live at <root>/<bucket>/<key>.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, bucket: str, key: str) -> str:
+        return os.path.join(self.root, bucket, key)
+
+    def put_object(self, Bucket: str, Key: str, Body: bytes, **_kwargs) -> Dict[str, Any]:
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(Body if isinstance(Body, bytes) else Body.read())
+        return {}
+
+    def download_file(self, Bucket: str, Key: str, Filename: str, **_kwargs) -> None:
+        shutil.copyfile(self._path(Bucket, Key), Filename)
+
+    def head_object(self, Bucket: str, Key: str, **_kwargs) -> Dict[str, Any]:
+        return {"ContentLength": os.path.getsize(self._path(Bucket, Key))}
+
+    def get_object(self, Bucket: str, Key: str, Range: Optional[str] = None, **_kwargs) -> Dict[str, Any]:
+        import io
+        with open(self._path(Bucket, Key), 'rb') as f:
+            if Range:
+                start, end = (int(v) for v in Range.replace("bytes=", "").split("-"))
+                f.seek(start)
+                data = f.read(end - start + 1)
+            else:
+                data = f.read()
+        return {"Body": io.BytesIO(data), "ContentLength": len(data)}
+
+
+class FakeContext:
+    """Minimal Lambda context; the deadline is far enough away never to matter."""
+
+    function_name = "loadtest"
+    aws_request_id = "loadtest"
+
+    def get_remaining_time_in_millis(self) -> int:
+        return 15 * 60 * 1000
+
+
+def make_collection(n_features: int, seed: int) -> bytes:
+    """A FeatureCollection of small polygons and points"""
+    rng = random.Random(seed)
+    features = []
+    for i in range(n_features):
+        x, y = rng.uniform(-170, 170), rng.uniform(-80, 80)
+        if i % 2:
+            geometry = {"type": "Point", "coordinates": [x, y]}
+        else:
+            geometry = {"type": "Polygon", "coordinates": [[
+                [x, y], [x + 0.01, y], [x + 0.01, y + 0.01], [x, y + 0.01], [x, y]
+            ]]}
+        features.append({"type": "Feature", "properties": {"name": f"f{seed}-{i}"}, "geometry": geometry})
+    return json.dumps({"type": "FeatureCollection", "features": features}).encode()
+
+
+def s3_event(bucket: str, objects: List[tuple]) -> Dict[str, Any]:
+    """S3 put notification for (key, size, etag) objects; real ones always carry the eTag"""
+    return {"Records": [
+        {"eventSource": "aws:s3",
+         "s3": {"bucket": {"name": bucket}, "object": {"key": key, "size": size, "eTag": etag}}}
+        for key, size, etag in objects
+    ]}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def wait_for_db(timeout: float = 60.0) -> None:
+    import psycopg2
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            psycopg2.connect(host=os.getenv("DB_HOST", "localhost"), port=os.getenv("DB_PORT", "5432"),
+                             dbname=os.getenv("DB_NAME"), user=os.getenv("DB_USER"),
+                             password=os.getenv("DB_PASS"), connect_timeout=3).close()
+            return
+        except psycopg2.OperationalError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(1)
+
+
+def start_compose_postgis() -> None:
+    subprocess.run(["docker", "compose", "up", "-d", "postgis"], cwd=REPO_ROOT, check=True)
+    wait_for_db()
+
+
+def run_load(args) -> Dict[str, Any]:
+    """Run one load test in this process against the app in args.app_dir"""
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    os.environ.setdefault("DB_HOST", "localhost")
+    # Keep every file on the single-invocation path
+    os.environ.setdefault("SPLIT_THRESHOLD_BYTES", str(1 << 62))
+    sys.path.insert(0, os.path.abspath(args.app_dir))
+    import logging
+    logging.disable(logging.INFO)
+    import lambda_handler as handler_module
+
+    data_dir = tempfile.mkdtemp(prefix="loadtest_s3_")
+    try:
+        if args.s3_endpoint:
+            import boto3
+            client = boto3.client("s3", endpoint_url=args.s3_endpoint)
+            client.create_bucket(Bucket=BUCKET)
+        else:
+            client = FakeS3Client(data_dir)
+        objects = []
+        for i in range(args.files):
+            body = make_collection(args.features, seed=i)
+            key = f"loadtest/{i:06d}.geojson"
+            client.put_object(Bucket=BUCKET, Key=key, Body=body)
+            # S3's ETag of a single-part upload is the md5 of the body
+            objects.append((key, len(body), hashlib.md5(body).hexdigest()))
+        handler_module.s3 = client
+
+        if args.truncate:
+            with handler_module.get_db_conn() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("TRUNCATE geo_data")
+                    # Otherwise the resumable path skips every object as already complete
+                    cur.execute("SELECT to_regclass('ingest_progress')")
+                    if cur.fetchone()[0]:
+                        cur.execute("TRUNCATE ingest_progress")
+                conn.commit()
+
+        # Per-record timing where the handler has a per-object function;
+        # older revisions only allow per-event timing
+        record_latencies: List[float] = []
+        lock = threading.Lock()
+        per_record = hasattr(handler_module, "_process_s3_object")
+        if per_record:
+            original = handler_module._process_s3_object
+
+            def timed(*a, **kw):
+                started = time.perf_counter()
+                try:
+                    return original(*a, **kw)
+                finally:
+                    with lock:
+                        record_latencies.append(time.perf_counter() - started)
+
+            handler_module._process_s3_object = timed
+
+        events = [s3_event(BUCKET, objects[i:i + args.records_per_event])
+                  for i in range(0, len(objects), args.records_per_event)]
+        outcomes = []
+
+        def fire(event):
+            started = time.perf_counter()
+            response = handler_module.lambda_handler(event, FakeContext())
+            elapsed = time.perf_counter() - started
+            body = json.loads(response["body"])
+            with lock:
+                outcomes.append((elapsed, len(event["Records"]), body.get("results", [])))
+
+        started = time.monotonic()
+        futures = []
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            for i, event in enumerate(events):
+                delay = started + i / args.rate - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                futures.append(pool.submit(fire, event))
+        wall = time.monotonic() - started
+        # An exception in fire (e.g. a non-JSON response body) loses the
+        # event's results; surface it instead of dropping it with the future
+        event_errors = []
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                event_errors.append(repr(e))
+        for error in event_errors[:5]:
+            print(f"event failed: {error}", file=sys.stderr)
+
+        if not per_record:
+            record_latencies = [elapsed / records for elapsed, records, _ in outcomes]
+        results = [r for _, _, event_results in outcomes for r in event_results]
+        features = sum(r.get("inserted", 0) for r in results if r.get("status") == "success")
+        files = sum(1 for r in results if r.get("status") == "success")
+        latencies = sorted(record_latencies)
+        return {
+            "app_dir": os.path.abspath(args.app_dir),
+            "files": args.files,
+            "features_per_file": args.features,
+            "records_per_event": args.records_per_event,
+            "rate_events_per_s": args.rate,
+            "concurrency": args.concurrency,
+            "wall_s": round(wall, 2),
+            "files_ok": files,
+            "files_failed": args.files - files,
+            "events_failed": len(event_errors),
+            "files_per_s": round(files / wall, 2),
+            "features_per_s": round(features / wall, 1),
+            "latency_ms_p50": round(percentile(latencies, 50) * 1000, 1),
+            "latency_ms_p95": round(percentile(latencies, 95) * 1000, 1),
+            "latency_ms_p99": round(percentile(latencies, 99) * 1000, 1),
+            "latency_per_record": per_record,
+            # ru_maxrss is KiB on Linux
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        }
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def run_revision(revision: str, run_args: List[str]) -> Dict[str, Any]:
+    """Check out revision in a temporary worktree and load test it in a subprocess"""
+    worktree = tempfile.mkdtemp(prefix="loadtest_wt_")
+    subprocess.run(["git", "worktree", "add", "--detach", worktree, revision],
+                   cwd=REPO_ROOT, check=True, capture_output=True)
+    try:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "run", "--json",
+             "--app-dir", os.path.join(worktree, "app"), *run_args],
+            check=True, capture_output=True, text=True
+        ).stdout
+        report = json.loads(output.strip().splitlines()[-1])
+        report["revision"] = subprocess.run(["git", "rev-parse", "--short", revision], cwd=REPO_ROOT,
+                                            check=True, capture_output=True, text=True).stdout.strip()
+        return report
+    finally:
+        subprocess.run(["git", "worktree", "remove", "--force", worktree], cwd=REPO_ROOT, check=False)
+
+
+def print_comparison(base: Dict[str, Any], head: Dict[str, Any]) -> None:
+    metrics = ["files_per_s", "features_per_s", "latency_ms_p50", "latency_ms_p95",
+               "latency_ms_p99", "peak_rss_mb", "files_failed", "events_failed"]
+    print(f"{'metric':<18} {base['revision']:>12} {head['revision']:>12} {'change':>9}")
+    for metric in metrics:
+        a, b = base[metric], head[metric]
+        change = f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+        print(f"{metric:<18} {a:>12} {b:>12} {change:>9}")
+    if not (base["latency_per_record"] and head["latency_per_record"]):
+        print("note: a revision without _process_s3_object reports per-event latency / records")
+
+
+def add_run_options(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--features", type=int, default=2000, help="Features per file")
+    parser.add_argument("--records-per-event", type=int, default=1)
+    parser.add_argument("--rate", type=float, default=2.0, help="Events fired per second")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent handler invocations")
+    parser.add_argument("--s3-endpoint", help="S3-compatible endpoint (e.g. moto_server) instead of the fake client")
+    parser.add_argument("--truncate", action="store_true", help="TRUNCATE geo_data (and ingest_progress) first")
+    # Also accepted after the subcommand; SUPPRESS keeps a --compose given
+    # before it from being reset to the subparser default
+    parser.add_argument("--compose", action="store_true", default=argparse.SUPPRESS,
+                        help="Start the docker-compose postgis service first")
+
+
+def run_options(args) -> List[str]:
+    options = ["--files", str(args.files), "--features", str(args.features),
+               "--records-per-event", str(args.records_per_event), "--rate", str(args.rate),
+               "--concurrency", str(args.concurrency)]
+    if args.s3_endpoint:
+        options += ["--s3-endpoint", args.s3_endpoint]
+    if args.truncate:
+        options.append("--truncate")
+    return options
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="End-to-end lambda_handler load test")
+    parser.add_argument("--compose", action="store_true", help="Start the docker-compose postgis service first")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Load test the app in --app-dir")
+    run.add_argument("--app-dir", default=os.path.join(REPO_ROOT, "app"))
+    run.add_argument("--json", action="store_true", help="Print the report as one JSON line")
+    add_run_options(run)
+
+    compare = sub.add_parser("compare", help="Load test two git revisions")
+    compare.add_argument("base")
+    compare.add_argument("head")
+    add_run_options(compare)
+
+    args = parser.parse_args(argv)
+    if args.compose:
+        start_compose_postgis()
+
+    if args.command == "run":
+        report = run_load(args)
+        print(json.dumps(report) if args.json else json.dumps(report, indent=2))
+        return 1 if report["files_failed"] else 0
+
+    base = run_revision(args.base, run_options(args))
+    head = run_revision(args.head, run_options(args))
+    print_comparison(base, head)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
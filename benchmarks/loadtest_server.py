@@ -0,0 +1,123 @@
+"""
+Closed-loop HTTP load test for the run_local API.
+
+Each client thread keeps one keep-alive connection open and issues requests
+back to back for the test duration. Reports throughput, latency percentiles
+and errors, and the server's connection pool metrics when /metrics is
+available. Use it to compare the development server with production mode:
+
+    python app/run_local.py                          # Flask dev server
+    SERVER_MODE=production WEB_WORKERS=4 WEB_THREADS=8 DB_POOL_MAX=8 python app/run_local.py
+
+Usage:
+    python benchmarks/loadtest_server.py --url http://localhost:5000 \\
+        --path "/within?bbox=-10,-10,10,10" --concurrency 32 --duration 30
+"""
+import sys
+import json
+import time
+import argparse
+import threading
+import http.client
+from urllib.parse import urlparse
+from typing import Dict, Any, List
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_client(host: str, port: int, paths: List[str], deadline: float,
+               latencies: List[float], errors: Dict[str, int], lock: threading.Lock) -> None:
+    """Issue requests on one keep-alive connection until the deadline"""
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    local_latencies = []
+    local_errors: Dict[str, int] = {}
+    i = 0
+    while time.monotonic() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            conn.request("GET", path)
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 400:
+                key = f"HTTP {response.status}"
+                local_errors[key] = local_errors.get(key, 0) + 1
+            else:
+                local_latencies.append(time.perf_counter() - started)
+        except Exception as e:
+            key = type(e).__name__
+            local_errors[key] = local_errors.get(key, 0) + 1
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=30)
+    conn.close()
+
+    with lock:
+        latencies.extend(local_latencies)
+        for key, count in local_errors.items():
+            errors[key] = errors.get(key, 0) + count
+
+
+def fetch_metrics(host: str, port: int) -> Dict[str, Any]:
+    try:
+        conn = http.client.HTTPConnection(host, port, timeout=5)
+        conn.request("GET", "/metrics")
+        response = conn.getresponse()
+        body = response.read()
+        conn.close()
+        return json.loads(body) if response.status == 200 else {}
+    except Exception:
+        return {}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Load test the run_local API")
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--path", action="append",
+                        help="Request path (repeatable; default /health and /within)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds")
+    args = parser.parse_args(argv)
+
+    target = urlparse(args.url)
+    host, port = target.hostname, target.port or 80
+    paths = args.path or ["/health", "/within?bbox=-180,-90,180,90&limit=100"]
+
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    lock = threading.Lock()
+    started = time.monotonic()
+    deadline = started + args.duration
+    threads = [
+        threading.Thread(target=run_client, args=(host, port, paths, deadline, latencies, errors, lock))
+        for _ in range(args.concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    latencies.sort()
+    report = {
+        "concurrency": args.concurrency,
+        "duration_s": round(elapsed, 2),
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_s": round(len(latencies) / elapsed, 1),
+        "latency_ms_p50": round(percentile(latencies, 50) * 1000, 2),
+        "latency_ms_p95": round(percentile(latencies, 95) * 1000, 2),
+        "latency_ms_p99": round(percentile(latencies, 99) * 1000, 2),
+        "server": fetch_metrics(host, port),
+    }
+    print(json.dumps(report, indent=2))
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
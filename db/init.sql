@@ -6,7 +6,8 @@ CREATE TABLE IF NOT EXISTS geo_data (
   id SERIAL PRIMARY KEY,
   name TEXT,
   geom GEOMETRY(Geometry, 4326),
-  uploaded_at TIMESTAMP DEFAULT NOW()
+  uploaded_at TIMESTAMP DEFAULT NOW(),
+  geom_hash TEXT
 );
 
 -- Create spatial index for better query performance
@@ -17,3 +18,63 @@ CREATE INDEX IF NOT EXISTS idx_geo_data_name ON geo_data (name);
 
 -- Create index on uploaded_at for time-based queries
 CREATE INDEX IF NOT EXISTS idx_geo_data_uploaded_at ON geo_data (uploaded_at);
+
+-- Deduplication key (GEO_DEDUP=true): md5 of the normalized geometry WKB plus name.
+-- Rows ingested without dedup keep geom_hash NULL and never conflict.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_geo_data_dedup ON geo_data (geom_hash, name);
+
+-- Upload tag (see app/upload_stats.py); each ingest tags its rows with one id
+ALTER TABLE geo_data ADD COLUMN IF NOT EXISTS upload_id TEXT;
+CREATE INDEX IF NOT EXISTS idx_geo_data_upload_id ON geo_data (upload_id);
+
+-- Overlap count recorded by GEO_OVERLAP_POLICY=tag (see app/overlaps.py)
+ALTER TABLE geo_data ADD COLUMN IF NOT EXISTS overlap_count INTEGER;
+
+-- Per-upload summary maintained during ingest: extent, feature count,
+-- geometry-type histogram and vertex total
+CREATE TABLE IF NOT EXISTS uploads (
+  upload_id TEXT PRIMARY KEY,
+  source TEXT,
+  feature_count BIGINT NOT NULL DEFAULT 0,
+  vertex_count BIGINT NOT NULL DEFAULT 0,
+  geom_types JSONB NOT NULL DEFAULT '{}'::jsonb,
+  extent GEOMETRY(Polygon, 4326),
+  created_at TIMESTAMP DEFAULT NOW(),
+  updated_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_uploads_extent ON uploads USING GIST (extent);
+
+-- Per-zoom quadkey cell counts maintained during ingest (see app/grid_aggregates.py)
+CREATE TABLE IF NOT EXISTS grid_cells (
+  zoom SMALLINT NOT NULL,
+  quadkey TEXT NOT NULL,
+  feature_count BIGINT NOT NULL DEFAULT 0,
+  minx DOUBLE PRECISION,
+  miny DOUBLE PRECISION,
+  maxx DOUBLE PRECISION,
+  maxy DOUBLE PRECISION,
+  updated_at TIMESTAMP DEFAULT NOW(),
+  PRIMARY KEY (zoom, quadkey)
+);
+
+-- Resume cursors of batched Lambda ingests (see app/ingest_progress.py)
+CREATE TABLE IF NOT EXISTS ingest_progress (
+  progress_key TEXT PRIMARY KEY,
+  upload_id TEXT NOT NULL,
+  feature_offset BIGINT NOT NULL DEFAULT 0,
+  total_features BIGINT,
+  inserted BIGINT NOT NULL DEFAULT 0,
+  duplicates BIGINT NOT NULL DEFAULT 0,
+  invocations INTEGER NOT NULL DEFAULT 0,
+  completed_at TIMESTAMP,
+  created_at TIMESTAMP DEFAULT NOW(),
+  updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Bumped by every ingest commit; keys the API response cache (see app/response_cache.py)
+CREATE TABLE IF NOT EXISTS ingest_generation (
+  id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+  generation BIGINT NOT NULL DEFAULT 0,
+  updated_at TIMESTAMP DEFAULT NOW()
+);
@@ -93,6 +93,10 @@ module "lambda" {
   memory_size   = var.lambda_memory_size
   s3_bucket_name = var.s3_bucket_name
   
+  enable_sqs_ingest           = var.enable_sqs_ingest
+  sqs_batch_size              = var.sqs_batch_size
+  sqs_batching_window_seconds = var.sqs_batching_window_seconds
+  
   # Temporarily disabled VPC config to test CloudWatch Logs connectivity
   # vpc_config = {
   #   subnet_ids         = module.vpc.private_subnet_ids
@@ -143,6 +147,7 @@ module "s3_trigger" {
   bucket_name    = module.storage.bucket_name
   lambda_arn     = module.lambda.function_arn
   function_name  = module.lambda.function_name
+  queue_arn      = module.lambda.ingest_queue_arn
   
   depends_on = [module.lambda, module.storage]
 }
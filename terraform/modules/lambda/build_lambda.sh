@@ -38,6 +38,13 @@ fi
 # Copy only Lambda-specific Python files
 cp "$APP_DIR/lambda_handler.py" "$PACKAGE_DIR/" || exit 1
 cp "$APP_DIR/entrypoint.py" "$PACKAGE_DIR/" || exit 1
+cp "$APP_DIR/json_backend.py" "$PACKAGE_DIR/" || exit 1
+cp "$APP_DIR/splitter.py" "$PACKAGE_DIR/" || exit 1
+cp "$APP_DIR/upload_stats.py" "$PACKAGE_DIR/" || exit 1
+cp "$APP_DIR/reproject.py" "$PACKAGE_DIR/" || exit 1
+cp "$APP_DIR/grid_aggregates.py" "$PACKAGE_DIR/" || exit 1
+cp "$APP_DIR/ingest_progress.py" "$PACKAGE_DIR/" || exit 1
+cp "$APP_DIR/overlaps.py" "$PACKAGE_DIR/" || exit 1
 
 # Install Lambda-specific dependencies (psycopg2-binary, geojson, boto3)
 cd "$PACKAGE_DIR" || exit 1
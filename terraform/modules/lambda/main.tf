@@ -8,6 +8,13 @@ resource "null_resource" "lambda_build" {
     app_hash         = filemd5("${path.root}/../app/lambda_handler.py")
     requirements_hash = filemd5("${path.root}/../app/requirements-lambda.txt")
     entrypoint_hash   = filemd5("${path.root}/../app/entrypoint.py")
+    json_backend_hash = filemd5("${path.root}/../app/json_backend.py")
+    splitter_hash     = filemd5("${path.root}/../app/splitter.py")
+    upload_stats_hash = filemd5("${path.root}/../app/upload_stats.py")
+    reproject_hash    = filemd5("${path.root}/../app/reproject.py")
+    grid_hash         = filemd5("${path.root}/../app/grid_aggregates.py")
+    progress_hash     = filemd5("${path.root}/../app/ingest_progress.py")
+    overlaps_hash     = filemd5("${path.root}/../app/overlaps.py")
     build_id         = random_id.build_id.hex
   }
 
@@ -129,7 +136,9 @@ resource "aws_lambda_function" "main" {
   }
 
   environment {
-    variables = var.environment_variables
+    variables = merge(var.environment_variables, {
+      RETRY_SCHEDULER_ROLE_ARN = aws_iam_role.retry_scheduler.arn
+    })
   }
 
   dead_letter_config {
@@ -174,7 +183,169 @@ resource "aws_iam_role_policy" "lambda_dlq" {
   })
 }
 
+# IAM policy for large-file fan-out: the coordinator stores the shard plan
+# and invokes this function asynchronously for each incomplete shard (failed
+# shards end up in the DLQ). Deadline-stopped ingests also invoke it
+# asynchronously to continue from their cursor
+resource "aws_iam_role_policy" "lambda_fanout" {
+  name = "${var.environment}-lambda-fanout-policy"
+  role = aws_iam_role.lambda_role.id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect   = "Allow"
+        Action   = ["lambda:InvokeFunction"]
+        Resource = "arn:aws:lambda:${data.aws_region.current.name}:${data.aws_caller_identity.current.account_id}:function:${var.function_name}"
+      },
+      {
+        Effect   = "Allow"
+        Action   = ["s3:PutObject"]
+        Resource = "arn:aws:s3:::${var.s3_bucket_name}/_shards/*"
+      }
+    ]
+  })
+}
+
+# Delayed retries of objects locked by another invocation are one-time
+# EventBridge Scheduler schedules that invoke this function with this role
+resource "aws_iam_role" "retry_scheduler" {
+  name = "${var.environment}-${var.function_name}-retry-scheduler"
+
+  assume_role_policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect    = "Allow"
+        Principal = { Service = "scheduler.amazonaws.com" }
+        Action    = "sts:AssumeRole"
+        Condition = {
+          StringEquals = { "aws:SourceAccount" = data.aws_caller_identity.current.account_id }
+        }
+      }
+    ]
+  })
+}
+
+resource "aws_iam_role_policy" "retry_scheduler_invoke" {
+  name = "${var.environment}-retry-scheduler-invoke-policy"
+  role = aws_iam_role.retry_scheduler.id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect   = "Allow"
+        Action   = ["lambda:InvokeFunction"]
+        Resource = "arn:aws:lambda:${data.aws_region.current.name}:${data.aws_caller_identity.current.account_id}:function:${var.function_name}*"
+      }
+    ]
+  })
+}
+
+# IAM policy for the function to create the retry schedules
+resource "aws_iam_role_policy" "lambda_retry_schedule" {
+  name = "${var.environment}-lambda-retry-schedule-policy"
+  role = aws_iam_role.lambda_role.id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect   = "Allow"
+        Action   = ["scheduler:CreateSchedule"]
+        Resource = "arn:aws:scheduler:${data.aws_region.current.name}:${data.aws_caller_identity.current.account_id}:schedule/default/ingest-retry-*"
+      },
+      {
+        Effect   = "Allow"
+        Action   = ["iam:PassRole"]
+        Resource = aws_iam_role.retry_scheduler.arn
+      }
+    ]
+  })
+}
+
 # CloudWatch log group is created by the monitoring module to avoid duplicates
 
 data "aws_region" "current" {}
-data "aws_caller_identity" "current" {} 
\ No newline at end of file
+data "aws_caller_identity" "current" {} 
+# Ingest queue for SQS batch consumer mode (S3 -> SQS -> Lambda)
+resource "aws_sqs_queue" "ingest" {
+  count = var.enable_sqs_ingest ? 1 : 0
+
+  name = "${var.environment}-${var.function_name}-ingest"
+  # AWS recommends at least 6x the function timeout for event source mappings
+  visibility_timeout_seconds = var.timeout * 6
+  message_retention_seconds  = 1209600 # 14 days
+  receive_wait_time_seconds  = 20
+
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.dlq.arn
+    maxReceiveCount     = var.sqs_max_receive_count
+  })
+
+  tags = {
+    Name = "${var.environment}-${var.function_name}-ingest"
+  }
+}
+
+# Allow the upload bucket to publish object notifications to the ingest queue
+resource "aws_sqs_queue_policy" "ingest" {
+  count = var.enable_sqs_ingest ? 1 : 0
+
+  queue_url = aws_sqs_queue.ingest[0].id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect    = "Allow"
+        Principal = { Service = "s3.amazonaws.com" }
+        Action    = "sqs:SendMessage"
+        Resource  = aws_sqs_queue.ingest[0].arn
+        Condition = {
+          ArnLike = {
+            "aws:SourceArn" = "arn:aws:s3:::${var.s3_bucket_name}"
+          }
+        }
+      }
+    ]
+  })
+}
+
+# IAM policy for consuming the ingest queue
+resource "aws_iam_role_policy" "lambda_sqs_ingest" {
+  count = var.enable_sqs_ingest ? 1 : 0
+
+  name = "${var.environment}-lambda-sqs-ingest-policy"
+  role = aws_iam_role.lambda_role.id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect = "Allow"
+        Action = [
+          "sqs:ReceiveMessage",
+          "sqs:DeleteMessage",
+          "sqs:GetQueueAttributes"
+        ]
+        Resource = aws_sqs_queue.ingest[0].arn
+      }
+    ]
+  })
+}
+
+# Batch delivery with partial batch failure reporting (see sqs_batch_handler)
+resource "aws_lambda_event_source_mapping" "ingest" {
+  count = var.enable_sqs_ingest ? 1 : 0
+
+  event_source_arn                   = aws_sqs_queue.ingest[0].arn
+  function_name                      = aws_lambda_function.main.arn
+  batch_size                         = var.sqs_batch_size
+  maximum_batching_window_in_seconds = var.sqs_batching_window_seconds
+  function_response_types            = ["ReportBatchItemFailures"]
+
+  depends_on = [aws_iam_role_policy.lambda_sqs_ingest]
+}
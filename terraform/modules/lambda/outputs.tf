@@ -36,4 +36,12 @@ output "dlq_arn" {
 output "dlq_name" {
   description = "Dead Letter Queue name"
   value       = aws_sqs_queue.dlq.name
-} 
\ No newline at end of file
+} 
+output "ingest_queue_arn" {
+  description = "SQS ingest queue ARN (null unless enable_sqs_ingest is set)"
+  value       = var.enable_sqs_ingest ? aws_sqs_queue.ingest[0].arn : null
+
+  # S3 validates the destination when the notification is created, so the
+  # queue policy allowing s3.amazonaws.com must exist before the ARN is used
+  depends_on = [aws_sqs_queue_policy.ingest]
+}
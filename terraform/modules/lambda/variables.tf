@@ -68,4 +68,27 @@ variable "enable_xray" {
   description = "Enable AWS X-Ray tracing for Lambda"
   type        = bool
   default     = false
-} 
\ No newline at end of file
+} 
+variable "enable_sqs_ingest" {
+  description = "Consume S3 notifications from an SQS queue in batches instead of direct S3 invocations"
+  type        = bool
+  default     = false
+}
+
+variable "sqs_batch_size" {
+  description = "Maximum number of SQS messages delivered per invocation"
+  type        = number
+  default     = 10
+}
+
+variable "sqs_batching_window_seconds" {
+  description = "Maximum time to gather a batch before invoking (0 = invoke as soon as messages arrive)"
+  type        = number
+  default     = 0
+}
+
+variable "sqs_max_receive_count" {
+  description = "Deliveries of a failing message before it is moved to the DLQ"
+  type        = number
+  default     = 3
+}
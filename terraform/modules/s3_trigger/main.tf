@@ -1,14 +1,31 @@
 # S3 bucket notification configuration
+# Notifications go directly to Lambda, or to the SQS ingest queue when queue_arn is set
 resource "aws_s3_bucket_notification" "lambda_notification" {
   bucket = var.bucket_name
 
-  lambda_function {
-    lambda_function_arn = var.lambda_arn
-    events              = ["s3:ObjectCreated:*"]
-    filter_prefix       = ""
-    filter_suffix       = ".geojson"
+  dynamic "lambda_function" {
+    for_each = var.queue_arn == null ? var.filter_suffixes : []
+    content {
+      lambda_function_arn = var.lambda_arn
+      events              = ["s3:ObjectCreated:*"]
+      filter_prefix       = ""
+      filter_suffix       = lambda_function.value
+    }
   }
 
+  dynamic "queue" {
+    for_each = var.queue_arn != null ? var.filter_suffixes : []
+    content {
+      queue_arn     = var.queue_arn
+      events        = ["s3:ObjectCreated:*"]
+      filter_prefix = ""
+      filter_suffix = queue.value
+    }
+  }
+
+  # var.queue_arn carries a dependency on the ingest queue policy (see the
+  # lambda module's ingest_queue_arn output), so S3 can already publish to
+  # the queue when the notification is created
   depends_on = [aws_lambda_permission.allow_bucket]
 }
 
@@ -19,4 +36,4 @@ resource "aws_lambda_permission" "allow_bucket" {
   function_name = var.function_name
   principal     = "s3.amazonaws.com"
   source_arn    = "arn:aws:s3:::${var.bucket_name}"
-} 
\ No newline at end of file
+} 
@@ -11,4 +11,28 @@ variable "lambda_arn" {
 variable "function_name" {
   description = "Lambda function name"
   type        = string
-} 
\ No newline at end of file
+} 
+variable "queue_arn" {
+  description = "SQS ingest queue ARN; when set, notifications are sent to the queue instead of Lambda"
+  type        = string
+  default     = null
+}
+
+variable "filter_suffixes" {
+  description = "Object key suffixes that trigger ingestion (one notification per suffix)"
+  type        = list(string)
+  default = [
+    ".geojson",
+    ".geojson.gz",
+    ".geojson.zst",
+    ".geojsonl",
+    ".geojsonl.gz",
+    ".geojsonl.zst",
+    ".geojsons",
+    ".geojsons.gz",
+    ".geojsons.zst",
+    ".geojsonseq",
+    ".geojsonseq.gz",
+    ".geojsonseq.zst",
+  ]
+}
@@ -88,6 +88,24 @@ variable "lambda_memory_size" {
   default     = 512
 }
 
+variable "enable_sqs_ingest" {
+  description = "Route S3 notifications through an SQS queue consumed in batches"
+  type        = bool
+  default     = false
+}
+
+variable "sqs_batch_size" {
+  description = "Maximum SQS messages per Lambda invocation (SQS ingest mode)"
+  type        = number
+  default     = 10
+}
+
+variable "sqs_batching_window_seconds" {
+  description = "Maximum batching window in seconds (SQS ingest mode)"
+  type        = number
+  default     = 0
+}
+
 variable "lambda_runtime" {
   description = "Lambda runtime version"
   type        = string
@@ -0,0 +1,105 @@
+"""
+Unit tests for backfill.py
+"""
+import unittest
+import json
+import tempfile
+import os
+from unittest.mock import MagicMock
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from backfill import (
+    Checkpoint, list_local_sources, list_s3_sources, run_backfill
+)
+
+
+class TestBackfill(unittest.TestCase):
+    """Test cases for the backfill CLI helpers"""
+
+    def setUp(self):
+        """Create a directory with a few GeoJSON files"""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.dir = self.tmpdir.name
+        for name in ("a.geojson", "b.json", "c.geojson", "notes.txt"):
+            with open(os.path.join(self.dir, name), 'w') as f:
+                f.write("{}")
+        self.checkpoint_path = os.path.join(self.dir, "ckpt.json")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_list_local_sources_filters_extensions(self):
+        """Only GeoJSON files are listed, in sorted order"""
+        sources = list_local_sources(self.dir)
+        self.assertEqual([os.path.basename(s) for s in sources],
+                         ["a.geojson", "b.json", "c.geojson"])
+
+    def test_list_s3_sources_paginates(self):
+        """All pages of an S3 listing are collected"""
+        client = MagicMock()
+        client.get_paginator.return_value.paginate.return_value = [
+            {"Contents": [{"Key": "p/1.geojson"}, {"Key": "p/readme.md"}]},
+            {"Contents": [{"Key": "p/2.json"}]},
+            {},
+        ]
+        keys = list_s3_sources("bucket", "p/", client)
+        self.assertEqual(keys, ["p/1.geojson", "p/2.json"])
+
+    def test_run_backfill_records_checkpoint(self):
+        """Successes and failures are written to the checkpoint file"""
+        sources = list_local_sources(self.dir)
+        failing = sources[1]
+
+        def process_one(source):
+            if source == failing:
+                raise ValueError("bad file")
+            return 3
+
+        summary = run_backfill(sources, process_one, Checkpoint(self.checkpoint_path), workers=2)
+
+        self.assertEqual(summary["done"], 3)
+        self.assertEqual(summary["failed"], 1)
+        self.assertEqual(summary["features"], 6)
+        reloaded = Checkpoint(self.checkpoint_path)
+        self.assertEqual(len(reloaded.completed), 2)
+        self.assertIn(failing, reloaded.failed)
+
+    def test_run_backfill_resumes_from_checkpoint(self):
+        """Completed sources are skipped on a second run; failures are retried"""
+        sources = list_local_sources(self.dir)
+        checkpoint = Checkpoint(self.checkpoint_path)
+        checkpoint.mark_completed(sources[0], 1)
+        checkpoint.mark_failed(sources[1], "ValueError: bad file")
+
+        process_one = MagicMock(return_value=2)
+        summary = run_backfill(sources, process_one, Checkpoint(self.checkpoint_path))
+
+        self.assertEqual(summary["skipped"], 1)
+        self.assertEqual(process_one.call_count, 2)
+        reloaded = Checkpoint(self.checkpoint_path)
+        self.assertEqual(len(reloaded.completed), 3)
+        self.assertEqual(reloaded.failed, {})
+
+    def test_checkpoint_appends_and_reads_legacy_format(self):
+        """Results are appended as lines; old single-document checkpoints and a cut-off line still load"""
+        with open(self.checkpoint_path, 'w') as f:
+            json.dump({"completed": {"a": 1}, "failed": {"b": "ValueError: x"}}, f)
+            f.write("\n")
+        checkpoint = Checkpoint(self.checkpoint_path)
+        checkpoint.mark_completed("b", 2)
+        checkpoint.mark_failed("c", "OSError: y")
+        with open(self.checkpoint_path, 'a') as f:
+            f.write('{"source": "d", "ins')
+
+        with open(self.checkpoint_path) as f:
+            self.assertEqual(len(f.readlines()), 4)
+        Checkpoint(self.checkpoint_path).mark_completed("e", 5)
+        reloaded = Checkpoint(self.checkpoint_path)
+        self.assertEqual(reloaded.completed, {"a": 1, "b": 2, "e": 5})
+        self.assertEqual(reloaded.failed, {"c": "OSError: y"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+"""
+Unit tests for db_pool.py
+"""
+import unittest
+import os
+import threading
+from unittest.mock import patch, MagicMock
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from db_pool import BoundedConnectionPool, PoolTimeoutError
+
+
+class FakeThreadedPool:
+    """Stand-in for psycopg2's ThreadedConnectionPool handing out mock connections"""
+
+    def __init__(self, minconn, maxconn, **kwargs):
+        self.returned = []
+
+    def getconn(self):
+        conn = MagicMock()
+        conn.closed = 0
+        return conn
+
+    def putconn(self, conn, close=False):
+        self.returned.append((conn, close))
+
+    def closeall(self):
+        pass
+
+
+@patch('psycopg2.pool.ThreadedConnectionPool', FakeThreadedPool)
+class TestBoundedConnectionPool(unittest.TestCase):
+    """Test cases for the bounded connection pool"""
+
+    def test_connection_is_rolled_back_and_returned(self):
+        """A borrowed connection is rolled back and kept open for the next borrower"""
+        pool = BoundedConnectionPool(1, 2, timeout=0.1)
+        with pool.connection() as conn:
+            self.assertEqual(pool.stats()["in_use"], 1)
+
+        conn.rollback.assert_called_once()
+        self.assertEqual(pool._pool.returned, [])
+        self.assertEqual((pool.stats()["in_use"], pool.stats()["idle"]), (0, 1))
+        self.assertEqual(pool.stats()["acquired"], 1)
+        with pool.connection() as again:
+            self.assertIs(again, conn)
+
+    def test_broken_connection_is_discarded(self):
+        """A connection whose rollback fails is closed instead of reused"""
+        pool = BoundedConnectionPool(1, 1, timeout=0.1)
+        with self.assertRaises(RuntimeError):
+            with pool.connection() as conn:
+                conn.rollback.side_effect = Exception("server closed the connection")
+                raise RuntimeError("query failed")
+
+        self.assertEqual(pool._pool.returned, [(conn, True)])
+
+    def test_exhausted_pool_times_out(self):
+        """Callers wait up to the timeout and then get PoolTimeoutError"""
+        pool = BoundedConnectionPool(1, 1, timeout=0.05)
+        with pool.connection():
+            with self.assertRaises(PoolTimeoutError):
+                with pool.connection():
+                    pass
+        self.assertEqual(pool.stats()["timeouts"], 1)
+
+    def test_waiter_gets_released_connection(self):
+        """A waiting caller proceeds once another thread releases its connection"""
+        pool = BoundedConnectionPool(1, 1, timeout=2.0)
+        holding = threading.Event()
+        release = threading.Event()
+
+        def hold():
+            with pool.connection():
+                holding.set()
+                release.wait()
+
+        thread = threading.Thread(target=hold)
+        thread.start()
+        holding.wait()
+        threading.Timer(0.05, release.set).start()
+        with pool.connection():
+            pass
+        thread.join()
+
+        stats = pool.stats()
+        self.assertEqual(stats["acquired"], 2)
+        self.assertGreater(stats["wait_ms_max"], 0)
+
+
+class TestPoolWithPsycopg2(unittest.TestCase):
+    """Run the real ThreadedConnectionPool with psycopg2.connect patched"""
+
+    @patch('psycopg2.connect')
+    def test_connections_are_reused_across_concurrent_borrows(self, mock_connect):
+        """Returned connections stay open: at most maxconn are ever opened"""
+        opened = []
+
+        def connect(*args, **kwargs):
+            conn = MagicMock()
+            conn.closed = 0
+            opened.append(conn)
+            return conn
+
+        mock_connect.side_effect = connect
+        pool = BoundedConnectionPool(1, 4, timeout=2.0)
+        # Every cycle all four threads hold a connection at the same time
+        all_borrowed = threading.Barrier(4, timeout=2.0)
+        borrowed = set()
+
+        def work():
+            for _ in range(10):
+                with pool.connection() as conn:
+                    borrowed.add(id(conn))
+                    all_borrowed.wait()
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(opened), 4)
+        self.assertEqual(len(borrowed), len(opened))
+        self.assertFalse(any(conn.close.called for conn in opened))
+        self.assertEqual(pool.stats()["acquired"], 40)
+        pool.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,6 +2,7 @@
 Unit tests for entrypoint.py
 """
 import unittest
+import gzip
 import json
 import tempfile
 import os
@@ -11,7 +12,12 @@ import sys
 # Add app directory to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
 
-from entrypoint import process_geojson, get_db_conn
+from entrypoint import process_geojson, ingest_geojson, get_db_conn, detect_compression
+
+
+def _geo_data_inserts(mock_cursor):
+    """(sql, params) of every geo_data insert, skipping schema and uploads statements"""
+    return [c[0] for c in mock_cursor.execute.call_args_list if "INSERT INTO geo_data" in c[0][0]]
 
 
 class TestEntrypoint(unittest.TestCase):
@@ -61,7 +67,7 @@ class TestEntrypoint(unittest.TestCase):
 
                 # Assertions
                 self.assertEqual(result, 2)  # 2 features
-                self.assertEqual(mock_cursor.execute.call_count, 2)  # 2 inserts
+                self.assertEqual(len(_geo_data_inserts(mock_cursor)), 2)  # 2 inserts
         finally:
             os.unlink(temp_path)
 
@@ -96,11 +102,138 @@ class TestEntrypoint(unittest.TestCase):
                 # Should use "Unnamed" as default
                 self.assertEqual(result, 1)
                 # Check that "Unnamed" was used
-                call_args = mock_cursor.execute.call_args[0]
+                call_args = _geo_data_inserts(mock_cursor)[-1]
                 self.assertIn("Unnamed", call_args[1][0])
         finally:
             os.unlink(temp_path)
 
+    def test_ingest_geojson_dedup_counts_duplicates(self):
+        """Test that ON CONFLICT no-ops are reported as duplicates"""
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.geojson', delete=False) as f:
+            json.dump(self.sample_geojson, f)
+            temp_path = f.name
+
+        try:
+            with patch('entrypoint.get_db_conn') as mock_conn:
+                mock_cursor = MagicMock()
+                mock_conn.return_value.__enter__.return_value.cursor.return_value.__enter__.return_value = mock_cursor
+                rowcounts = iter([1, 0])
+
+                def execute(sql, params=None):
+                    if "INSERT INTO geo_data" in sql:
+                        mock_cursor.rowcount = next(rowcounts)
+
+                mock_cursor.execute.side_effect = execute
+
+                summary = ingest_geojson(temp_path, dedup=True)
+
+                self.assertEqual(summary["inserted"], 1)
+                self.assertEqual(summary["duplicates"], 1)
+                self.assertIn("ON CONFLICT", _geo_data_inserts(mock_cursor)[-1][0])
+        finally:
+            os.unlink(temp_path)
+
+    def test_ingest_geojson_sends_wkb(self):
+        """Test geometries are inserted as WKB instead of re-serialized GeoJSON"""
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.geojson', delete=False) as f:
+            json.dump(self.sample_geojson, f)
+            temp_path = f.name
+
+        try:
+            with patch('entrypoint.get_db_conn') as mock_conn:
+                mock_cursor = MagicMock()
+                mock_conn.return_value.__enter__.return_value.cursor.return_value.__enter__.return_value = mock_cursor
+
+                ingest_geojson(temp_path)
+
+                sql, params = _geo_data_inserts(mock_cursor)[-1]
+                self.assertIn("ST_GeomFromWKB", sql)
+                self.assertIsInstance(params[1], bytes)
+        finally:
+            os.unlink(temp_path)
+
+    def _ingest_bytes(self, payload, suffix):
+        """Write payload to a temp file with suffix and ingest it with a mocked DB"""
+        with tempfile.NamedTemporaryFile(mode='wb', suffix=suffix, delete=False) as f:
+            f.write(payload)
+            temp_path = f.name
+
+        try:
+            with patch('entrypoint.get_db_conn') as mock_conn:
+                mock_cursor = MagicMock()
+                mock_conn.return_value.__enter__.return_value.cursor.return_value.__enter__.return_value = mock_cursor
+                return ingest_geojson(temp_path), detect_compression(temp_path)
+        finally:
+            os.unlink(temp_path)
+
+    def test_ingest_gzip_detected_by_magic_bytes(self):
+        """Test gzip input with a plain .json name is decompressed on the fly"""
+        payload = gzip.compress(json.dumps(self.sample_geojson).encode())
+        summary, compression = self._ingest_bytes(payload, '.json')
+        self.assertEqual(compression, "gzip")
+        self.assertEqual(summary["inserted"], 2)
+
+    def test_ingest_compressed_geojson_sequence(self):
+        """Test RS-delimited GeoJSON sequence compressed with gzip or zstd"""
+        lines = b"".join(
+            b"\x1e" + json.dumps(feature).encode() + b"\n"
+            for feature in self.sample_geojson["features"]
+        )
+        summary, _ = self._ingest_bytes(gzip.compress(lines), '.geojsons.gz')
+        self.assertEqual(summary["inserted"], 2)
+
+        try:
+            import zstandard
+        except ImportError:
+            self.skipTest("zstandard not installed")
+        summary, compression = self._ingest_bytes(
+            zstandard.ZstdCompressor().compress(lines), '.geojsonl.zst')
+        self.assertEqual(compression, "zstd")
+        self.assertEqual(summary["inserted"], 2)
+
+    def _ingest_with_fresh_schema(self, caller_conn, dedup, schema_rows):
+        """ingest_features in a process whose schema step has not run yet"""
+        import entrypoint
+        features = [{"type": "Feature", "properties": {"name": "A"},
+                     "geometry": {"type": "Point", "coordinates": [1.0, 2.0]}}]
+        with patch('entrypoint.get_db_conn') as mock_conn, \
+                patch.object(entrypoint, '_schema_ready', False), \
+                patch.object(entrypoint, '_dedup_index_ready', False):
+            schema_cursor = mock_conn.return_value.cursor.return_value.__enter__.return_value
+            schema_cursor.fetchone.side_effect = schema_rows
+            try:
+                entrypoint.ingest_features(features, conn=caller_conn, dedup=dedup, overlaps="off")
+            finally:
+                statements = [c[0][0] for c in schema_cursor.execute.call_args_list]
+        return mock_conn.return_value, statements
+
+    def test_schema_runs_on_own_connection(self):
+        """DDL runs in autocommit on a separate connection; the caller's transaction is untouched"""
+        caller_conn = MagicMock()
+        schema_conn, statements = self._ingest_with_fresh_schema(caller_conn, False, [])
+
+        caller_conn.commit.assert_not_called()
+        self.assertTrue(schema_conn.autocommit)
+        schema_conn.close.assert_called_once()
+        # Without dedup the unique index is never built
+        self.assertFalse(any("CREATE UNIQUE INDEX" in s for s in statements))
+
+    def test_dedup_builds_index_concurrently(self):
+        import entrypoint
+        caller_conn = MagicMock()
+        _conn, statements = self._ingest_with_fresh_schema(caller_conn, True, [None, (True,)])
+        self.assertIn(entrypoint.DEDUP_INDEX_DDL, statements)
+
+    def test_dedup_fails_while_index_is_built_elsewhere(self):
+        """ON CONFLICT is not attempted until the dedup index is valid"""
+        caller_conn = MagicMock()
+        caller_cursor = caller_conn.cursor.return_value.__enter__.return_value
+        caller_cursor.fetchone.return_value = (False,)
+
+        with self.assertRaises(RuntimeError):
+            self._ingest_with_fresh_schema(caller_conn, True, [(False,), (False,)])
+        self.assertFalse(any("INSERT INTO geo_data" in c[0][0] for c in caller_cursor.execute.call_args_list))
+
     @patch.dict(os.environ, {
         'DB_NAME': 'test_db',
         'DB_USER': 'test_user',
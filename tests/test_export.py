@@ -0,0 +1,120 @@
+"""
+Unit tests for export.py
+"""
+import unittest
+import io
+import json
+import os
+import tempfile
+from unittest.mock import MagicMock
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+import shapely
+from shapely.geometry import Point, Polygon
+
+from export import build_query, iter_batches, stream_export, geojsonseq_chunks, flatgeobuf_chunks
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+
+def _rows(n, start=0):
+    """(id, name, upload_id, properties, WKB) rows"""
+    return [(start + i, f"F{start + i}", "u1", {"k": i} if i % 2 else None,
+             shapely.to_wkb(Point(i, start))) for i in range(n)]
+
+
+def _fake_conn(rows):
+    """Connection whose named cursor serves rows through fetchmany"""
+    conn = MagicMock()
+    remaining = list(rows)
+    named = MagicMock()
+
+    def fetchmany(size):
+        batch = remaining[:size]
+        del remaining[:size]
+        return batch
+
+    named.fetchmany.side_effect = fetchmany
+    plain = MagicMock()
+    plain.fetchone.return_value = (1,)  # geo_data has a properties column
+
+    def cursor(name=None):
+        ctx = MagicMock()
+        ctx.__enter__.return_value = named if name else plain
+        return ctx
+
+    conn.cursor.side_effect = cursor
+    return conn, named
+
+
+class TestExport(unittest.TestCase):
+    """Test cases for streaming export"""
+
+    def test_build_query_filters(self):
+        """Optional filters become WHERE clauses in parameter order"""
+        sql, params = build_query("ST_AsBinary(geom)", True, bbox=(0, 1, 2, 3), upload_id="u1", limit=10)
+        self.assertIn("geom && ST_MakeEnvelope", sql)
+        self.assertIn("upload_id = %s", sql)
+        self.assertTrue(sql.endswith("ORDER BY id LIMIT %s"))
+        self.assertEqual(params, [0, 1, 2, 3, "u1", 10])
+        self.assertNotIn("WHERE", build_query("g", False)[0])
+
+    def test_iter_batches_uses_named_cursor(self):
+        """Rows come from a server-side cursor in batch_size pieces"""
+        conn, named = _fake_conn(_rows(7))
+        batches = list(iter_batches(conn, "ST_AsBinary(geom)", batch_size=3))
+
+        self.assertEqual([len(b) for b in batches], [3, 3, 1])
+        self.assertTrue(conn.cursor.call_args_list[-1][1]["name"].startswith("geo_export_"))
+        named.fetchall.assert_not_called()
+
+    def test_geojsonseq_lines(self):
+        """Each row becomes one GeoJSON feature line"""
+        rows = [(1, "A", "u1", {"k": 1}, json.dumps({"type": "Point", "coordinates": [1, 2]}))]
+        lines = b"".join(geojsonseq_chunks(iter([rows, rows]))).splitlines()
+
+        self.assertEqual(len(lines), 2)
+        feature = json.loads(lines[0])
+        self.assertEqual(feature["properties"], {"k": 1, "name": "A", "upload_id": "u1"})
+        self.assertEqual(feature["geometry"]["coordinates"], [1, 2])
+
+    def test_flatgeobuf_round_trip(self):
+        """FlatGeobuf output reads back with fiona"""
+        import fiona
+        rows = _rows(3) + [(3, "P", "u1", None, shapely.to_wkb(Polygon([(0, 0), (1, 0), (1, 1)])))]
+        data = b"".join(flatgeobuf_chunks(iter([rows[:2], rows[2:]])))
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "out.fgb")
+            with open(path, "wb") as f:
+                f.write(data)
+            with fiona.open(path) as src:
+                features = list(src)
+        self.assertEqual([f.properties["name"] for f in features], ["F0", "F1", "F2", "P"])
+        self.assertEqual(features[3].geometry.type, "Polygon")
+
+    @unittest.skipIf(pq is None, "pyarrow not installed")
+    def test_parquet_row_group_per_batch(self):
+        """GeoParquet output has one row group per batch and geo metadata"""
+        conn, _named = _fake_conn(_rows(5))
+        chunks = list(stream_export(conn, "parquet", batch_size=2))
+
+        self.assertGreater(len(chunks), 3)  # emitted incrementally, not at the end
+        parquet = pq.ParquetFile(io.BytesIO(b"".join(chunks)))
+        self.assertEqual(parquet.num_row_groups, 3)
+        self.assertEqual(json.loads(parquet.schema_arrow.metadata[b"geo"])["primary_column"], "geometry")
+        table = parquet.read()
+        self.assertEqual(shapely.from_wkb(table.column("geometry")[4].as_py()), Point(4, 0))
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            stream_export(MagicMock(), "shapefile")
+
+
+if __name__ == '__main__':
+    unittest.main()
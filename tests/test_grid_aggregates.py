@@ -0,0 +1,67 @@
+"""
+Unit tests for grid_aggregates.py
+"""
+import unittest
+import os
+from unittest.mock import MagicMock
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+import numpy as np
+from shapely.geometry import Point
+
+from grid_aggregates import (
+    tile_xy, quadkey, quadkey_to_tile, tile_bounds, aggregate_bounds, update_grid_cells,
+    UPSERT_PAGE_SIZE
+)
+
+
+class TestGridAggregates(unittest.TestCase):
+    """Test cases for quadkey cell aggregation"""
+
+    def test_quadkey_round_trip(self):
+        """Known quadkeys and their inverse"""
+        self.assertEqual(quadkey(3, 5, 3), "213")
+        self.assertEqual(quadkey_to_tile("213"), (3, 5, 3))
+        self.assertEqual(quadkey(0, 0, 0), "")
+
+    def test_tile_xy_matches_tile_bounds(self):
+        """A point maps to the tile whose bounds contain it"""
+        x, y = tile_xy(np.array([2.35, -179.9]), np.array([48.85, -89.0]), 10)
+        minx, miny, maxx, maxy = tile_bounds(int(x[0]), int(y[0]), 10)
+        self.assertTrue(minx <= 2.35 < maxx and miny <= 48.85 < maxy)
+        self.assertEqual((int(x[1]), int(y[1])), (0, 1023))  # clamped to the bottom row
+
+    def test_aggregate_bounds_counts_and_bbox(self):
+        """Features are counted per cell with the bbox of the features in it"""
+        bounds = np.array([
+            [2.30, 48.80, 2.31, 48.81],
+            [2.32, 48.82, 2.40, 48.90],
+            [-74.0, 40.7, -74.0, 40.7],
+            [np.nan, np.nan, np.nan, np.nan],  # empty geometry
+        ])
+        rows = aggregate_bounds(bounds, (4, 8))
+
+        self.assertEqual([row[0] for row in rows], [4, 4, 8, 8])
+        self.assertEqual(sum(row[2] for row in rows if row[0] == 8), 3)
+        paris = next(row for row in rows if row[0] == 8 and row[2] == 2)
+        self.assertEqual(paris[3:], (2.30, 48.80, 2.40, 48.90))
+        self.assertEqual(rows, sorted(rows, key=lambda r: (r[0], r[1])))
+
+    def test_update_grid_cells_pages_upserts(self):
+        """Cells are upserted in multi-row pages with flattened parameters"""
+        cur = MagicMock()
+        geoms = [Point(i * 0.1, 0) for i in range(UPSERT_PAGE_SIZE + 10)] + [None]
+        count = update_grid_cells(cur, geoms, zooms=(12,))
+
+        self.assertEqual(count, sum(len(c[0][1]) for c in cur.execute.call_args_list) // 7)
+        self.assertEqual(cur.execute.call_count, 2)
+        sql, params = cur.execute.call_args_list[0][0]
+        self.assertIn("ON CONFLICT (zoom, quadkey)", sql)
+        self.assertEqual(len(params), UPSERT_PAGE_SIZE * 7)
+        self.assertEqual(update_grid_cells(cur, [None]), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
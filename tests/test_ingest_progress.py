@@ -0,0 +1,123 @@
+"""
+Unit tests for ingest_progress.py
+"""
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from ingest_progress import (
+    ingest_resumable, progress_key, IngestDeadline, ADVANCE_PROGRESS_SQL, BEGIN_PROGRESS_SQL
+)
+
+
+def _context(remaining_ms):
+    """Lambda context whose remaining time follows the given sequence"""
+    context = MagicMock()
+    context.get_remaining_time_in_millis.side_effect = list(remaining_ms)
+    return context
+
+
+def _fake_conn(begin_row, locked=False):
+    """Connection answering the advisory lock and the progress row"""
+    conn = MagicMock()
+    cur = conn.cursor.return_value.__enter__.return_value
+    cur.fetchone.side_effect = [(not locked,), begin_row]
+    return conn, cur
+
+
+def _ingested(features, **kwargs):
+    return {"features": len(features), "inserted": len(features), "duplicates": 0}
+
+
+class TestIngestProgress(unittest.TestCase):
+    """Test cases for deadline-aware resumable ingestion"""
+
+    def setUp(self):
+        self.features = [{"type": "Feature", "properties": {"name": f"F{i}"},
+                          "geometry": {"type": "Point", "coordinates": [i, 0]}} for i in range(10)]
+
+    def _run(self, conn, context, batch_size=4):
+        with patch('entrypoint.get_db_conn', return_value=conn), \
+                patch('entrypoint.ensure_schema'), \
+                patch('entrypoint.load_features', return_value=(self.features, None)), \
+                patch('entrypoint.ingest_features', side_effect=_ingested) as mock_ingest:
+            summary = ingest_resumable("big.geojson", "s3://b/big.geojson#abc", context=context,
+                                       batch_size=batch_size)
+        return summary, mock_ingest
+
+    def _advances(self, cur):
+        return [c[0][1] for c in cur.execute.call_args_list if c[0][0] == ADVANCE_PROGRESS_SQL]
+
+    def test_progress_key_strips_etag_quotes(self):
+        self.assertEqual(progress_key("b", "k.geojson", '"abc"'), "s3://b/k.geojson#abc")
+
+    def test_deadline_accounts_for_slowest_batch(self):
+        """A batch starts only if margin plus 1.5x the slowest batch remains"""
+        deadline = IngestDeadline(_context([20000, 20000]), margin_ms=10000)
+        self.assertFalse(deadline.should_stop())
+        deadline.record_batch(8.0)
+        self.assertTrue(deadline.should_stop())
+        self.assertFalse(IngestDeadline(None).should_stop())
+
+    def test_stops_at_batch_boundary_near_deadline(self):
+        """Each batch commits with its cursor; the loop stops when time runs short"""
+        conn, cur = _fake_conn(("u1", 0, 0, 0, 1, False))
+        summary, mock_ingest = self._run(conn, _context([60000, 60000, 1000, 1000]))
+
+        self.assertEqual(mock_ingest.call_count, 2)
+        self.assertEqual([c.kwargs["first_index"] for c in mock_ingest.call_args_list], [0, 4])
+        self.assertEqual(self._advances(cur), [(4, 4, 0, False, "s3://b/big.geojson#abc"),
+                                               (8, 4, 0, False, "s3://b/big.geojson#abc")])
+        self.assertEqual(conn.commit.call_count, 3)  # progress row + two batches
+        self.assertFalse(summary["complete"])
+        self.assertEqual(summary["resume_offset"], 8)
+        self.assertEqual(summary["upload_id"], "u1")
+        conn.close.assert_called_once()
+
+    def test_resumes_from_stored_offset(self):
+        """A later invocation continues at the cursor with the same upload id"""
+        conn, cur = _fake_conn(("u1", 8, 8, 0, 2, False))
+        summary, mock_ingest = self._run(conn, _context([60000]))
+
+        mock_ingest.assert_called_once()
+        self.assertEqual(mock_ingest.call_args[0][0], self.features[8:])
+        self.assertEqual(mock_ingest.call_args.kwargs["upload_id"], "u1")
+        self.assertEqual(self._advances(cur), [(10, 2, 0, True, "s3://b/big.geojson#abc")])
+        self.assertTrue(summary["complete"])
+        self.assertEqual((summary["inserted"], summary["total_inserted"]), (2, 10))
+
+    def test_completed_file_is_not_ingested_again(self):
+        conn, _cur = _fake_conn(("u1", 10, 10, 0, 3, True))
+        summary, mock_ingest = self._run(conn, _context([]))
+
+        mock_ingest.assert_not_called()
+        self.assertTrue(summary["complete"])
+        self.assertEqual(summary["inserted"], 0)
+
+    def test_locked_file_is_left_alone(self):
+        """The stored cursor of a locked file is reported so the caller can retry it"""
+        conn, cur = _fake_conn((4, False), locked=True)
+        summary, mock_ingest = self._run(conn, _context([]))
+
+        mock_ingest.assert_not_called()
+        self.assertTrue(summary["locked"])
+        self.assertEqual((summary["complete"], summary["resume_offset"]), (False, 4))
+        self.assertNotIn(BEGIN_PROGRESS_SQL, [c[0][0] for c in cur.execute.call_args_list])
+
+    def test_batch_failure_rolls_back(self):
+        conn, _cur = _fake_conn(("u1", 0, 0, 0, 1, False))
+        with patch('entrypoint.get_db_conn', return_value=conn), \
+                patch('entrypoint.ensure_schema'), \
+                patch('entrypoint.load_features', return_value=(self.features, None)), \
+                patch('entrypoint.ingest_features', side_effect=RuntimeError("db down")):
+            with self.assertRaises(RuntimeError):
+                ingest_resumable("big.geojson", "k", batch_size=4)
+        conn.rollback.assert_called_once()
+        conn.close.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -27,7 +27,7 @@ class TestLambdaHandler(unittest.TestCase):
         }
         self.sample_context = MagicMock()
 
-    @patch('lambda_handler.process_geojson')
+    @patch('lambda_handler.ingest_geojson')
     @patch('lambda_handler.s3')
     def test_lambda_handler_success(self, mock_s3, mock_process):
         """Test successful Lambda execution"""
@@ -37,7 +37,7 @@ class TestLambdaHandler(unittest.TestCase):
         mock_s3.download_file = MagicMock()
 
         # Mock processing
-        mock_process.return_value = 5
+        mock_process.return_value = {"inserted": 5, "duplicates": 0, "upload_id": "u1"}
 
         # Call handler
         result = lambda_handler(self.sample_event, self.sample_context)
@@ -49,7 +49,7 @@ class TestLambdaHandler(unittest.TestCase):
         mock_s3.download_file.assert_called_once()
         mock_process.assert_called_once()
 
-    @patch('lambda_handler.process_geojson')
+    @patch('lambda_handler.ingest_geojson')
     @patch('lambda_handler.s3')
     def test_lambda_handler_multiple_records(self, mock_s3, mock_process):
         """Test Lambda handler with multiple S3 records"""
@@ -73,7 +73,7 @@ class TestLambdaHandler(unittest.TestCase):
         }
 
         mock_s3.download_file = MagicMock()
-        mock_process.return_value = 3
+        mock_process.return_value = {"inserted": 3, "duplicates": 0, "upload_id": "u1"}
 
         result = lambda_handler(event_multiple, self.sample_context)
 
@@ -81,6 +81,251 @@ class TestLambdaHandler(unittest.TestCase):
         self.assertEqual(result['statusCode'], 200)
         self.assertEqual(mock_s3.download_file.call_count, 1)
 
+    @staticmethod
+    def _sqs_message(message_id, key):
+        """Build an SQS record carrying an S3 notification for one object"""
+        body = {
+            "Records": [{
+                "s3": {
+                    "bucket": {"name": "test-bucket"},
+                    "object": {"key": key}
+                }
+            }]
+        }
+        return {"messageId": message_id, "eventSource": "aws:sqs", "body": json.dumps(body)}
+
+    @staticmethod
+    def _fake_download(bucket, key, path):
+        with open(path, 'w') as f:
+            f.write("{}")
+
+    @patch('lambda_handler.get_db_conn')
+    @patch('lambda_handler.ingest_geojson')
+    @patch('lambda_handler.s3')
+    def test_sqs_batch_reports_partial_failures(self, mock_s3, mock_process, mock_get_conn):
+        """Only failed SQS messages are returned in batchItemFailures"""
+        from lambda_handler import lambda_handler
+
+        mock_s3.download_file.side_effect = self._fake_download
+        mock_process.side_effect = [{"inserted": 4, "duplicates": 0, "upload_id": "u1"}, ValueError("bad geometry")]
+        conn = mock_get_conn.return_value
+
+        event = {"Records": [
+            self._sqs_message("msg-1", "good.geojson"),
+            self._sqs_message("msg-2", "bad+file.geojson"),
+        ]}
+        result = lambda_handler(event, self.sample_context)
+
+        self.assertEqual(result, {"batchItemFailures": [{"itemIdentifier": "msg-2"}]})
+        mock_get_conn.assert_called_once()
+        for call in mock_process.call_args_list:
+            self.assertIs(call.kwargs["conn"], conn)
+        self.assertEqual(mock_s3.download_file.call_args_list[1][0][1], "bad file.geojson")
+        conn.commit.assert_called_once()
+        conn.rollback.assert_called_once()
+        conn.close.assert_called_once()
+
+    @patch('entrypoint.ensure_schema')
+    @patch('lambda_handler.get_db_conn')
+    @patch('lambda_handler.s3')
+    def test_sqs_insert_error_fails_message(self, mock_s3, mock_get_conn, _mock_schema):
+        """A failed insert aborts the message's transaction, so it is rolled back and reported"""
+        from lambda_handler import lambda_handler
+
+        def download(bucket, key, path):
+            name = os.path.splitext(os.path.basename(key))[0]
+            with open(path, 'w') as f:
+                json.dump({"type": "FeatureCollection", "features": [{
+                    "type": "Feature", "properties": {"name": name},
+                    "geometry": {"type": "Point", "coordinates": [1.0, 2.0]}}]}, f)
+
+        def execute(sql, params=None):
+            if "INSERT INTO geo_data" in sql and params[0] == "bad":
+                raise RuntimeError("current transaction is aborted")
+
+        mock_s3.download_file.side_effect = download
+        conn = mock_get_conn.return_value
+        conn.cursor.return_value.__enter__.return_value.execute.side_effect = execute
+
+        event = {"Records": [
+            self._sqs_message("msg-1", "good.geojson"),
+            self._sqs_message("msg-2", "bad.geojson"),
+        ]}
+        result = lambda_handler(event, self.sample_context)
+
+        self.assertEqual(result, {"batchItemFailures": [{"itemIdentifier": "msg-2"}]})
+        conn.commit.assert_called_once()
+        conn.rollback.assert_called_once()
+
+    @patch('lambda_handler.get_db_conn')
+    @patch('lambda_handler.ingest_geojson')
+    @patch('lambda_handler.s3')
+    def test_sqs_test_event_is_acknowledged(self, mock_s3, mock_process, mock_get_conn):
+        """The s3:TestEvent message is consumed without processing"""
+        from lambda_handler import lambda_handler
+
+        event = {"Records": [{
+            "messageId": "msg-1",
+            "eventSource": "aws:sqs",
+            "body": json.dumps({"Service": "Amazon S3", "Event": "s3:TestEvent"})
+        }]}
+        result = lambda_handler(event, self.sample_context)
+
+        self.assertEqual(result, {"batchItemFailures": []})
+        mock_process.assert_not_called()
+
+    @patch('splitter.ingest_features')
+    @patch('lambda_handler.s3')
+    def test_shard_worker_reads_byte_range(self, mock_s3, mock_ingest):
+        """A shard event is served with a ranged GET of the manifest's bytes"""
+        from lambda_handler import lambda_handler
+
+        feature = {"type": "Feature", "properties": {}, "geometry": {"type": "Point", "coordinates": [0, 0]}}
+        mock_s3.get_object.return_value = {"Body": MagicMock(read=MagicMock(
+            return_value=(json.dumps(feature) + ",\n" + json.dumps(feature)).encode()))}
+        mock_ingest.return_value = {"features": 2, "valid": 2, "inserted": 2, "duplicates": 0, "errors": 0}
+        manifest = {"source": "s3://test-bucket/big.geojson", "bucket": "test-bucket", "key": "big.geojson",
+                    "shard": 3, "shards": 8, "start": 100, "end": 250, "first_feature": 10, "features": 2}
+
+        result = lambda_handler({"shard": manifest}, self.sample_context)
+
+        self.assertEqual(result["inserted"], 2)
+        self.assertEqual(result["shard"], 3)
+        mock_s3.get_object.assert_called_once_with(Bucket="test-bucket", Key="big.geojson", Range="bytes=100-249")
+
+    @patch('lambda_handler.completed_keys')
+    @patch('lambda_handler._get_lambda_client')
+    @patch('lambda_handler.s3')
+    def test_fan_out_plans_once_and_dispatches_pending_shards(self, mock_s3, mock_lambda_client,
+                                                              mock_completed):
+        """Shards are planned once per ETag; a retry dispatches only incomplete shards asynchronously"""
+        import io
+        from botocore.exceptions import ClientError
+        from lambda_handler import _fan_out_s3_object
+
+        feature = {"type": "Feature", "properties": {"name": "x" * 100},
+                   "geometry": {"type": "Point", "coordinates": [0, 0]}}
+        raw = json.dumps({"type": "FeatureCollection", "features": [feature] * 20}).encode()
+        stored = {}
+
+        def get_object(Bucket, Key, Range=None, IfMatch=None):
+            if Key.endswith("plan.json"):
+                if Key not in stored:
+                    raise ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+                return {"Body": io.BytesIO(stored[Key])}
+            return {"Body": io.BytesIO(raw[:100] if Range else raw)}
+
+        mock_s3.get_object.side_effect = get_object
+        mock_s3.put_object.side_effect = lambda Bucket, Key, Body: stored.update({Key: Body})
+        mock_completed.return_value = set()
+        invoke = mock_lambda_client.return_value.invoke
+
+        with patch.dict(os.environ, {"SHARD_BYTES": "1024"}):
+            first = _fan_out_s3_object("test-bucket", "big.geojson", self.sample_context, etag='"abc"')
+            shards = [json.loads(c.kwargs["Payload"])["shard"] for c in invoke.call_args_list]
+            mock_completed.return_value = {shards[0]["progress_key"]}
+            invoke.reset_mock()
+            second = _fan_out_s3_object("test-bucket", "big.geojson", self.sample_context, etag='"abc"')
+
+        self.assertEqual(list(stored), ["_shards/big.geojson/abc/plan.json"])
+        self.assertEqual(mock_s3.put_object.call_count, 1)
+        self.assertEqual(first["status"], "in_progress")
+        self.assertEqual(shards[0]["progress_key"], "s3://test-bucket/big.geojson#abc#shard-00000")
+        self.assertEqual(len(shards), first["shards"])
+        self.assertEqual(second["shards_dispatched"], first["shards"] - 1)
+        self.assertEqual({c.kwargs["InvocationType"] for c in invoke.call_args_list}, {"Event"})
+        self.assertEqual({json.loads(c.kwargs["Payload"])["shard"]["upload_id"] for c in invoke.call_args_list},
+                         {first["upload_id"]})
+
+    @patch('entrypoint.ensure_schema')
+    @patch('entrypoint.get_db_conn')
+    @patch('lambda_handler.s3')
+    def test_completed_shard_is_not_ingested_again(self, mock_s3, mock_get_conn, _mock_schema):
+        """A redelivered shard whose completion is committed does nothing"""
+        from lambda_handler import lambda_handler
+
+        cursor = mock_get_conn.return_value.cursor.return_value.__enter__.return_value
+        cursor.fetchone.side_effect = [(True,), ("u1", 2, 2, 0, 2, True)]
+        manifest = {"source": "s3://test-bucket/big.geojson", "bucket": "test-bucket", "key": "big.geojson",
+                    "upload_id": "u1", "shard": 3, "shards": 8, "start": 100, "end": 250,
+                    "first_feature": 10, "features": 2,
+                    "progress_key": "s3://test-bucket/big.geojson#abc#shard-00003"}
+
+        result = lambda_handler({"shard": manifest}, self.sample_context)
+
+        self.assertTrue(result["already_ingested"])
+        self.assertEqual((result["inserted"], result["shard"]), (0, 3))
+        mock_s3.get_object.assert_not_called()
+        self.assertFalse(any("INSERT INTO geo_data" in c[0][0] for c in cursor.execute.call_args_list))
+
+    @patch('lambda_handler._get_lambda_client')
+    @patch('lambda_handler.ingest_resumable')
+    @patch('lambda_handler.s3')
+    def test_deadline_stop_sends_continuation(self, mock_s3, mock_resumable, mock_lambda_client):
+        """An ingest stopped before the timeout continues in an async invocation"""
+        from lambda_handler import lambda_handler
+
+        mock_s3.download_file.side_effect = self._fake_download
+        mock_resumable.return_value = {"inserted": 4, "duplicates": 0, "upload_id": "u1",
+                                       "locked": False, "complete": False, "resume_offset": 4}
+        self.sample_context.function_name = "ingest"
+        event = {"Records": [{"s3": {"bucket": {"name": "test-bucket"},
+                                     "object": {"key": "big.geojson", "eTag": "abc"}}}]}
+
+        result = lambda_handler(event, self.sample_context)
+
+        body = json.loads(result['body'])
+        self.assertEqual(body['results'][0]['status'], "in_progress")
+        self.assertEqual(mock_resumable.call_args[0][1], "s3://test-bucket/big.geojson#abc")
+        invoke = mock_lambda_client.return_value.invoke.call_args.kwargs
+        self.assertEqual(invoke["InvocationType"], "Event")
+        self.assertEqual(json.loads(invoke["Payload"])["resume"]["key"], "big.geojson")
+
+    @patch.dict(os.environ, {"RETRY_SCHEDULER_ROLE_ARN": "arn:aws:iam::123456789012:role/retry"})
+    @patch('lambda_handler._get_scheduler_client')
+    @patch('lambda_handler.ingest_resumable')
+    @patch('lambda_handler.s3')
+    def test_locked_incomplete_object_is_retried(self, mock_s3, mock_resumable, mock_scheduler):
+        """A file locked mid-way (e.g. by a timed-out invocation) gets a scheduled retry, not a skip"""
+        from lambda_handler import lambda_handler
+
+        mock_s3.download_file.side_effect = self._fake_download
+        locked = {"inserted": 0, "duplicates": 0, "upload_id": None,
+                  "locked": True, "complete": False, "resume_offset": 4}
+        resumed = {"inserted": 6, "duplicates": 0, "upload_id": "u1",
+                   "locked": False, "complete": True, "resume_offset": 10}
+        mock_resumable.side_effect = [locked, resumed]
+        self.sample_context.invoked_function_arn = "arn:aws:lambda:us-east-1:123456789012:function:ingest"
+        event = {"Records": [{"s3": {"bucket": {"name": "test-bucket"},
+                                     "object": {"key": "big.geojson", "eTag": "abc"}}}]}
+
+        first = json.loads(lambda_handler(event, self.sample_context)['body'])['results'][0]
+        schedule = mock_scheduler.return_value.create_schedule.call_args.kwargs
+        payload = json.loads(schedule["Target"]["Input"])
+        second = lambda_handler(payload, self.sample_context)
+
+        self.assertEqual(first['status'], "in_progress")
+        self.assertEqual(payload["resume"]["lock_attempt"], 1)
+        self.assertRegex(schedule["ScheduleExpression"], r"^at\(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d\)$")
+        self.assertEqual(schedule["Target"]["Arn"], self.sample_context.invoked_function_arn)
+        self.assertEqual(schedule["ActionAfterCompletion"], "DELETE")
+        self.assertEqual(second['status'], "success")
+        self.assertEqual(second['inserted'], 6)
+
+    @patch('lambda_handler.ingest_resumable')
+    @patch('lambda_handler.s3')
+    def test_locked_object_fails_after_last_retry(self, mock_s3, mock_resumable):
+        from lambda_handler import lambda_handler
+
+        mock_s3.download_file.side_effect = self._fake_download
+        mock_resumable.return_value = {"inserted": 0, "duplicates": 0, "upload_id": None,
+                                       "locked": True, "complete": False, "resume_offset": 4}
+        event = {"resume": {"bucket": "test-bucket", "key": "big.geojson", "etag": "abc",
+                            "lock_attempt": 8}}
+
+        with self.assertRaises(RuntimeError):
+            lambda_handler(event, self.sample_context)
+
 
 if __name__ == '__main__':
     unittest.main()
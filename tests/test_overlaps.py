@@ -0,0 +1,89 @@
+"""
+Unit tests for overlaps.py
+"""
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+import shapely
+from shapely.geometry import box, Point
+
+from overlaps import batch_overlap_pairs, apply_overlap_policy, add_overlap_summary
+
+
+def _validated(geoms):
+    return [({"type": "Feature", "properties": {"name": f"F{i}"}}, geom) for i, geom in enumerate(geoms)]
+
+
+def _cursor(existing=()):
+    """Cursor serving existing geometries as WKB rows"""
+    cur = MagicMock()
+    cur.fetchall.return_value = [(shapely.to_wkb(geom),) for geom in existing]
+    return cur
+
+
+class TestOverlaps(unittest.TestCase):
+    """Test cases for STRtree overlap detection and policies"""
+
+    def setUp(self):
+        # 0 and 1 overlap, 1 and 2 overlap (0 and 2 do not), 3 is alone
+        self.geoms = [box(0, 0, 2, 2), box(1, 1, 3, 3), box(2.5, 2.5, 4, 4), box(10, 10, 11, 11)]
+
+    def test_batch_pairs_are_unique_and_ordered(self):
+        pairs = batch_overlap_pairs(self.geoms)
+        self.assertEqual(pairs.tolist(), [[0, 1], [1, 2]])
+        self.assertEqual(batch_overlap_pairs([Point(0, 0)]).shape, (0, 2))
+
+    def test_tag_counts_batch_and_existing_overlaps(self):
+        cur = _cursor(existing=[box(10.5, 10.5, 12, 12)])
+        features, counts, summary = apply_overlap_policy(cur, _validated(self.geoms), "tag")
+
+        self.assertEqual(len(features), 4)
+        self.assertEqual(counts, [1, 2, 1, 1])
+        self.assertEqual((summary["batch_pairs"], summary["existing_pairs"], summary["overlapping"]), (2, 1, 4))
+        # One envelope per feature rather than the batch extent
+        xmin, ymin, xmax, ymax, _limit = cur.execute.call_args[0][1]
+        self.assertEqual((xmin, ymin, xmax, ymax), ([0, 1, 2.5, 10], [0, 1, 2.5, 10], [2, 3, 4, 11], [2, 3, 4, 11]))
+        self.assertFalse(summary["truncated"])
+
+    def test_skip_keeps_first_of_overlapping_features(self):
+        """1 overlaps kept 0 and is dropped, so 2 no longer conflicts; 3 hits an existing row"""
+        cur = _cursor(existing=[box(10.5, 10.5, 12, 12)])
+        features, counts, summary = apply_overlap_policy(cur, _validated(self.geoms), "skip")
+
+        self.assertIsNone(counts)
+        self.assertEqual([f["properties"]["name"] for f, _ in features], ["F0", "F2"])
+        self.assertEqual(summary["skipped"], 2)
+
+    def test_merge_unions_connected_groups(self):
+        features, _counts, summary = apply_overlap_policy(_cursor(), _validated(self.geoms), "merge")
+
+        self.assertEqual([f["properties"]["name"] for f, _ in features], ["F0", "F3"])
+        self.assertAlmostEqual(features[0][1].area, shapely.union_all(self.geoms[:3]).area)
+        self.assertEqual(summary["merged"], 2)
+
+    def test_truncated_pull_is_flagged(self):
+        """More candidates than OVERLAP_EXISTING_LIMIT are cut off and flagged"""
+        cur = _cursor(existing=[box(0.5, 0.5, 1, 1)] * 3)
+        with patch.dict(os.environ, {"OVERLAP_EXISTING_LIMIT": "2"}):
+            _features, counts, summary = apply_overlap_policy(cur, _validated(self.geoms), "tag")
+
+        self.assertEqual(cur.execute.call_args[0][1][4], 3)
+        self.assertTrue(summary["truncated"])
+        self.assertEqual(summary["existing_pairs"], 4)
+
+    def test_requires_shapely_geometries(self):
+        with self.assertRaises(ValueError):
+            apply_overlap_policy(_cursor(), [({}, None)], "tag")
+
+    def test_add_overlap_summary(self):
+        part = {"policy": "skip", "batch_pairs": 2, "skipped": 1, "truncated": False}
+        self.assertEqual(add_overlap_summary(add_overlap_summary(None, part), dict(part, truncated=True)),
+                         {"policy": "skip", "batch_pairs": 4, "skipped": 2, "truncated": True})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+"""
+Unit tests for reproject.py
+"""
+import unittest
+import json
+import os
+import tempfile
+from unittest.mock import patch, MagicMock
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+import shapely
+from shapely.geometry import Point, LineString
+
+from reproject import (
+    parse_crs_member, detect_crs, detect_crs_in_header, is_wgs84,
+    get_transformer, reproject_geometries
+)
+from entrypoint import ingest_geojson
+
+
+class TestReproject(unittest.TestCase):
+    """Test cases for CRS detection and bulk reprojection"""
+
+    def test_parse_crs_member_variants(self):
+        """Legacy crs members are normalized to AUTHORITY:CODE"""
+        cases = [
+            ({"type": "name", "properties": {"name": "urn:ogc:def:crs:EPSG::32633"}}, "EPSG:32633"),
+            ({"type": "name", "properties": {"name": "EPSG:3857"}}, "EPSG:3857"),
+            ({"type": "name", "properties": {"name": "urn:ogc:def:crs:OGC:1.3:CRS84"}}, "OGC:CRS84"),
+            ({"type": "EPSG", "properties": {"code": 2154}}, "EPSG:2154"),
+        ]
+        for member, expected in cases:
+            with self.subTest(member=member):
+                self.assertEqual(parse_crs_member(member), expected)
+        with self.assertRaises(ValueError):
+            parse_crs_member({"type": "link", "properties": {"href": "http://example.com/crs"}})
+
+    def test_detect_crs_defaults(self):
+        """Missing crs means WGS84 unless GEO_SOURCE_CRS is set"""
+        self.assertIsNone(detect_crs({"type": "FeatureCollection", "features": []}))
+        self.assertTrue(is_wgs84(detect_crs({"crs": {"type": "name", "properties": {"name": "EPSG:4326"}}})))
+        with patch.dict(os.environ, {"GEO_SOURCE_CRS": "EPSG:32633"}):
+            self.assertEqual(detect_crs({"type": "FeatureCollection"}), "EPSG:32633")
+
+    def test_detect_crs_in_header(self):
+        """The splitter finds a crs member that precedes the features array"""
+        head = (b'{"type": "FeatureCollection", "crs": {"type": "name", "properties": '
+                b'{"name": "urn:ogc:def:crs:EPSG::32633"}}, "features": [{"type": "Fea')
+        self.assertEqual(detect_crs_in_header(head), "EPSG:32633")
+        self.assertIsNone(detect_crs_in_header(b'{"type": "FeatureCollection", "features": ['))
+
+    def test_transformer_is_cached(self):
+        """Transformers are built once per source CRS"""
+        self.assertIs(get_transformer("EPSG:32633"), get_transformer("EPSG:32633"))
+
+    def test_reproject_geometries_bulk(self):
+        """Chunks of mixed geometries are reprojected in order"""
+        geoms = [Point(500000, 0), None, LineString([(500000, 0), (500000, 1000000)]), Point()]
+        result = reproject_geometries(geoms, "EPSG:32633", chunk_size=2)
+
+        self.assertAlmostEqual(result[0].x, 15.0, places=6)
+        self.assertAlmostEqual(result[0].y, 0.0, places=6)
+        self.assertIsNone(result[1])
+        self.assertAlmostEqual(result[2].coords[1][1], 9.0, delta=0.1)
+        self.assertTrue(result[3].is_empty)
+        self.assertIs(reproject_geometries(geoms, None)[0], geoms[0])
+
+    def test_ingest_reprojects_declared_crs(self):
+        """Features in a declared UTM crs are inserted as EPSG:4326 WKB"""
+        data = {
+            "type": "FeatureCollection",
+            "crs": {"type": "name", "properties": {"name": "urn:ogc:def:crs:EPSG::32633"}},
+            "features": [{"type": "Feature", "properties": {"name": "utm"},
+                          "geometry": {"type": "Point", "coordinates": [500000, 0]}}]
+        }
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.geojson', delete=False) as f:
+            json.dump(data, f)
+            temp_path = f.name
+
+        try:
+            with patch('entrypoint.get_db_conn') as mock_conn:
+                mock_cursor = MagicMock()
+                mock_conn.return_value.__enter__.return_value.cursor.return_value.__enter__.return_value = mock_cursor
+
+                ingest_geojson(temp_path)
+
+                inserts = [c[0] for c in mock_cursor.execute.call_args_list if "INSERT INTO geo_data" in c[0][0]]
+                point = shapely.from_wkb(inserts[0][1][1])
+                self.assertAlmostEqual(point.x, 15.0, places=6)
+                self.assertAlmostEqual(point.y, 0.0, places=6)
+        finally:
+            os.unlink(temp_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
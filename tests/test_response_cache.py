@@ -0,0 +1,78 @@
+"""
+Unit tests for response_cache.py
+"""
+import unittest
+from unittest.mock import MagicMock
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from response_cache import ResponseCache, LRUStore, etag_matches
+
+
+class TestResponseCache(unittest.TestCase):
+    """Test cases for the generation-keyed response cache"""
+
+    def setUp(self):
+        self.generation = 1
+        self.read_generation = MagicMock(side_effect=lambda: self.generation)
+        self.cache = ResponseCache(self.read_generation, LRUStore(max_entries=2), generation_ttl=0)
+
+    def test_hit_after_miss_until_generation_changes(self):
+        """The same parameters hit until an ingest bumps the generation"""
+        build = MagicMock(return_value=b'{"n": 1}')
+
+        first = self.cache.lookup("data", [], build)
+        second = self.cache.lookup("data", [], build)
+        self.generation = 2
+        third = self.cache.lookup("data", [], build)
+
+        self.assertEqual([first["status"], second["status"], third["status"]], ["miss", "hit", "miss"])
+        self.assertEqual(second["body"], b'{"n": 1}')
+        self.assertEqual(build.call_count, 2)
+        self.assertNotEqual(first["etag"], third["etag"])
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    def test_if_none_match_skips_build(self):
+        etag = self.cache.lookup("geo_within", [0, 0, 1, 1, 10], lambda: b"[]")["etag"]
+        build = MagicMock()
+
+        result = self.cache.lookup("geo_within", [0, 0, 1, 1, 10], build, if_none_match=f"W/{etag}")
+
+        self.assertEqual(result["status"], "not_modified")
+        build.assert_not_called()
+        self.assertFalse(etag_matches('"other"', etag))
+
+    def test_generation_cached_for_ttl_and_noted_locally(self):
+        cache = ResponseCache(self.read_generation, generation_ttl=60)
+        cache.generation()
+        cache.generation()
+        self.assertEqual(self.read_generation.call_count, 1)
+        cache.note_generation(5)
+        self.assertEqual(cache.generation(), 5)
+
+    def test_lru_evicts_by_entries_and_bytes(self):
+        store = LRUStore(max_entries=2, max_bytes=10)
+        store.set("a", b"1234")
+        store.set("b", b"1234")
+        store.get("a")
+        store.set("c", b"1234")  # evicts b, the least recently used
+        self.assertIsNone(store.get("b"))
+        store.set("d", b"123456")  # over max_bytes: evicts a
+        self.assertIsNone(store.get("a"))
+        self.assertEqual(store.stats()["evictions"], 2)
+
+    def test_unavailable_generation_bypasses_cache(self):
+        cache = ResponseCache(MagicMock(side_effect=RuntimeError("db down")))
+        result = cache.lookup("data", [], lambda: b"{}")
+        self.assertEqual((result["status"], result["etag"]), ("bypassed", None))
+
+    def test_build_errors_are_not_cached(self):
+        with self.assertRaises(ValueError):
+            self.cache.lookup("data", [], MagicMock(side_effect=ValueError("boom")))
+        self.assertEqual(self.cache.lookup("data", [], lambda: b"{}")["status"], "miss")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,299 @@
+"""
+Unit tests for run_local.py
+"""
+import unittest
+import json
+import os
+from unittest.mock import patch, MagicMock
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+import run_local
+from run_local import app, execute_prepared, parse_bbox
+
+
+def _postgis_available():
+    """Return True if the configured PostGIS database accepts connections"""
+    if not os.getenv("DB_HOST"):
+        return False
+    try:
+        run_local.get_db_conn().close()
+        return True
+    except Exception:
+        return False
+
+
+class TestSpatialEndpoints(unittest.TestCase):
+    """Test cases for the /nearest, /within and /intersects endpoints"""
+
+    def setUp(self):
+        self.client = app.test_client()
+
+    def test_parse_bbox(self):
+        """Test bbox parsing and validation"""
+        self.assertEqual(parse_bbox("0,1,2,3"), (0.0, 1.0, 2.0, 3.0))
+        with self.assertRaises(ValueError):
+            parse_bbox("0,1,2")
+        with self.assertRaises(ValueError):
+            parse_bbox("2,0,1,3")
+
+    def test_nearest_requires_coordinates(self):
+        """Test that /nearest rejects missing or bad coordinates"""
+        self.assertEqual(self.client.get('/nearest?lon=1').status_code, 400)
+        self.assertEqual(self.client.get('/nearest?lon=a&lat=1').status_code, 400)
+
+    @patch('run_local.db_connection')
+    def test_nearest_executes_prepared_statement(self, mock_conn):
+        """Test that /nearest runs the prepared KNN statement"""
+        cursor = mock_conn.return_value.__enter__.return_value.cursor.return_value
+        cursor.fetchall.return_value = [
+            (7, "Test Point", json.dumps({"type": "Point", "coordinates": [1.0, 2.0]}), 12.5)
+        ]
+
+        response = self.client.get('/nearest?lon=1&lat=2&k=3')
+
+        self.assertEqual(response.status_code, 200)
+        sql, params = cursor.execute.call_args[0]
+        self.assertTrue(sql.startswith("EXECUTE geo_nearest"))
+        self.assertEqual(params, (1.0, 2.0, 3))
+        feature = response.get_json()["features"][0]
+        self.assertEqual(feature["id"], 7)
+        self.assertEqual(feature["properties"]["distance_m"], 12.5)
+
+    @patch('run_local.db_connection')
+    def test_intersects_bbox_builds_polygon(self, mock_conn):
+        """Test that /intersects converts a bbox into a GeoJSON polygon"""
+        cursor = mock_conn.return_value.__enter__.return_value.cursor.return_value
+        cursor.fetchall.return_value = []
+
+        response = self.client.get('/intersects?bbox=0,0,1,1&limit=5')
+
+        self.assertEqual(response.status_code, 200)
+        _sql, params = cursor.execute.call_args[0]
+        self.assertEqual(json.loads(params[0])["type"], "Polygon")
+        self.assertEqual(params[1], 5)
+
+    def test_execute_prepared_prepares_on_first_use(self):
+        """Test that a missing prepared statement is prepared and retried"""
+        conn = MagicMock()
+        cursor = conn.cursor.return_value
+        cursor.execute.side_effect = [run_local.psycopg2.errors.InvalidSqlStatementName(), None, None]
+
+        execute_prepared(conn, "geo_within", (0, 0, 1, 1, 10))
+
+        statements = [c[0][0] for c in cursor.execute.call_args_list]
+        self.assertTrue(statements[1].startswith("PREPARE geo_within"))
+        self.assertTrue(statements[2].startswith("EXECUTE geo_within"))
+        conn.rollback.assert_called_once()
+
+
+class TestHealthCache(unittest.TestCase):
+    """Test cases for the cached /health database check"""
+
+    def setUp(self):
+        self.client = app.test_client()
+        run_local._health_state.update(checked_at=None, healthy=False, error=None, timestamp=None)
+
+    @patch('run_local.db_connection')
+    def test_health_reuses_cached_status(self, mock_conn):
+        """Repeated probes within the TTL hit the database once"""
+        for _ in range(3):
+            response = self.client.get('/health')
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_conn.call_count, 1)
+        self.assertIsNotNone(response.get_json()["timestamp"])
+
+    @patch('run_local.db_connection')
+    def test_health_reports_database_error(self, mock_conn):
+        """A failing check is reported as unhealthy with the error"""
+        mock_conn.return_value.__enter__.side_effect = Exception("pool exhausted")
+
+        response = self.client.get('/health')
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.get_json()["error"], "pool exhausted")
+
+
+class TestEnsureSchema(unittest.TestCase):
+    """Test cases for the once-per-process schema step"""
+
+    @patch('run_local.get_db_conn')
+    def test_schema_committed_once_on_dedicated_connection(self, mock_conn):
+        with patch.object(run_local, '_schema_ready', False):
+            run_local.ensure_schema()
+            run_local.ensure_schema()
+
+        self.assertEqual(mock_conn.call_count, 1)
+        mock_conn.return_value.commit.assert_called_once()
+        mock_conn.return_value.close.assert_called_once()
+        cursor = mock_conn.return_value.cursor.return_value.__enter__.return_value
+        statements = [c[0][0] for c in cursor.execute.call_args_list]
+        self.assertTrue(any("ALTER TABLE geo_data" in s for s in statements))
+
+
+class TestProcessGeojsonCrs(unittest.TestCase):
+    """Test cases for the source CRS applied by process_geojson"""
+
+    def _inserted_point(self, document):
+        import tempfile
+        import shapely
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.geojson', delete=False) as f:
+            json.dump(document, f)
+            path = f.name
+        try:
+            with patch('run_local.db_connection') as mock_conn, patch('run_local.ensure_schema'), \
+                    patch('run_local.bump_generation', return_value=1), \
+                    patch.dict(os.environ, {"GEO_SOURCE_CRS": "EPSG:3857", "GRID_AGGREGATES": "false"}):
+                cursor = mock_conn.return_value.__enter__.return_value.cursor.return_value.__enter__.return_value
+                run_local.process_geojson(path)
+        finally:
+            os.unlink(path)
+        sql, params = next(c[0] for c in cursor.execute.call_args_list if "INSERT INTO geo_data" in c[0][0])
+        return shapely.from_wkb(params[1])
+
+    def test_source_crs_applies_without_crs_member(self):
+        """GEO_SOURCE_CRS is used although GDAL reports EPSG:4326 for the file"""
+        point = self._inserted_point({"type": "FeatureCollection", "features": [{
+            "type": "Feature", "properties": {"name": "A"},
+            "geometry": {"type": "Point", "coordinates": [1113194.9, 0.0]}}]})
+        self.assertAlmostEqual(point.x, 10.0, places=3)
+
+    def test_crs_member_wins_over_source_crs(self):
+        point = self._inserted_point({
+            "type": "FeatureCollection",
+            "crs": {"type": "name", "properties": {"name": "urn:ogc:def:crs:OGC:1.3:CRS84"}},
+            "features": [{"type": "Feature", "properties": {"name": "A"},
+                          "geometry": {"type": "Point", "coordinates": [10.0, 0.0]}}]})
+        self.assertAlmostEqual(point.x, 10.0)
+
+
+class TestDensityEndpoint(unittest.TestCase):
+    """Test cases for /density answered from grid_cells"""
+
+    def setUp(self):
+        self.client = app.test_client()
+
+    def test_density_requires_maintained_zoom(self):
+        self.assertEqual(self.client.get('/density').status_code, 400)
+        self.assertEqual(self.client.get('/density?z=5').status_code, 400)
+
+    @patch('run_local.db_connection')
+    def test_density_returns_cell_polygons(self, mock_conn):
+        """Cells come back as tile polygons with their counts"""
+        cursor = mock_conn.return_value.__enter__.return_value.cursor.return_value.__enter__.return_value
+        cursor.fetchall.return_value = [("1202", 42, 2.3, 48.8, 2.4, 48.9)]
+
+        response = self.client.get('/density?z=4&bbox=0,40,10,50')
+
+        self.assertEqual(response.status_code, 200)
+        sql, params = cursor.execute.call_args[0]
+        self.assertIn("FROM grid_cells WHERE zoom = %s", sql)
+        self.assertEqual(params, [4, 0.0, 40.0, 10.0, 50.0])
+        feature = response.get_json()["features"][0]
+        self.assertEqual(feature["id"], "1202")
+        self.assertEqual(feature["properties"]["count"], 42)
+        self.assertEqual((feature["properties"]["x"], feature["properties"]["y"]), (8, 5))
+
+
+class TestExportEndpoint(unittest.TestCase):
+    """Test cases for the streaming /export endpoint"""
+
+    def setUp(self):
+        self.client = app.test_client()
+
+    def test_export_rejects_unknown_format(self):
+        self.assertEqual(self.client.get('/export?format=shp').status_code, 400)
+        self.assertEqual(self.client.get('/export?bbox=1,2').status_code, 400)
+
+    @patch('run_local.stream_export')
+    @patch('run_local.db_connection')
+    def test_export_streams_chunks(self, mock_conn, mock_stream):
+        """The body is the concatenated export chunks, with filters passed through"""
+        mock_stream.return_value = iter([b'{"a":1}\n', b'{"b":2}\n'])
+
+        response = self.client.get('/export?format=geojsonseq&bbox=0,0,1,1&upload_id=u1')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(response.data, b'{"a":1}\n{"b":2}\n')
+        kwargs = mock_stream.call_args[1]
+        self.assertEqual(kwargs["bbox"], (0.0, 0.0, 1.0, 1.0))
+        self.assertEqual(kwargs["upload_id"], "u1")
+
+
+class TestResponseCaching(unittest.TestCase):
+    """Test cases for generation-keyed caching of /data and spatial queries"""
+
+    def setUp(self):
+        self.client = app.test_client()
+        self.generation = 7
+        self.saved_cache = run_local._response_cache
+        run_local._response_cache = run_local.ResponseCache(lambda: self.generation, generation_ttl=0)
+
+    def tearDown(self):
+        run_local._response_cache = self.saved_cache
+
+    @patch('run_local.db_connection')
+    def test_data_served_from_cache_until_next_ingest(self, mock_conn):
+        cursor = mock_conn.return_value.__enter__.return_value.cursor.return_value.__enter__.return_value
+        cursor.fetchall.return_value = []
+
+        first = self.client.get('/data')
+        second = self.client.get('/data')
+        self.generation = 8
+        third = self.client.get('/data')
+
+        self.assertEqual([r.headers["X-Cache"] for r in (first, second, third)], ["MISS", "HIT", "MISS"])
+        self.assertEqual(second.get_json(), {"type": "FeatureCollection", "features": []})
+        self.assertEqual(cursor.fetchall.call_count, 2)
+        self.assertEqual(run_local.get_response_cache().stats()["hits"], 1)
+
+    @patch('run_local.db_connection')
+    def test_conditional_get_returns_not_modified(self, mock_conn):
+        cursor = mock_conn.return_value.__enter__.return_value.cursor.return_value
+        cursor.fetchall.return_value = []
+
+        etag = self.client.get('/within?bbox=0,0,1,1').headers["ETag"]
+        response = self.client.get('/within?bbox=0.0,0,1,1.0', headers={"If-None-Match": etag})
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(cursor.fetchall.call_count, 1)
+        self.assertEqual(run_local.get_response_cache().stats()["not_modified"], 1)
+
+
+@unittest.skipUnless(_postgis_available(), "PostGIS database not available")
+class TestSpatialQueryPlans(unittest.TestCase):
+    """EXPLAIN checks that the prepared spatial queries use idx_geo_data_geom"""
+
+    PARAMS = {
+        "geo_nearest": (0.0, 0.0, 5),
+        "geo_within": (-1.0, -1.0, 1.0, 1.0, 100),
+        "geo_intersects": (json.dumps({"type": "Point", "coordinates": [0.0, 0.0]}), 100),
+    }
+
+    def setUp(self):
+        self.conn = run_local.get_db_conn()
+        self.cur = self.conn.cursor()
+        # Small test tables are cheaper to scan sequentially; disable that so the
+        # plan shows whether the index is usable for each statement.
+        self.cur.execute("SET enable_seqscan = off")
+
+    def tearDown(self):
+        self.conn.rollback()
+        self.conn.close()
+
+    def test_statements_use_index_scan(self):
+        for name, params in self.PARAMS.items():
+            with self.subTest(statement=name):
+                execute_prepared(self.conn, name, params).fetchall()
+                self.cur.execute("SET enable_seqscan = off")
+                placeholders = ", ".join(["%s"] * len(params))
+                self.cur.execute(f"EXPLAIN EXECUTE {name} ({placeholders})", params)
+                plan = "\n".join(row[0] for row in self.cur.fetchall())
+                self.assertIn("idx_geo_data_geom", plan)
+                self.assertRegex(plan, r"(Index|Bitmap Index) Scan")
+
+
+if __name__ == '__main__':
+    unittest.main()
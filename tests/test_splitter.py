@@ -0,0 +1,105 @@
+"""
+Unit tests for splitter.py
+"""
+import unittest
+import io
+import json
+import tempfile
+import os
+from unittest.mock import patch
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from splitter import (
+    scan_feature_offsets, plan_shards, parse_shard, aggregate_results, split_and_ingest
+)
+
+
+def _fake_ingest(features, conn=None, source="", upload_id=None, crs=None):
+    return {"features": len(features), "valid": len(features), "inserted": len(features),
+            "duplicates": 0, "errors": 0}
+
+
+class TestSplitter(unittest.TestCase):
+    """Test cases for feature offset scanning and shard planning"""
+
+    def setUp(self):
+        """Build a FeatureCollection with awkward strings and extra members"""
+        self.features = [
+            {
+                "type": "Feature",
+                "properties": {"name": f'F{i} [a] {{b}} "quoted" \\ end\\', "nested": {"x": [1, {"y": "]"}]}},
+                "geometry": {"type": "Point", "coordinates": [float(i), float(i)]}
+            }
+            for i in range(50)
+        ]
+        self.document = {
+            "type": "FeatureCollection",
+            "name": "features",
+            "crs": {"type": "name", "properties": {"name": "EPSG:4326"}},
+            "features": self.features,
+            "bbox": [0, 0, 49, 49]
+        }
+        self.raw = json.dumps(self.document, indent=2).encode()
+
+    def test_scan_offsets_across_chunk_boundaries(self):
+        """Offsets are exact regardless of how the stream is chunked"""
+        for chunk_size in (1, 5, 64, 4096):
+            with self.subTest(chunk_size=chunk_size):
+                offsets = scan_feature_offsets(io.BytesIO(self.raw), chunk_size=chunk_size)
+                self.assertEqual(offsets.dtype, np.int64)
+                self.assertEqual(offsets.shape, (len(self.features), 2))
+                for (start, end), feature in zip(offsets, self.features):
+                    self.assertEqual(json.loads(self.raw[start:end]), feature)
+
+    def test_scan_requires_features_array(self):
+        """A document without a features array is rejected"""
+        with self.assertRaises(ValueError):
+            scan_feature_offsets(io.BytesIO(b'{"type": "Feature", "geometry": null}'))
+
+    def test_plan_shards_covers_every_feature(self):
+        """Shard ranges parse on their own and cover all features in order"""
+        offsets = scan_feature_offsets(io.BytesIO(self.raw))
+        manifests = plan_shards(offsets, "source.geojson", shard_bytes=2048)
+
+        self.assertGreater(len(manifests), 1)
+        parsed = []
+        for manifest in manifests:
+            self.assertEqual(manifest["shards"], len(manifests))
+            self.assertEqual(manifest["upload_id"], manifests[0]["upload_id"])
+            parsed.extend(parse_shard(self.raw[manifest["start"]:manifest["end"]]))
+        self.assertEqual(parsed, self.features)
+        # Manifests are sent as JSON events, so offsets must be plain ints
+        self.assertEqual(json.loads(json.dumps(manifests)), manifests)
+
+    def test_aggregate_results_reports_failed_shards(self):
+        """Per-shard summaries are summed and failures listed"""
+        summary = aggregate_results([
+            {"shard": 1, "error": "OperationalError: timeout"},
+            {"shard": 0, "features": 3, "valid": 3, "inserted": 2, "duplicates": 1, "errors": 0},
+        ])
+        self.assertEqual(summary["inserted"], 2)
+        self.assertEqual(summary["duplicates"], 1)
+        self.assertEqual(summary["failed_shards"], [{"shard": 1, "error": "OperationalError: timeout"}])
+
+    @patch('splitter.ingest_features', side_effect=_fake_ingest)
+    def test_split_and_ingest_with_process_pool(self, _mock_ingest):
+        """The local coordinator fans shards out to worker processes"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "big.geojson")
+            with open(path, 'wb') as f:
+                f.write(self.raw)
+            manifest_dir = os.path.join(tmpdir, "shards")
+
+            summary = split_and_ingest(path, workers=2, shard_bytes=4096, manifest_dir=manifest_dir)
+
+            self.assertEqual(summary["inserted"], len(self.features))
+            self.assertEqual(summary["failed_shards"], [])
+            self.assertEqual(len(os.listdir(manifest_dir)), summary["shards"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+"""
+Unit tests for upload_stats.py
+"""
+import unittest
+import json
+import os
+from unittest.mock import MagicMock
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from shapely.geometry import shape
+
+from upload_stats import UploadStats, record_upload, bump_generation, read_generation
+
+
+class TestUploadStats(unittest.TestCase):
+    """Test cases for per-upload statistics"""
+
+    def setUp(self):
+        self.geometries = [
+            {"type": "Point", "coordinates": [1.0, 2.0]},
+            {"type": "LineString", "coordinates": [[-3.0, 0.0], [4.0, 5.0], [6.0, 1.0]]},
+            {"type": "Polygon", "coordinates": [[[0, 0], [2, 0], [2, 8], [0, 0]]]},
+            {"type": "Point", "coordinates": [0.5, -7.0]},
+        ]
+
+    def test_add_geometries(self):
+        """Vectorized statistics cover extent, types and vertices"""
+        stats = UploadStats()
+        stats.add_geometries([shape(g) for g in self.geometries[:2]])
+        stats.add_geometries([shape(g) for g in self.geometries[2:]] + [None])
+
+        self.assertEqual(stats.as_dict(), {
+            "feature_count": 4,
+            "vertex_count": 9,
+            "geom_types": {"Point": 2, "LineString": 1, "Polygon": 1},
+            "bbox": [-3.0, -7.0, 6.0, 8.0],
+        })
+
+    def test_geojson_fallback_matches_shapely(self):
+        """The no-Shapely path computes the same statistics"""
+        vectorized = UploadStats()
+        vectorized.add_geometries([shape(g) for g in self.geometries])
+        fallback = UploadStats()
+        for geometry in self.geometries:
+            fallback.add_geojson(geometry)
+
+        self.assertEqual(fallback.as_dict(), vectorized.as_dict())
+
+    def test_record_upload_params(self):
+        """The upsert receives counts, histogram JSON and bbox; no extent when empty"""
+        cur = MagicMock()
+        stats = UploadStats()
+        stats.add_geojson(self.geometries[0])
+        record_upload(cur, "abc", "s3://bucket/key.geojson", stats)
+
+        sql, params = cur.execute.call_args[0]
+        self.assertIn("ON CONFLICT (upload_id)", sql)
+        self.assertEqual(params[:4], ("abc", "s3://bucket/key.geojson", 1, 1))
+        self.assertEqual(json.loads(params[4]), {"Point": 1})
+        self.assertEqual(params[5:], (1.0, 2.0, 1.0, 2.0))
+
+        record_upload(cur, "empty", "x", UploadStats())
+        self.assertEqual(cur.execute.call_args[0][1][5:], (None, None, None, None))
+
+    def test_generation_bump_and_read(self):
+        """The bump returns the new generation; a missing row reads as 0"""
+        cur = MagicMock()
+        cur.fetchone.return_value = (4,)
+        self.assertEqual(bump_generation(cur), 4)
+        self.assertIn("ON CONFLICT (id)", cur.execute.call_args[0][0])
+        cur.fetchone.return_value = None
+        self.assertEqual(read_generation(cur), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()